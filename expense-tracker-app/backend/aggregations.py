@@ -0,0 +1,100 @@
+"""Shared aggregation queries used by the dashboard and analytics endpoints."""
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, literal_column, select, union_all
+
+from models import db, Money, ArchiveTotal, Expense, Loan, CommitteePayment, MonthlyIncome
+import archive
+
+TOTAL_COLUMNS = ('expenses', 'committee_payments', 'given', 'taken', 'received_back', 'income')
+
+
+def month_bounds(month):
+    """Return the half-open [start, end) date range for a YYYY-MM string.
+
+    Comparing the raw date column against a range lets SQLite use the date
+    indexes, where strftime('%Y-%m', date) = ... forces a full table scan.
+    """
+    year, month_num = (int(part) for part in month.split('-'))
+    start = date(year, month_num, 1)
+    end = date(year + 1, 1, 1) if month_num == 12 else date(year, month_num + 1, 1)
+    return start, end
+
+
+def _branch(**sums):
+    # Every UNION branch must return all columns; the ones it doesn't own are 0.
+    # The placeholders are typed so the union columns are read back as Money
+    return [sums.get(name, literal_column('0', Money)).label(name) for name in TOTAL_COLUMNS]
+
+
+def _loan_sum(loans, loan_type):
+    return func.sum(case((loans.loan_type == loan_type, loans.amount)))
+
+
+def _loan_branch(loans):
+    # loans is Loan or one of its archive partitions
+    return select(*_branch(
+        given=_loan_sum(loans, 'given'),
+        taken=_loan_sum(loans, 'taken'),
+        received_back=_loan_sum(loans, 'received_back'),
+    )).where(loans.loan_type.in_(('given', 'taken', 'received_back')))
+
+
+def _archived_branch(*kinds):
+    # All-time totals of the archive partitions come from archive_totals, not from scanning them
+    return select(*_branch(**{
+        kind: func.sum(case((ArchiveTotal.kind == kind, ArchiveTotal.total))) for kind in kinds
+    })).where(ArchiveTotal.kind.in_(kinds))
+
+
+def financial_totals_statement(month=None, loan_month=None):
+    """Build the single statement behind financial_totals(); see there for arguments"""
+    committee = select(*_branch(committee_payments=func.sum(CommitteePayment.amount)))
+    income = select(*_branch(income=func.sum(MonthlyIncome.amount)))
+
+    if month is None:
+        expenses = [select(*_branch(expenses=func.sum(Expense.amount)))]
+        if archive.partitions('expenses'):
+            expenses.append(_archived_branch('expenses'))
+    else:
+        month_start, month_end = month_bounds(month)
+        # Only partitions holding dates of the month get a branch
+        expenses = [
+            select(*_branch(expenses=func.sum(source.amount)))
+            .where(source.date >= month_start, source.date < month_end)
+            for source in archive.sources('expenses', month_start, month_end - timedelta(days=1))
+        ]
+        committee = committee.where(CommitteePayment.month_year == month)
+        income = income.where(MonthlyIncome.month_year == month)
+
+    if loan_month is None:
+        loans = [_loan_branch(Loan)]
+        if archive.partitions('loans'):
+            loans.append(_archived_branch('given', 'taken', 'received_back'))
+    else:
+        loan_start, loan_end = month_bounds(loan_month)
+        loans = [
+            _loan_branch(source).where(source.date >= loan_start, source.date < loan_end)
+            for source in archive.sources('loans', loan_start, loan_end - timedelta(days=1))
+        ]
+
+    combined = union_all(*expenses, committee, *loans, income).subquery()
+    return select(*[func.sum(combined.c[name]).label(name) for name in TOTAL_COLUMNS])
+
+
+def totals_from_row(row):
+    return {name: getattr(row, name) or 0 for name in TOTAL_COLUMNS}
+
+
+def financial_totals(month=None, loan_month=None):
+    """Return expense, committee payment, loan and income totals in one query.
+
+    month limits expenses, committee payments and income to a YYYY-MM month,
+    loan_month does the same for loans; None means all time. The per-table
+    sums are UNIONed and folded into a single row, so the whole dashboard
+    costs one round-trip instead of one per figure. Archived expenses and
+    loans count through archive_totals, or through their partition when a
+    month falls inside one.
+    """
+    row = db.session.execute(financial_totals_statement(month, loan_month)).one()
+    return totals_from_row(row)
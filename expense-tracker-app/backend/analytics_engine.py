@@ -0,0 +1,221 @@
+"""Vectorized expense analytics.
+
+Instead of hydrating ORM objects and looping in Python, the engine pulls the
+three columns it needs (day, category_id, amount) as NumPy arrays and derives
+period totals, rolling windows, category pivots, year-over-year deltas and
+amount percentiles with bincount/cumsum/lexsort over the whole slice at once.
+
+Amounts are loaded as the integer cents they are stored as and summed in
+cents, so totals are exact; they become dollars only in the returned
+payload.
+"""
+from datetime import date, timedelta
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import cast, func, literal_column, select, type_coerce, BigInteger, Integer
+
+from models import db
+import archive
+
+GRANULARITIES = ('day', 'week', 'month')
+# How many periods back the same period of the previous year is
+YOY_OFFSETS = {'day': 365, 'week': 52, 'month': 12}
+DEFAULT_WINDOWS = {'day': 7, 'week': 4, 'month': 3}
+DEFAULT_PERCENTILES = (50, 90, 99)
+# Most periods one request may cover: ten years of days
+MAX_PERIODS = 3660
+
+EPOCH = date(1970, 1, 1)
+
+
+def _epoch_days(column):
+    """SQL expression for days since 1970-01-01"""
+    if db.engine.dialect.name == 'sqlite':
+        return cast(func.julianday(column) - 2440587.5, Integer)
+    return column - literal_column("DATE '1970-01-01'")
+
+
+def load_expense_columns(start_date, end_date):
+    """Return (days, category_ids, amount cents) int64 arrays for expenses in [start, end]"""
+    expenses = archive.history('expenses', start_date, end_date)
+    # Read amount_cents as stored instead of through Money's float conversion
+    cents = type_coerce(expenses.amount, BigInteger)
+    stmt = select(_epoch_days(expenses.date), expenses.category_id, cents).where(
+        expenses.date >= start_date, expenses.date <= end_date
+    )
+    rows = db.session.execute(stmt).all()
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 3)
+    columns = flat.reshape(-1, 3)
+    return columns[:, 0], columns[:, 1], columns[:, 2]
+
+
+def _cent_sums(index, cents, count):
+    """Per-index sums of cents; bincount adds in float64, exact for integers below 2**53"""
+    return np.bincount(index, weights=cents, minlength=count).astype(np.int64)
+
+
+def _dollars(cents):
+    return (cents / 100).tolist()
+
+
+def _period_numbers(days, granularity):
+    """Map epoch days to absolute period numbers at the given granularity"""
+    days = np.asarray(days, dtype=np.int64)
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return (days + 3) // 7
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def _period_start(number, granularity):
+    if granularity == 'day':
+        return EPOCH + timedelta(days=int(number))
+    if granularity == 'week':
+        return EPOCH + timedelta(days=int(number) * 7 - 3)
+    return date(1970 + int(number) // 12, int(number) % 12 + 1, 1)
+
+
+def _period_label(number, granularity):
+    start = _period_start(number, granularity)
+    return start.strftime('%Y-%m') if granularity == 'month' else start.isoformat()
+
+
+def _to_list(values):
+    """ndarray -> JSON-friendly list with NaN/inf as None"""
+    return [None if not np.isfinite(value) else value for value in values.tolist()]
+
+
+def rolling_sum(totals, window):
+    """Sum of each element and the window - 1 before it (shorter at the start)"""
+    cumulative = np.concatenate(([0], np.cumsum(totals)))
+    upper = np.arange(1, len(totals) + 1)
+    lower = np.maximum(upper - window, 0)
+    return cumulative[upper] - cumulative[lower]
+
+
+def grouped_percentiles(groups, values, group_count, percentiles):
+    """Linear-interpolated percentiles of values within each group.
+
+    Sorting once by (group, value) puts each group's values in a contiguous,
+    ordered run, so every percentile is an index lookup into that run.
+    """
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.cumsum(counts) - counts
+    has_values = counts > 0
+
+    result = {}
+    for percentile in percentiles:
+        position = starts + (np.maximum(counts, 1) - 1) * (percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        fraction = position - lower
+        if len(sorted_values):
+            lower_values = sorted_values[np.minimum(lower, len(sorted_values) - 1)]
+            upper_values = sorted_values[np.minimum(upper, len(sorted_values) - 1)]
+            estimate = lower_values + (upper_values - lower_values) * fraction
+        else:
+            estimate = np.zeros(group_count)
+        result[f'p{percentile:g}'] = np.where(has_values, estimate, np.nan)
+    return result
+
+
+def _lookback(granularity, window):
+    # Periods loaded before the range for the first rolling window and the year-over-year comparison
+    return max(YOY_OFFSETS[granularity], window - 1)
+
+
+def check_range(start_date, end_date, granularity, window=None):
+    """Raise ValueError unless trends() can serve this range"""
+    window = window or DEFAULT_WINDOWS[granularity]
+    first_period, last_period = _period_numbers([(start_date - EPOCH).days, (end_date - EPOCH).days], granularity)
+    if last_period - first_period + 1 > MAX_PERIODS:
+        raise ValueError(f'the range covers more than {MAX_PERIODS} {granularity}s')
+    try:
+        _period_start(first_period - _lookback(granularity, window), granularity)
+    except (OverflowError, ValueError):
+        raise ValueError('start is too early: the year before it is loaded as well') from None
+
+
+def default_start(end_date, granularity):
+    if granularity == 'day':
+        return end_date - timedelta(days=89)
+    if granularity == 'week':
+        return end_date - timedelta(weeks=52)
+    month_number = end_date.year * 12 + end_date.month - 1 - 11
+    return date(month_number // 12, month_number % 12 + 1, 1)
+
+
+def trends(start_date, end_date, granularity='month', window=None,
+           percentiles=DEFAULT_PERCENTILES, category_names=None):
+    """Expense trends between start_date and end_date (inclusive).
+
+    Returns per-period totals, transaction counts, a rolling sum over window
+    periods, totals per category, deltas against the same period a year
+    earlier and amount percentiles per period.
+    """
+    window = window or DEFAULT_WINDOWS[granularity]
+    category_names = category_names or {}
+
+    first_period = int(_period_numbers([(start_date - EPOCH).days], granularity)[0])
+    last_period = int(_period_numbers([(end_date - EPOCH).days], granularity)[0])
+    period_count = last_period - first_period + 1
+
+    # Load enough history before the range for the first rolling window and
+    # the year-over-year comparison
+    lookback = _lookback(granularity, window)
+    load_start = _period_start(first_period - lookback, granularity)
+    days, category_ids, amounts = load_expense_columns(load_start, end_date)
+
+    index = _period_numbers(days, granularity) - (first_period - lookback)
+    extended_count = period_count + lookback
+    extended_totals = _cent_sums(index, amounts, extended_count)
+
+    totals = extended_totals[lookback:]
+    rolling = rolling_sum(extended_totals, window)[lookback:]
+    yoy_offset = YOY_OFFSETS[granularity]
+    previous_year = extended_totals[lookback - yoy_offset:lookback - yoy_offset + period_count]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        yoy_percent = (totals - previous_year) / previous_year * 100
+
+    # Everything below only looks at the requested range
+    visible = index >= lookback
+    period_index = index[visible] - lookback
+    visible_categories = category_ids[visible]
+    visible_amounts = amounts[visible]
+
+    counts = np.bincount(period_index, minlength=period_count)
+
+    unique_categories, category_position = np.unique(visible_categories, return_inverse=True)
+    pivot = _cent_sums(
+        period_index * len(unique_categories) + category_position,
+        visible_amounts,
+        period_count * len(unique_categories)
+    ).reshape(period_count, len(unique_categories))
+
+    period_percentiles = grouped_percentiles(period_index, visible_amounts, period_count, percentiles)
+
+    return {
+        'granularity': granularity,
+        'window': window,
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'periods': [_period_label(first_period + offset, granularity) for offset in range(period_count)],
+        'totals': _dollars(totals),
+        'transaction_counts': counts.tolist(),
+        'rolling': _dollars(rolling),
+        'yoy': {
+            'previous': _dollars(previous_year),
+            'delta': _dollars(totals - previous_year),
+            'percent': _to_list(yoy_percent),
+        },
+        'categories': {
+            category_names.get(int(category_id), str(int(category_id))): _dollars(pivot[:, column])
+            for column, category_id in enumerate(unique_categories)
+        },
+        'percentiles': {name: _to_list(values / 100) for name, values in period_percentiles.items()},
+    }
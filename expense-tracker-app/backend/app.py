@@ -1,153 +1,67 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
+"""API routes and the extensions they use.
+
+The routes live on the api blueprint and the extensions are created unbound;
+bootstrap.create_app() builds the Flask app, configures it and binds both.
+"""
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, extract, and_, or_
+from sqlalchemy import func, extract, and_, or_, case, select, union_all
+import base64
+import binascii
 import calendar
+import io
+import json
 import os
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///expense_tracker_enhanced.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-CORS(app)
-
-# Enhanced Database Models
-class Person(db.Model):
-    __tablename__ = 'persons'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False, unique=True)
-    contact = db.Column(db.String(50))
-    email = db.Column(db.String(120))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relationships
-    loans = db.relationship('Loan', backref='person', lazy=True)
-
-class Category(db.Model):
-    __tablename__ = 'categories'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), unique=True, nullable=False)
-    description = db.Column(db.String(200))
-    color = db.Column(db.String(7), default='#95a5a6')
-    icon = db.Column(db.String(50), default='fas fa-circle')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relationships
-    expenses = db.relationship('Expense', backref='category', lazy=True)
-
-class PaymentMethod(db.Model):
-    __tablename__ = 'payment_methods'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
-    type = db.Column(db.String(20), nullable=False)
-    details = db.Column(db.String(200))
-    is_active = db.Column(db.Boolean, default=True)
-
-class Expense(db.Model):
-    __tablename__ = 'expenses'
-    id = db.Column(db.Integer, primary_key=True)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
-    payment_method_id = db.Column(db.Integer, db.ForeignKey('payment_methods.id'))
-    amount = db.Column(db.Float, nullable=False)
-    description = db.Column(db.String(200), nullable=False)
-    date = db.Column(db.Date, default=date.today)
-    location = db.Column(db.String(200))
-    notes = db.Column(db.Text)
-    tags = db.Column(db.String(200))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class Loan(db.Model):
-    __tablename__ = 'loans'
-    id = db.Column(db.Integer, primary_key=True)
-    person_id = db.Column(db.Integer, db.ForeignKey('persons.id'), nullable=False)
-    loan_type = db.Column(db.String(20), nullable=False)  # 'given', 'taken', 'received_back'
-    amount = db.Column(db.Float, nullable=False)
-    description = db.Column(db.String(200))
-    date = db.Column(db.Date, default=date.today)
-    due_date = db.Column(db.Date)
-    interest_rate = db.Column(db.Float, default=0.0)
-    status = db.Column(db.String(20), default='active')  # 'active', 'paid', 'partial'
-    notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Committee(db.Model):
-    __tablename__ = 'committees'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    start_date = db.Column(db.Date, nullable=False)
-    end_date = db.Column(db.Date, nullable=False)
-    monthly_amount = db.Column(db.Float, nullable=False)
-    expected_receiving_amount = db.Column(db.Float, nullable=False)
-    expected_receiving_date = db.Column(db.Date, nullable=False)
-    status = db.Column(db.String(20), default='active')  # 'active', 'completed', 'paused'
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relationships
-    payments = db.relationship('CommitteePayment', backref='committee', lazy=True)
-
-class CommitteePayment(db.Model):
-    __tablename__ = 'committee_payments'
-    id = db.Column(db.Integer, primary_key=True)
-    committee_id = db.Column(db.Integer, db.ForeignKey('committees.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    payment_date = db.Column(db.Date, default=date.today)
-    month_year = db.Column(db.String(7), nullable=False)  # Format: "2024-01"
-    status = db.Column(db.String(20), default='paid')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class MonthlyIncome(db.Model):
-    __tablename__ = 'monthly_income'
-    id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
-    month_year = db.Column(db.String(7), nullable=False)  # Format: "2024-01"
-    source = db.Column(db.String(100))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+from models import db, Person, Category, PaymentMethod, Expense, Loan, Committee, CommitteePayment, MonthlyIncome, MonthlyRollup, MonthlyTotal
+from aggregations import financial_totals
+from response_cache import ResponseCache
+from group_commit import GroupCommit
+from events import ChangeFeed, STREAM_HEADERS
+from profiling import MetricsWriter, RequestProfiler
+from fast_json import FastJSON, json_default
+import reference_cache
+import rollups
+from tag_index import format_tags, index_expense_tags, parse_tags, tagged_with, tag_totals
+from search import search_supported, search_expenses
+from committee_schedule import committee_schedule
+import archive
+from loan_balances import record_loan_balance
+
+api = Blueprint('api', __name__)
+profiler = RequestProfiler()
+response_cache = ResponseCache()
+group_commit = GroupCommit()
+fast_json = FastJSON()
+change_feed = ChangeFeed()
 
 # API Routes
 
 # Dashboard Overview
-@app.route('/api/dashboard/overview', methods=['GET'])
+@api.route('/api/dashboard/overview', methods=['GET'])
+@response_cache.cached('expenses', 'committee_payments', 'loans', 'monthly_income')
 def get_dashboard_overview():
     current_month = date.today().strftime('%Y-%m')
     
-    # Monthly expenses (including committee payments)
-    monthly_expenses = db.session.query(func.sum(Expense.amount)).filter(
-        func.strftime('%Y-%m', Expense.date) == current_month
-    ).scalar() or 0
-    
-    committee_payments = db.session.query(func.sum(CommitteePayment.amount)).filter(
-        CommitteePayment.month_year == current_month
-    ).scalar() or 0
-    
-    total_monthly_expenses = monthly_expenses + committee_payments
+    # Monthly figures for expenses, committee payments and income; loans are all-time
+    return jsonify(overview_payload(financial_totals(month=current_month), current_month))
+
+def overview_payload(totals, current_month):
+    committee_payments = totals['committee_payments']
+    total_monthly_expenses = totals['expenses'] + committee_payments
     
     # Loan summary
-    total_given = db.session.query(func.sum(Loan.amount)).filter(
-        Loan.loan_type == 'given'
-    ).scalar() or 0
-    
-    total_taken = db.session.query(func.sum(Loan.amount)).filter(
-        Loan.loan_type == 'taken'
-    ).scalar() or 0
-    
-    total_received_back = db.session.query(func.sum(Loan.amount)).filter(
-        Loan.loan_type == 'received_back'
-    ).scalar() or 0
-    
+    total_given = totals['given']
+    total_taken = totals['taken']
+    total_received_back = totals['received_back']
     net_loan = total_given - total_taken - total_received_back
     
-    # Monthly income
-    monthly_income = db.session.query(func.sum(MonthlyIncome.amount)).filter(
-        MonthlyIncome.month_year == current_month
-    ).scalar() or 0
+    monthly_income = totals['income']
     
     total_savings = monthly_income - total_monthly_expenses
     net_worth = total_savings + net_loan
     
-    return jsonify({
+    return {
         'monthly_expenses': total_monthly_expenses,
         'committee_payments': committee_payments,
         'total_given': total_given,
@@ -158,108 +72,231 @@ def get_dashboard_overview():
         'total_savings': total_savings,
         'net_worth': net_worth,
         'current_month': current_month
-    })
+    }
 
 # Status endpoint (for backward compatibility)
-@app.route('/api/status', methods=['GET'])
+@api.route('/api/status', methods=['GET'])
 def status():
-    # Get total expenses
-    total_expenses = db.session.query(func.sum(Expense.amount)).scalar() or 0
-    
-    # Get loan totals
-    total_loans_given = db.session.query(func.sum(Loan.amount)).filter(
-        Loan.loan_type == 'given'
-    ).scalar() or 0
-    
-    total_loans_taken = db.session.query(func.sum(Loan.amount)).filter(
-        Loan.loan_type == 'taken'
-    ).scalar() or 0
+    return jsonify(status_payload(financial_totals()))
+
+def status_payload(totals):
+    total_expenses = totals['expenses']
+    total_loans_given = totals['given']
+    total_loans_taken = totals['taken']
     
     net_balance = total_loans_given - total_loans_taken
     
-    return jsonify({
+    return {
         'total_expenses': total_expenses,
         'total_loans_given': total_loans_given,
         'total_loans_taken': total_loans_taken,
         'net_balance': net_balance
-    })
+    }
 
 # Categories
-@app.route('/api/categories', methods=['GET'])
+@api.route('/api/categories', methods=['GET'])
 def get_categories():
-    categories = Category.query.all()
-    return jsonify([{
-        'id': cat.id,
-        'name': cat.name,
-        'color': cat.color,
-        'icon': cat.icon,
-        'description': cat.description
-    } for cat in categories])
+    return cached_reference_response(reference_cache.categories.get())
 
 # Payment Methods
-@app.route('/api/payment-methods', methods=['GET'])
+@api.route('/api/payment-methods', methods=['GET'])
 def get_payment_methods():
-    methods = PaymentMethod.query.filter_by(is_active=True).all()
-    return jsonify([{
-        'id': method.id,
-        'name': method.name,
-        'type': method.type,
-        'details': method.details
-    } for method in methods])
+    return cached_reference_response(reference_cache.payment_methods.get())
+
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'reference': reference_cache.stats(),
+        'responses': response_cache.stats()
+    })
+
+@api.route('/api/group-commit/stats', methods=['GET'])
+def get_group_commit_stats():
+    """Batch size and commit latency of the POST routes' commits"""
+    return jsonify(group_commit.stats())
+
+# Change Feed
+@api.route('/api/events', methods=['GET'])
+def change_events():
+    """Server-Sent Events stream of committed writes (see events.py).
+
+    A reconnecting EventSource sends Last-Event-ID and receives the events it
+    missed; clients that can't set the header may pass ?last_event_id=.
+    """
+    if not change_feed.enabled:
+        return jsonify({'error': 'The change feed is disabled'}), 503
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscriber = change_feed.subscribe(last_event_id)
+    if subscriber is None:
+        return jsonify({'error': 'Too many change feed subscribers'}), 503
+    
+    response = Response(change_feed.stream(subscriber), mimetype='text/event-stream', headers=STREAM_HEADERS)
+    # Also runs when the client disconnects before the stream has started
+    response.call_on_close(lambda: change_feed.unsubscribe(subscriber))
+    return response
+
+@api.route('/api/events/stats', methods=['GET'])
+def get_change_feed_stats():
+    return jsonify(change_feed.stats())
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL, cache and group commit metrics in Prometheus text format"""
+    writer = MetricsWriter()
+    profiler.write_metrics(writer)
+    
+    responses = response_cache.stats()
+    writer.family('response_cache_requests_total', 'counter', 'Response cache lookups', [
+        ('', {'result': 'hit'}, responses['hits']),
+        ('', {'result': 'miss'}, responses['misses']),
+    ])
+    reference = reference_cache.stats()
+    writer.family('reference_cache_requests_total', 'counter', 'Reference table cache lookups', [
+        ('', {'table': table, 'result': result}, stats[key])
+        for table, stats in sorted(reference.items())
+        for result, key in (('hit', 'hits'), ('miss', 'misses'))
+    ])
+    writer.family('reference_cache_invalidations_total', 'counter', 'Reference table cache invalidations', [
+        ('', {'table': table}, stats['invalidations']) for table, stats in sorted(reference.items())
+    ])
+    
+    commits = group_commit.stats()
+    writer.family('write_batches_total', 'counter', 'Transactions committed by the POST routes',
+                  [('', None, commits['batches'])])
+    writer.family('writes_total', 'counter', 'Writes committed by the POST routes', [('', None, commits['writes'])])
+    writer.family('write_queue_length', 'gauge', 'Writes waiting for the group commit thread',
+                  [('', None, commits['queued'])])
+    
+    feed = change_feed.stats()
+    writer.family('change_feed_subscribers', 'gauge', 'Clients connected to GET /api/events',
+                  [('', None, feed['subscribers'])])
+    writer.family('change_feed_events_total', 'counter', 'Change events delivered to this process',
+                  [('', None, feed['published'])])
+    writer.family('change_feed_resyncs_total', 'counter', 'Resyncs sent to clients that fell behind',
+                  [('', None, feed['resyncs'])])
+    
+    return Response(writer.render(), mimetype='text/plain; version=0.0.4')
 
 # Loan Management
-@app.route('/api/loans', methods=['GET'])
+LOAN_PAGE_DEFAULT = 50
+LOAN_PAGE_MAX = 1000
+
+def loan_columns(loans):
+    """Columns of a serialized loan transaction, labelled with their JSON keys.
+
+    loans is Loan or one of its archive partitions (see archive.sources()).
+    """
+    return (
+        loans.id, loans.loan_type.label('type'), loans.amount, loans.date, loans.description,
+        loans.status, loans.due_date, loans.interest_rate
+    )
+
+LOAN_COLUMNS = loan_columns(Loan)
+
+def newest_first(columns):
+    """ORDER BY of the keyset-paginated newest-first lists, for a model or a fan_out() subquery"""
+    return columns.date.desc(), columns.id.desc()
+
+@api.route('/api/loans', methods=['GET'])
 def get_loans():
-    loans = db.session.query(Loan, Person.name).join(Person).all()
+    """Per-person loan totals, aggregated in SQL.
+
+    Transactions are served separately by GET /api/persons/<id>/loans; pass
+    include_transactions=1 to embed all of them as older clients expect.
+    """
+    def loan_sums(loans):
+        return [
+            func.sum(case((loans.loan_type == loan_type, loans.amount))).label(loan_type)
+            for loan_type in ('given', 'taken', 'received_back')
+        ]
+    
+    parts = archive.sources('loans')
+    if len(parts) == 1:
+        totals = db.session.query(
+            Person.id, Person.name, *loan_sums(Loan)
+        ).join(Loan, Loan.person_id == Person.id).group_by(Person.id, Person.name).all()
+    else:
+        # Per-person sums of each archive partition, added up
+        sums = union_all(*[
+            select(loans.person_id, *loan_sums(loans)).group_by(loans.person_id) for loans in parts
+        ]).subquery()
+        totals = db.session.query(
+            Person.id, Person.name,
+            *[func.sum(sums.c[loan_type]) for loan_type in ('given', 'taken', 'received_back')]
+        ).join(sums, sums.c.person_id == Person.id).group_by(Person.id, Person.name).all()
     
-    # Group by person
     loan_summary = {}
-    for loan, person_name in loans:
-        if person_name not in loan_summary:
-            loan_summary[person_name] = {
-                'person_id': loan.person_id,
-                'given': 0,
-                'taken': 0,
-                'received_back': 0,
-                'net_amount': 0,
-                'transactions': []
-            }
-        
-        amount = loan.amount
-        if loan.loan_type == 'given':
-            loan_summary[person_name]['given'] += amount
-        elif loan.loan_type == 'taken':
-            loan_summary[person_name]['taken'] += amount
-        elif loan.loan_type == 'received_back':
-            loan_summary[person_name]['received_back'] += amount
-        
-        loan_summary[person_name]['transactions'].append({
-            'id': loan.id,
-            'type': loan.loan_type,
-            'amount': amount,
-            'date': loan.date.isoformat() if loan.date else None,
-            'description': loan.description,
-            'status': loan.status,
-            'due_date': loan.due_date.isoformat() if loan.due_date else None,
-            'interest_rate': loan.interest_rate
-        })
-    
-    # Calculate net amounts
-    for person_data in loan_summary.values():
-        person_data['net_amount'] = (
-            person_data['given'] - person_data['taken'] - person_data['received_back']
-        )
+    for person_id, person_name, given, taken, received_back in totals:
+        # Coalesced here rather than in SQL so a missing total stays the integer 0
+        given, taken, received_back = given or 0, taken or 0, received_back or 0
+        loan_summary[person_name] = {
+            'person_id': person_id,
+            'given': given,
+            'taken': taken,
+            'received_back': received_back,
+            'net_amount': given - taken - received_back
+        }
+    
+    if request.args.get('include_transactions') == '1':
+        names = {data['person_id']: name for name, data in loan_summary.items()}
+        for data in loan_summary.values():
+            data['transactions'] = []
+        loans = archive.history('loans')
+        transactions = select(loans.person_id, *loan_columns(loans)).order_by(loans.id)
+        for row in db.session.execute(transactions.execution_options(yield_per=1000)):
+            loan = row._asdict()
+            loan_summary[names[loan.pop('person_id')]]['transactions'].append(loan)
     
-    return jsonify(loan_summary)
+    return fast_json.response(loan_summary)
 
-@app.route('/api/loans', methods=['POST'])
+@api.route('/api/persons/<int:person_id>/loans', methods=['GET'])
+def get_person_loans(person_id):
+    """One person's loan transactions, newest first.
+
+    Keyset-paginated on (date, id): pass limit (default 50) and the cursor
+    from the previous page's X-Next-Cursor header.
+    """
+    if db.session.get(Person, person_id) is None:
+        return jsonify({'error': 'Person not found'}), 404
+    
+    cursor_date = cursor_id = None
+    try:
+        limit = int(request.args.get('limit', LOAN_PAGE_DEFAULT))
+        if not 0 < limit <= LOAN_PAGE_MAX:
+            raise ValueError(f'limit must be between 1 and {LOAN_PAGE_MAX}')
+        if request.args.get('cursor'):
+            cursor_date, cursor_id = decode_cursor(request.args['cursor'])
+    except (ValueError, TypeError, binascii.Error) as e:
+        return jsonify({'error': f'Invalid loan query: {str(e)}'}), 400
+    
+    def build(loans):
+        query = select(*loan_columns(loans)).where(loans.person_id == person_id)
+        if cursor_date is not None:
+            query = query.where(or_(
+                loans.date < cursor_date,
+                and_(loans.date == cursor_date, loans.id < cursor_id)
+            ))
+        return query
+    
+    # The live table alone serves the page unless it reaches back into archived dates
+    loans = db.session.execute(build(Loan).order_by(*newest_first(Loan)).limit(limit + 1)).all()
+    if not archive.live_page_complete('loans', loans, limit, end_date=cursor_date):
+        query = archive.fan_out('loans', build, newest_first, limit + 1, end_date=cursor_date)
+        loans = db.session.execute(query.limit(limit + 1)).all()
+    response = fast_json.response([loan._asdict() for loan in loans[:limit]])
+    if len(loans) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(loans[limit - 1].date, loans[limit - 1].id)
+    return response
+
+@api.route('/api/loans', methods=['POST'])
 def add_loan():
     data = request.json
     
-    try:
+    def write():
         # Find or create person
-        person = Person.query.filter_by(name=data['person_name']).first()
-        if not person:
+        person_id = reference_cache.get_person_id(data['person_name'])
+        if person_id is None:
             person = Person(
                 name=data['person_name'],
                 contact=data.get('contact', ''),
@@ -267,9 +304,11 @@ def add_loan():
             )
             db.session.add(person)
             db.session.flush()
+            person_id = person.id
+            reference_cache.persons.put(person.name, person_id)
         
         loan = Loan(
-            person_id=person.id,
+            person_id=person_id,
             loan_type=data['loan_type'],
             amount=float(data['amount']),
             description=data.get('description', ''),
@@ -280,50 +319,85 @@ def add_loan():
         )
         
         db.session.add(loan)
-        db.session.commit()
+        db.session.flush()
+        record_loan_balance(loan)
+        rollups.record_loan(loan.date.strftime('%Y-%m'), loan.loan_type, loan.amount)
+        return {'id': loan.id}, {
+            'id': loan.id,
+            'person_id': person_id,
+            'person': data['person_name'],
+            'loan_type': loan.loan_type,
+            'amount': loan.amount,
+            'date': loan.date.isoformat()
+        }
+    
+    try:
+        result, event = group_commit.submit(write)
+        response_cache.bump('loans', 'persons')
+        change_feed.publish('loan', event)
         
-        return jsonify({'message': 'Loan added successfully', 'id': loan.id}), 201
+        return jsonify({'message': 'Loan added successfully', **result}), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to add loan: {str(e)}'}), 500
 
 # Committee Management
-@app.route('/api/committees', methods=['GET'])
+@api.route('/api/committees', methods=['GET'])
 def get_committees():
-    committees = Committee.query.all()
-    result = []
+    # total_paid is summed in SQL and payments are loaded in one extra query
+    paid_totals = db.session.query(
+        CommitteePayment.committee_id,
+        func.sum(CommitteePayment.amount).label('total_paid')
+    ).group_by(CommitteePayment.committee_id).subquery()
     
-    for committee in committees:
-        payments = CommitteePayment.query.filter_by(committee_id=committee.id).all()
-        total_paid = sum(p.amount for p in payments)
-        
-        result.append({
-            'id': committee.id,
-            'name': committee.name,
-            'start_date': committee.start_date.isoformat(),
-            'end_date': committee.end_date.isoformat(),
-            'monthly_amount': committee.monthly_amount,
-            'expected_receiving_amount': committee.expected_receiving_amount,
-            'expected_receiving_date': committee.expected_receiving_date.isoformat(),
-            'status': committee.status,
-            'total_paid': total_paid,
-            'payments': [{
-                'id': p.id,
-                'amount': p.amount,
-                'payment_date': p.payment_date.isoformat(),
-                'month_year': p.month_year,
-                'status': p.status
-            } for p in payments]
-        })
-    
-    return jsonify(result)
-
-@app.route('/api/committees', methods=['POST'])
+    committees = db.session.execute(select(
+        Committee.id, Committee.name, Committee.start_date, Committee.end_date,
+        Committee.monthly_amount, Committee.expected_receiving_amount,
+        Committee.expected_receiving_date, Committee.status,
+        paid_totals.c.total_paid
+    ).outerjoin(
+        paid_totals, paid_totals.c.committee_id == Committee.id
+    ).order_by(Committee.id)).all()
+    
+    payments = {}
+    for row in db.session.execute(select(
+        CommitteePayment.committee_id, CommitteePayment.id, CommitteePayment.amount,
+        CommitteePayment.payment_date, CommitteePayment.month_year, CommitteePayment.status
+    ).order_by(CommitteePayment.committee_id, CommitteePayment.id)):
+        payment = row._asdict()
+        payments.setdefault(payment.pop('committee_id'), []).append(payment)
+    
+    result = [dict(committee._asdict(), total_paid=committee.total_paid or 0, payments=payments.get(committee.id, []))
+              for committee in committees]
+    
+    return fast_json.response(result)
+
+@api.route('/api/committees/schedule', methods=['GET'])
+@response_cache.cached('committees', 'committee_payments')
+def get_committee_schedule():
+    """Paid, missed and upcoming months of every committee with arrears and projected payout.
+
+    Optional query parameters:
+      committee_id   - comma-separated ids to limit the schedule to
+      include_months - 1 to add each committee's month-by-month grid
+    """
+    try:
+        committee_ids = None
+        if request.args.get('committee_id'):
+            committee_ids = [int(value) for value in request.args['committee_id'].split(',')]
+    except ValueError as e:
+        return jsonify({'error': f'Invalid committee_id: {str(e)}'}), 400
+    
+    schedule = committee_schedule(committee_ids=committee_ids,
+                                  include_months=request.args.get('include_months') == '1')
+    return fast_json.response(schedule)
+
+@api.route('/api/committees', methods=['POST'])
 def add_committee():
     data = request.json
     
-    try:
+    def write():
         committee = Committee(
             name=data['name'],
             start_date=datetime.strptime(data['start_date'], '%Y-%m-%d').date(),
@@ -334,19 +408,31 @@ def add_committee():
         )
         
         db.session.add(committee)
-        db.session.commit()
+        db.session.flush()
+        return {'id': committee.id}, {
+            'id': committee.id,
+            'name': committee.name,
+            'monthly_amount': committee.monthly_amount,
+            'start_date': committee.start_date.isoformat(),
+            'end_date': committee.end_date.isoformat()
+        }
+    
+    try:
+        result, event = group_commit.submit(write)
+        response_cache.bump('committees')
+        change_feed.publish('committee', event)
         
-        return jsonify({'message': 'Committee added successfully', 'id': committee.id}), 201
+        return jsonify({'message': 'Committee added successfully', **result}), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to add committee: {str(e)}'}), 500
 
-@app.route('/api/committees/<int:committee_id>/payment', methods=['POST'])
+@api.route('/api/committees/<int:committee_id>/payment', methods=['POST'])
 def add_committee_payment(committee_id):
     data = request.json
     
-    try:
+    def write():
         payment_date = datetime.strptime(data.get('payment_date', date.today().isoformat()), '%Y-%m-%d').date()
         month_year = data.get('month_year', payment_date.strftime('%Y-%m'))
         
@@ -361,32 +447,61 @@ def add_committee_payment(committee_id):
         
         # Also add to expenses
         committee = Committee.query.get(committee_id)
-        committee_category = get_or_create_category("Committee")
+        committee_category_id = get_or_create_category_id("Committee")
         
         expense = Expense(
             amount=float(data['amount']),
             description=f"Committee Payment - {committee.name}",
-            category_id=committee_category.id,
+            category_id=committee_category_id,
             date=payment_date
         )
         
         db.session.add(expense)
-        db.session.commit()
+        rollups.record_committee_payment(month_year, payment.amount)
+        rollups.record_expense(payment_date.strftime('%Y-%m'), committee_category_id, expense.amount)
+        db.session.flush()
+        # The matching expense is part of the event: it counts towards the
+        # payment date's expenses as well as month_year's committee payments
+        return {'id': payment.id}, {
+            'id': payment.id,
+            'committee_id': committee_id,
+            'amount': payment.amount,
+            'payment_date': payment_date.isoformat(),
+            'month_year': month_year,
+            'expense_id': expense.id
+        }
+    
+    try:
+        result, event = group_commit.submit(write)
+        response_cache.bump('committee_payments', 'expenses', 'categories')
+        change_feed.publish('committee_payment', event)
         
-        return jsonify({'message': 'Committee payment added successfully', 'id': payment.id}), 201
+        return jsonify({'message': 'Committee payment added successfully', **result}), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to add committee payment: {str(e)}'}), 500
 
 # Expense Management
-@app.route('/api/expenses', methods=['GET'])
-def get_expenses():
-    expenses = db.session.query(
-        Expense, Category.name.label('category_name'), Category.color, Category.icon
-    ).join(Category).order_by(Expense.date.desc()).all()
-    
-    return jsonify([{
+EXPENSE_PAGE_MAX = 1000
+EXPENSE_STREAM_BATCH = 1000
+
+def expense_columns(expenses):
+    """Columns of a serialized expense, labelled with their JSON keys in the
+    order the NDJSON stream writes them.
+
+    expenses is Expense or one of its archive partitions (see archive.sources()).
+    """
+    return (
+        expenses.id, expenses.amount, expenses.description, Category.name.label('category'),
+        Category.color.label('category_color'), Category.icon.label('category_icon'),
+        expenses.date, expenses.location, expenses.notes, expenses.tags, expenses.created_at
+    )
+
+EXPENSE_COLUMNS = expense_columns(Expense)
+
+def serialize_expense(expense, category_name, color, icon):
+    return {
         'id': expense.id,
         'amount': expense.amount,
         'description': expense.description,
@@ -398,45 +513,248 @@ def get_expenses():
         'notes': expense.notes,
         'tags': expense.tags,
         'created_at': expense.created_at.isoformat() if expense.created_at else None
-    } for expense, category_name, color, icon in expenses])
+    }
+
+def expense_date_range(args):
+    """The inclusive (start_date, end_date) of an expense query; either may be None"""
+    start_date = datetime.strptime(args['start_date'], '%Y-%m-%d').date() if args.get('start_date') else None
+    end_date = datetime.strptime(args['end_date'], '%Y-%m-%d').date() if args.get('end_date') else None
+    return start_date, end_date
+
+def apply_expense_filters(query, args, expenses=Expense):
+    """Apply the server-side filters accepted by GET /api/expenses to a query on expenses"""
+    start_date, end_date = expense_date_range(args)
+    if start_date:
+        query = query.filter(expenses.date >= start_date)
+    if end_date:
+        query = query.filter(expenses.date <= end_date)
+    if args.get('category'):
+        names = [name.strip() for name in args['category'].split(',') if name.strip()]
+        query = query.filter(Category.name.in_(names))
+    if args.get('category_id'):
+        query = query.filter(expenses.category_id == int(args['category_id']))
+    if args.get('min_amount'):
+        query = query.filter(expenses.amount >= float(args['min_amount']))
+    if args.get('max_amount'):
+        query = query.filter(expenses.amount <= float(args['max_amount']))
+    if args.get('tags'):
+        for tag in parse_tags(args['tags']):
+            query = query.filter(expenses.id.in_(tagged_with(tag)))
+    return query
+
+@api.route('/api/expenses', methods=['GET'])
+def get_expenses():
+    return list_expenses(request.args)
+
+@api.route('/api/tags/<path:tag>/expenses', methods=['GET'])
+def get_tag_expenses(tag):
+    """List expenses carrying a tag; accepts the same parameters as GET /api/expenses"""
+    args = request.args.copy()
+    args['tags'] = ','.join(filter(None, [tag, args.get('tags')]))
+    return list_expenses(args)
+
+def list_expenses(args):
+    """List expenses newest first.
+
+    Optional query parameters:
+      start_date, end_date  - inclusive date range (YYYY-MM-DD)
+      category, category_id - category name(s, comma-separated) or id
+      min_amount, max_amount - inclusive amount range
+      tags                  - comma-separated tags, all must be present
+      limit, cursor         - keyset pagination on (date, id); the cursor for the
+                              next page is returned in the X-Next-Cursor header
+      format=ndjson         - stream one JSON object per line instead of a list
+    """
+    try:
+        # Pages try the live table first; streams always cover the archive partitions
+        query, limit = expense_list_query(args, live_only=args.get('format') != 'ndjson')
+    except (ValueError, TypeError, binascii.Error) as e:
+        return jsonify({'error': f'Invalid expense query: {str(e)}'}), 400
+
+    if args.get('format') == 'ndjson':
+        if limit is not None:
+            query = query.limit(limit)
+
+        def generate():
+            for row in db.session.execute(query.execution_options(yield_per=EXPENSE_STREAM_BATCH)):
+                yield json.dumps(row._asdict(), default=json_default) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    rows = db.session.execute(expense_page_query(query, limit)).all()
+    if not expense_live_page_complete(args, rows, limit):
+        query, limit = expense_list_query(args)
+        rows = db.session.execute(expense_page_query(query, limit)).all()
+    expenses, next_cursor = expense_page(rows, limit)
+    response = fast_json.response(expenses)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def expense_page_range(args):
+    """The (start_date, end_date) a page of list_expenses() can hold rows from"""
+    start_date, end_date = expense_date_range(args)
+    if args.get('cursor'):
+        cursor_date = decode_cursor(args['cursor'])[0]
+        # Rows after the cursor can't be on this page, so newer partitions are skipped
+        end_date = min(end_date, cursor_date) if end_date else cursor_date
+    return start_date, end_date
+
+def expense_live_page_complete(args, rows, limit):
+    """Whether a page read with expense_list_query(args, live_only=True) needs no archive partition"""
+    return archive.live_page_complete('expenses', rows, limit, *expense_page_range(args))
+
+def expense_list_query(args, live_only=False):
+    """Build the ordered select for list_expenses(); returns (query, limit).
+
+    The live table and every archive partition overlapping the requested
+    dates (bounded above by the cursor) each contribute their own first page.
+    live_only=True reads the live table alone, for a first attempt that
+    expense_live_page_complete() then checks.
+    """
+    start_date, end_date = expense_page_range(args)
+    cursor_date = cursor_id = None
+    if args.get('cursor'):
+        cursor_date, cursor_id = decode_cursor(args['cursor'])
+
+    limit = int(args['limit']) if args.get('limit') else None
+    if limit is not None and not 0 < limit <= EXPENSE_PAGE_MAX:
+        raise ValueError(f'limit must be between 1 and {EXPENSE_PAGE_MAX}')
+
+    def build(expenses):
+        query = select(*expense_columns(expenses)).join(Category, expenses.category_id == Category.id)
+        query = apply_expense_filters(query, args, expenses)
+        if cursor_date is not None:
+            query = query.filter(or_(
+                expenses.date < cursor_date,
+                and_(expenses.date == cursor_date, expenses.id < cursor_id)
+            ))
+        return query
+
+    if live_only:
+        return build(Expense).order_by(*newest_first(Expense)), limit
+    query = archive.fan_out('expenses', build, newest_first,
+                            limit + 1 if limit is not None else None, start_date, end_date)
+    return query, limit
+
+def expense_page_query(query, limit):
+    # Fetch one extra row to know whether another page exists
+    return query if limit is None else query.limit(limit + 1)
+
+def expense_page(rows, limit):
+    """Shape a fetched page for FastJSON; returns (expenses, cursor of the next page or None)"""
+    if limit is None:
+        return [row._asdict() for row in rows], None
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(rows[limit - 1].date, rows[limit - 1].id)
+    return [row._asdict() for row in rows[:limit]], next_cursor
+
+@api.route('/api/expenses/search', methods=['GET'])
+def search_expenses_route():
+    """Ranked full-text search over description, notes, location and tags.
+
+    Query parameters: q (words, matched as prefixes), tag (exact tag),
+    limit (default 20, max 100) and offset. Matches are wrapped in <mark>
+    tags in each result's highlights.
+    """
+    if not search_supported(db.engine):
+        return jsonify({'error': 'Full-text search requires SQLite FTS5'}), 501
+    
+    q = request.args.get('q', '').strip()
+    tag = request.args.get('tag', '').strip()
+    if not q and not tag:
+        return jsonify({'error': 'q or tag is required'}), 400
+    
+    try:
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+        if not 0 < limit <= 100 or offset < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit must be 1-100 and offset non-negative'}), 400
+    
+    total, rows = search_expenses(q, tag, limit, offset)
+    
+    results = []
+    for expense, category_name, color, icon, highlights, rank in rows:
+        result = serialize_expense(expense, category_name, color, icon)
+        result['highlights'] = highlights
+        result['rank'] = rank
+        results.append(result)
+    
+    return jsonify({
+        'query': q,
+        'tag': tag or None,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'results': results
+    })
 
-@app.route('/api/expenses', methods=['POST'])
+@api.route('/api/expenses', methods=['POST'])
 def add_expense():
     data = request.json
     
-    try:
-        category = get_or_create_category(data.get('category', 'Others'))
+    def write():
+        category_id = get_or_create_category_id(data.get('category', 'Others'))
         
         expense = Expense(
             amount=float(data['amount']),
             description=data['description'],
-            category_id=category.id,
+            category_id=category_id,
             date=datetime.strptime(data.get('date', date.today().isoformat()), '%Y-%m-%d').date(),
             location=data.get('location', ''),
             notes=data.get('notes', ''),
-            tags=data.get('tags', '')
+            tags=format_tags(data.get('tags'))
         )
         
         db.session.add(expense)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Expense added successfully',
+        db.session.flush()
+        index_expense_tags([(expense.id, expense.tags)])
+        rollups.record_expense(expense.date.strftime('%Y-%m'), category_id, expense.amount)
+        result = {
             'id': expense.id,
             'amount': expense.amount,
             'date': expense.date.isoformat()
-        }), 201
+        }
+        return result, dict(result, category=data.get('category', 'Others'))
+    
+    try:
+        result, event = group_commit.submit(write)
+        response_cache.bump('expenses', 'categories')
+        change_feed.publish('expense', event)
+        
+        return jsonify({'message': 'Expense added successfully', **result}), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to add expense: {str(e)}'}), 500
 
+# Tags
+@api.route('/api/tags', methods=['GET'])
+@response_cache.cached('expenses')
+def get_tag_totals():
+    """Spend per tag, optionally limited to an inclusive start_date/end_date range"""
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() \
+            if request.args.get('start_date') else None
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() \
+            if request.args.get('end_date') else None
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {str(e)}'}), 400
+    
+    return jsonify([
+        {'name': name, 'total': total, 'count': count}
+        for name, total, count in tag_totals(start_date, end_date)
+    ])
+
 # Monthly Income
-@app.route('/api/income', methods=['POST'])
+@api.route('/api/income', methods=['POST'])
 def add_monthly_income():
     data = request.json
     
-    try:
+    def write():
         income = MonthlyIncome(
             amount=float(data['amount']),
             month_year=data['month_year'],
@@ -444,51 +762,208 @@ def add_monthly_income():
         )
         
         db.session.add(income)
-        db.session.commit()
+        rollups.record_income(income.month_year, income.amount)
+        db.session.flush()
+        return {'id': income.id}, {
+            'id': income.id,
+            'amount': income.amount,
+            'month_year': income.month_year,
+            'source': income.source
+        }
+    
+    try:
+        result, event = group_commit.submit(write)
+        response_cache.bump('monthly_income')
+        change_feed.publish('income', event)
         
-        return jsonify({'message': 'Income added successfully', 'id': income.id}), 201
+        return jsonify({'message': 'Income added successfully', **result}), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to add income: {str(e)}'}), 500
 
+# Bulk Import
+@api.route('/api/import', methods=['POST'])
+def bulk_import():
+    """Import expenses, loans or income from a CSV or NDJSON body.
+
+    Query parameters:
+      type       - expenses, loans or income (required)
+      format     - csv or ndjson; guessed from the Content-Type when omitted
+      chunk_size - rows per insert batch and transaction
+
+    The data can be the raw request body or a multipart upload named "file".
+    Rows use the same fields as the matching single-row POST endpoint.
+    """
+    # The importer and exporter are loaded by the first request that uses them
+    from importer import IMPORTERS, DEFAULT_CHUNK_SIZE, ImportAborted, import_rows, read_rows
+    
+    entity = request.args.get('type')
+    if entity not in IMPORTERS:
+        return jsonify({'error': f"type must be one of: {', '.join(IMPORTERS)}"}), 400
+    
+    upload = request.files.get('file')
+    mimetype = upload.mimetype if upload else request.mimetype
+    file_format = request.args.get('format') or ('ndjson' if 'json' in (mimetype or '') else 'csv')
+    if file_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    try:
+        chunk_size = int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        if chunk_size < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+    
+    stream = upload.stream if upload else request.stream
+    lines = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    
+    try:
+        report = import_rows(entity, read_rows(lines, file_format), chunk_size)
+    except ImportAborted as e:
+        # The report counts the chunks committed before the input broke off
+        return jsonify({'error': f'Failed to import: {str(e)}', 'report': e.report}), 400
+    finally:
+        # Earlier chunks may have been committed even if a later one failed
+        response_cache.bump(*IMPORTERS[entity].tables)
+        # Too many rows for deltas: subscribers reload what the import touched
+        change_feed.publish('import', {'type': entity})
+    
+    return jsonify(report), 200
+
+# Export
+@api.route('/api/export', methods=['GET'])
+def export_data():
+    """Stream an export for accounting.
+
+    Query parameters:
+      type                 - ledger (default), expenses, loans, committee_payments or income
+      start_date, end_date - inclusive date range (YYYY-MM-DD)
+      format               - csv (default) or parquet (requires pyarrow)
+    """
+    from exporter import EXPORTS, iter_csv, iter_parquet, parquet_available
+    
+    entity = request.args.get('type', 'ledger')
+    if entity not in EXPORTS:
+        return jsonify({'error': f"type must be one of: {', '.join(EXPORTS)}"}), 400
+    
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    file_format = request.args.get('format', 'csv')
+    if file_format == 'csv':
+        chunks, mimetype = iter_csv(entity, start_date, end_date), 'text/csv'
+    elif file_format == 'parquet':
+        if not parquet_available():
+            return jsonify({'error': 'Parquet export requires the pyarrow package'}), 501
+        chunks, mimetype = iter_parquet(entity, start_date, end_date), 'application/vnd.apache.parquet'
+    else:
+        return jsonify({'error': 'format must be csv or parquet'}), 400
+    
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={entity}.{file_format}'
+    return response
+
 # Analytics endpoints
-@app.route('/api/analytics/last-20-days', methods=['GET'])
+@api.route('/api/analytics/last-20-days', methods=['GET'])
+@response_cache.cached('expenses')
 def last_20_days_analytics():
+    total_amount, transaction_count = db.session.execute(last_20_days_query()).one()
+    return jsonify(last_20_days_payload(total_amount, transaction_count))
+
+def last_20_days_query():
     cutoff_date = date.today() - timedelta(days=20)
+    # The live table alone unless a partition still holds such recent dates
+    expenses = archive.history('expenses', cutoff_date)
     
-    # Get expenses from last 20 days
-    expenses = Expense.query.filter(Expense.date >= cutoff_date).all()
-    
-    total_amount = sum(exp.amount for exp in expenses)
-    transaction_count = len(expenses)
+    # Sum and count in SQL rather than loading every expense
+    return select(
+        func.sum(expenses.amount),
+        func.count(expenses.id)
+    ).where(expenses.date >= cutoff_date)
+
+def last_20_days_payload(total_amount, transaction_count):
+    total_amount = total_amount or 0
     daily_average = total_amount / 20 if total_amount > 0 else 0
     
-    return jsonify({
+    return {
         'total_amount': total_amount,
         'transaction_count': transaction_count,
         'daily_average': daily_average,
         'period_days': 20
-    })
+    }
+
+@api.route('/api/analytics/trends', methods=['GET'])
+@response_cache.cached('expenses', 'categories')
+def get_expense_trends():
+    """Vectorized expense trends.
+
+    Query parameters:
+      granularity - day, week or month (default month)
+      window      - rolling window length in periods
+      start, end  - inclusive date range (YYYY-MM-DD) of at most 3660 periods;
+                    defaults to the last 90 days / 52 weeks / 12 months
+      percentiles - comma-separated amount percentiles per period (default 50,90,99)
+    """
+    # NumPy is only loaded by the first trends request, not at startup
+    from analytics_engine import GRANULARITIES, DEFAULT_PERCENTILES, check_range, default_start, trends
+    
+    args = request.args
+    granularity = args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400
+    
+    try:
+        end_date = datetime.strptime(args['end'], '%Y-%m-%d').date() if args.get('end') else date.today()
+        start_date = datetime.strptime(args['start'], '%Y-%m-%d').date() if args.get('start') else default_start(end_date, granularity)
+        window = int(args['window']) if args.get('window') else None
+        percentiles = [float(p) for p in args['percentiles'].split(',')] if args.get('percentiles') else DEFAULT_PERCENTILES
+        if start_date > end_date:
+            raise ValueError('start must not be after end')
+        if window is not None and not 1 <= window <= 366:
+            raise ValueError('window must be between 1 and 366')
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise ValueError('percentiles must be between 0 and 100')
+        check_range(start_date, end_date, granularity, window)
+    except (ValueError, OverflowError) as e:
+        # OverflowError: a default start before year 1
+        return jsonify({'error': f'Invalid trends query: {str(e)}'}), 400
+    
+    category_names = {row['id']: row['name'] for row in reference_cache.categories.get().rows}
+    return jsonify(trends(start_date, end_date, granularity, window, percentiles, category_names))
 
-@app.route('/api/analytics/monthly-summary', methods=['GET'])
+@api.route('/api/analytics/monthly-summary', methods=['GET'])
+@response_cache.cached('expenses', 'categories', 'committee_payments', 'monthly_income')
 def get_monthly_summary():
-    # Get last 12 months of data
+    expenses_query, totals_query = monthly_summary_queries()
+    return jsonify(monthly_summary_payload(
+        db.session.execute(expenses_query).all(),
+        db.session.execute(totals_query).scalars().all()
+    ))
+
+def monthly_summary_queries():
+    # Get last 12 months of data from the materialized rollups
     end_date = date.today()
-    start_date = date(end_date.year - 1, end_date.month, 1)
+    start_month = date(end_date.year - 1, end_date.month, 1).strftime('%Y-%m')
     
     # Monthly expenses by category
-    monthly_expenses = db.session.query(
-        func.strftime('%Y-%m', Expense.date).label('month'),
+    monthly_expenses = select(
+        MonthlyRollup.month,
         Category.name.label('category'),
-        func.sum(Expense.amount).label('total')
-    ).join(Category).filter(
-        Expense.date >= start_date
-    ).group_by(
-        func.strftime('%Y-%m', Expense.date),
-        Category.name
-    ).order_by('month').all()
+        MonthlyRollup.total
+    ).join(Category).where(
+        MonthlyRollup.month >= start_month
+    ).order_by(MonthlyRollup.month)
+    
+    # Income and committee payments
+    monthly_totals = select(MonthlyTotal).where(MonthlyTotal.month >= start_month)
     
+    return monthly_expenses, monthly_totals
+
+def monthly_summary_payload(monthly_expenses, monthly_totals):
     # Organize by month
     summary = {}
     for month, category, total in monthly_expenses:
@@ -497,28 +972,16 @@ def get_monthly_summary():
         summary[month]['expenses'][category] = total
         summary[month]['total_expenses'] += total
     
-    # Add income data
-    incomes = MonthlyIncome.query.filter(
-        MonthlyIncome.month_year >= start_date.strftime('%Y-%m')
-    ).all()
-    
-    for income in incomes:
-        if income.month_year not in summary:
-            summary[income.month_year] = {'expenses': {}, 'total_expenses': 0}
-        if 'income' not in summary[income.month_year]:
-            summary[income.month_year]['income'] = 0
-        summary[income.month_year]['income'] += income.amount
-    
-    # Add committee payments
-    committee_payments = db.session.query(
-        CommitteePayment.month_year,
-        func.sum(CommitteePayment.amount).label('total')
-    ).group_by(CommitteePayment.month_year).all()
-    
-    for month_year, total in committee_payments:
-        if month_year in summary:
-            summary[month_year]['committee_payments'] = total
-            summary[month_year]['total_expenses'] += total
+    # Add income and committee payments
+    for totals in monthly_totals:
+        if totals.income is not None:
+            if totals.month not in summary:
+                summary[totals.month] = {'expenses': {}, 'total_expenses': 0}
+            summary[totals.month]['income'] = totals.income
+        
+        if totals.committee_payments is not None and totals.month in summary:
+            summary[totals.month]['committee_payments'] = totals.committee_payments
+            summary[totals.month]['total_expenses'] += totals.committee_payments
     
     # Calculate savings
     for month_data in summary.values():
@@ -526,78 +989,104 @@ def get_monthly_summary():
         total_exp = month_data.get('total_expenses', 0)
         month_data['savings'] = income - total_exp
     
-    return jsonify(summary)
+    return summary
 
-@app.route('/api/analytics/loan-timeline', methods=['GET'])
+@api.route('/api/analytics/loan-timeline', methods=['GET'])
+@response_cache.cached('loans', 'persons')
 def get_loan_timeline():
-    # Get all loans ordered by date
-    loans = Loan.query.order_by(Loan.date).all()
-    
-    timeline = []
-    cumulative_net = 0
-    
-    for loan in loans:
-        if loan.loan_type == 'given':
-            cumulative_net += loan.amount
-        elif loan.loan_type == 'taken':
-            cumulative_net -= loan.amount
-        elif loan.loan_type == 'received_back':
-            cumulative_net -= loan.amount
-        
-        timeline.append({
-            'date': loan.date.isoformat() if loan.date else None,
-            'month': loan.date.strftime('%Y-%m') if loan.date else None,
-            'type': loan.loan_type,
-            'amount': loan.amount,
-            'cumulative_net': cumulative_net,
-            'person': loan.person.name,
-            'description': loan.description
-        })
+    """Loans in date order with their running net balance.
+
+    Balances are stored on each loan, so a window can start anywhere without
+    replaying earlier history. Optional query parameters:
+      from, to - inclusive date range (YYYY-MM-DD)
+      limit    - maximum number of entries; when more remain, the cursor for
+                 the next window is returned in the X-Next-Cursor header
+      cursor   - continue after a previous window
+    """
+    try:
+        query, limit = loan_timeline_query(request.args)
+    except (ValueError, TypeError, binascii.Error) as e:
+        return jsonify({'error': f'Invalid timeline query: {str(e)}'}), 400
+    
+    timeline, next_cursor = loan_timeline_page(db.session.execute(query).all(), limit)
+    response = fast_json.response(timeline)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def loan_timeline_query(args):
+    """Build the select for get_loan_timeline(); returns (query, limit)"""
+    start_date = datetime.strptime(args['from'], '%Y-%m-%d').date() if args.get('from') else None
+    end_date = datetime.strptime(args['to'], '%Y-%m-%d').date() if args.get('to') else None
+    cursor_date = cursor_id = None
+    if args.get('cursor'):
+        cursor_date, cursor_id = decode_cursor(args['cursor'])
+    limit = int(args['limit']) if args.get('limit') else None
+    if limit is not None and limit < 1:
+        raise ValueError('limit must be positive')
+    
+    def build(loans):
+        query = select(
+            loans.id, loans.date, loans.loan_type, loans.amount, loans.cumulative_net,
+            Person.name, loans.description
+        ).join(Person, loans.person_id == Person.id)
+        if start_date:
+            query = query.where(loans.date >= start_date)
+        if end_date:
+            query = query.where(loans.date <= end_date)
+        if cursor_date is not None:
+            query = query.where(or_(
+                loans.date > cursor_date,
+                and_(loans.date == cursor_date, loans.id > cursor_id)
+            ))
+        return query
     
-    return jsonify(timeline)
+    # Windows reach into the archive partitions only while they cover archived dates
+    earliest = max(start_date, cursor_date) if start_date and cursor_date else start_date or cursor_date
+    query = archive.fan_out(
+        'loans', build, lambda c: (c.date, c.id),
+        limit + 1 if limit is not None else None, earliest, end_date
+    )
+    return (query.limit(limit + 1) if limit is not None else query), limit
 
-@app.route('/api/analytics/net-values/<string:month>', methods=['GET'])
+def loan_timeline_page(loans, limit):
+    """Shape fetched timeline rows for FastJSON; returns (timeline, cursor of the next window or None)"""
+    timeline = [{
+        'date': loan_date,
+        'month': loan_date.strftime('%Y-%m') if loan_date else None,
+        'type': loan_type,
+        'amount': amount,
+        'cumulative_net': cumulative_net,
+        'person': person_name,
+        'description': description
+    } for _, loan_date, loan_type, amount, cumulative_net, person_name, description in loans[:limit]]
+    
+    next_cursor = None
+    if limit is not None and len(loans) > limit:
+        last = loans[limit - 1]
+        next_cursor = encode_cursor(last.date, last.id)
+    return timeline, next_cursor
+
+@api.route('/api/analytics/net-values/<string:month>', methods=['GET'])
+@response_cache.cached('expenses', 'committee_payments', 'loans', 'monthly_income')
 def get_net_values_for_month(month):
     """Get all net values for a specific month (format: YYYY-MM)"""
     
     # Parse month
     try:
-        year, month_num = month.split('-')
-        year = int(year)
-        month_num = int(month_num)
+        totals = financial_totals(month=month, loan_month=month)
     except ValueError:
         return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
     
-    # Expenses for the month
-    monthly_expenses = db.session.query(func.sum(Expense.amount)).filter(
-        func.strftime('%Y-%m', Expense.date) == month
-    ).scalar() or 0
-    
-    # Committee payments for the month
-    committee_payments = db.session.query(func.sum(CommitteePayment.amount)).filter(
-        CommitteePayment.month_year == month
-    ).scalar() or 0
-    
-    # Loan data for the month
-    loan_given = db.session.query(func.sum(Loan.amount)).filter(
-        func.strftime('%Y-%m', Loan.date) == month,
-        Loan.loan_type == 'given'
-    ).scalar() or 0
-    
-    loan_taken = db.session.query(func.sum(Loan.amount)).filter(
-        func.strftime('%Y-%m', Loan.date) == month,
-        Loan.loan_type == 'taken'
-    ).scalar() or 0
-    
-    loan_received_back = db.session.query(func.sum(Loan.amount)).filter(
-        func.strftime('%Y-%m', Loan.date) == month,
-        Loan.loan_type == 'received_back'
-    ).scalar() or 0
-    
-    # Income for the month
-    monthly_income = db.session.query(func.sum(MonthlyIncome.amount)).filter(
-        MonthlyIncome.month_year == month
-    ).scalar() or 0
+    return jsonify(net_values_payload(month, totals))
+
+def net_values_payload(month, totals):
+    monthly_expenses = totals['expenses']
+    committee_payments = totals['committee_payments']
+    loan_given = totals['given']
+    loan_taken = totals['taken']
+    loan_received_back = totals['received_back']
+    monthly_income = totals['income']
     
     # Calculations
     total_expenses = monthly_expenses + committee_payments
@@ -605,7 +1094,7 @@ def get_net_values_for_month(month):
     total_savings = monthly_income - total_expenses
     net_worth = total_savings + net_loan
     
-    return jsonify({
+    return {
         'month': month,
         'loan_given': loan_given,
         'loan_taken': loan_taken,
@@ -616,67 +1105,45 @@ def get_net_values_for_month(month):
         'committee_payments': committee_payments,
         'total_savings': total_savings,
         'net_worth': net_worth
-    })
+    }
 
 # Helper functions
-def get_or_create_category(name):
-    category = Category.query.filter_by(name=name).first()
-    if not category:
-        colors = ['#e74c3c', '#3498db', '#9b59b6', '#f39c12', '#e67e22', '#27ae60', '#95a5a6', '#34495e', '#1abc9c', '#8e44ad']
-        icons = ['fas fa-utensils', 'fas fa-car', 'fas fa-gamepad', 'fas fa-shopping-bag', 
-                'fas fa-home', 'fas fa-dumbbell', 'fas fa-bus', 'fas fa-graduation-cap',
-                'fas fa-plane', 'fas fa-users', 'fas fa-circle']
-        
-        category_count = Category.query.count()
-        category = Category(
-            name=name,
-            color=colors[category_count % len(colors)],
-            icon=icons[category_count % len(icons)]
-        )
-        db.session.add(category)
+def get_or_create_category_id(name):
+    category = reference_cache.categories.get().by_name.get(name)
+    if category is None:
+        # Another worker may have created it since our snapshot was taken
+        reference_cache.categories.invalidate()
+        snapshot = reference_cache.categories.get()
+        category = snapshot.by_name.get(name)
+    if category is None:
+        color, icon = Category.default_style(len(snapshot.rows))
+        new_category = Category(name=name, color=color, icon=icon)
+        db.session.add(new_category)
         db.session.flush()
-    return category
-
-def init_default_data():
-    # Create default categories if they don't exist
-    default_categories = [
-        ('Food', '#e74c3c', 'fas fa-utensils'),
-        ('Shopping', '#f39c12', 'fas fa-shopping-bag'),
-        ('Home', '#27ae60', 'fas fa-home'),
-        ('Sports', '#9b59b6', 'fas fa-dumbbell'),
-        ('Commute', '#34495e', 'fas fa-bus'),
-        ('Education', '#e67e22', 'fas fa-graduation-cap'),
-        ('Trip', '#1abc9c', 'fas fa-plane'),
-        ('Committee', '#8e44ad', 'fas fa-users'),
-        ('Others', '#95a5a6', 'fas fa-circle')
-    ]
-    
-    for name, color, icon in default_categories:
-        if not Category.query.filter_by(name=name).first():
-            category = Category(name=name, color=color, icon=icon)
-            db.session.add(category)
-    
-    # Create default payment methods
-    default_payment_methods = [
-        ('Cash', 'cash', 'Physical cash payments'),
-        ('Credit Card', 'card', 'Credit card payments'),
-        ('Debit Card', 'card', 'Debit card payments'),
-        ('Bank Transfer', 'transfer', 'Online bank transfers'),
-        ('Mobile Wallet', 'digital', 'Mobile wallet payments'),
-        ('UPI', 'digital', 'UPI payments'),
-        ('Cheque', 'cheque', 'Cheque payments'),
-        ('Other', 'other', 'Other payment methods')
-    ]
-    
-    for name, type_val, details in default_payment_methods:
-        if not PaymentMethod.query.filter_by(name=name).first():
-            method = PaymentMethod(name=name, type=type_val, details=details)
-            db.session.add(method)
-    
-    db.session.commit()
+        reference_cache.categories.invalidate()
+        return new_category.id
+    return category['id']
+
+def encode_cursor(row_date, row_id):
+    """Opaque keyset cursor for lists ordered by (date, id)"""
+    raw = f"{row_date.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    date_str, row_id = raw.split('|')
+    return datetime.strptime(date_str, '%Y-%m-%d').date(), int(row_id)
+
+def cached_reference_response(snapshot):
+    """JSON response for a reference snapshot that supports conditional GETs"""
+    response = jsonify(snapshot.rows)
+    response.set_etag(snapshot.etag)
+    response.last_modified = snapshot.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        init_default_data()
-    app.run(debug=True, host='127.0.0.1', port=5000)
+    from bootstrap import create_app
+
+    # Development server only; see wsgi.py and gunicorn.conf.py for production
+    create_app().run(debug=os.environ.get('FLASK_DEBUG', '1') == '1', host='127.0.0.1', port=5000)
@@ -0,0 +1,290 @@
+"""Per-year archive partitions for old expenses and loans.
+
+archive() moves expenses and loans dated before a cutoff out of the live
+tables into one table per entity and year (expenses_archive_2022,
+loans_archive_2022, ...) with the same columns and indexes. Each partition
+is registered in archive_partitions with the dates it spans and its totals
+per kind in archive_totals. Rollups, stored loan balances and tag links are
+left alone: rows only change tables, so every precomputed figure stays valid.
+That is why expense_tags.expense_id has no foreign key to expenses (a link
+to an archived expense would violate it); verify_archive() checks the links
+instead.
+
+Queries pick their sources by date range:
+  sources()  - the live model plus an aliased model per partition whose dates
+               overlap the range, for per-source statements (sums that are
+               added up, row lookups)
+  history()  - the model mapped onto the UNION ALL of those sources, for
+               scans that don't care where a row lives
+  fan_out()  - one ordered select over sources() for keyset pages; each
+               source contributes only its first `limit` rows
+When no partition overlaps, all three use the live model alone, so queries
+on recent data (the dashboard, the last 20 days) never touch an archive
+table. Newest-first pages read the live table first and only fan out when
+live_page_complete() says the page reaches back into archived dates.
+All-time totals add archive_totals instead of scanning the partitions.
+
+The partition list is cached per process like the reference tables, so
+servers see partitions archived by another process within REFERENCE_TTL
+seconds.
+"""
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import Column, Index, MetaData, Table, and_, delete, extract, func, insert, select, union_all
+from sqlalchemy.orm import aliased
+
+from models import db, ArchivePartition, ArchiveTotal, Expense, ExpenseTag, Loan
+from reference_cache import TableCache
+
+ARCHIVED_MODELS = {'expenses': Expense, 'loans': Loan}
+DEFAULT_HORIZON_MONTHS = 24
+
+# Kept out of db.metadata so create_all and the schema stamp only cover the live schema
+archive_metadata = MetaData()
+_tables_lock = threading.Lock()
+# One aliased model per partition, reused so statements hit SQLAlchemy's compiled cache
+_entities = {}
+
+
+def partition_table(entity, year):
+    """The archive table of an entity for a year (created by archive(), not here)"""
+    name = f'{entity}_archive_{year}'
+    with _tables_lock:
+        if name in archive_metadata.tables:
+            return archive_metadata.tables[name]
+        live = ARCHIVED_MODELS[entity].__table__
+        # Columns are keyed by their database name so aliased(adapt_on_names=True) maps the model onto them
+        table = Table(name, archive_metadata, *[
+            Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+            for column in live.columns
+        ])
+        for index in live.indexes:
+            Index(index.name.replace(live.name, name, 1), *[table.c[column.name] for column in index.columns])
+        return table
+
+
+def _load_partitions():
+    return [{
+        'name': partition.table_name,
+        'entity': partition.entity,
+        'year': partition.year,
+        'first_date': partition.first_date,
+        'last_date': partition.last_date
+    } for partition in ArchivePartition.query.order_by(ArchivePartition.entity, ArchivePartition.year)]
+
+
+partitions_cache = TableCache(_load_partitions)
+
+
+def partitions(entity, start_date=None, end_date=None, fresh=False):
+    """Registered partitions of an entity holding rows dated within [start_date, end_date].
+
+    fresh=True reads the registry instead of the cache, for writes that must
+    not miss a partition archived by another process moments ago.
+    """
+    registered = _load_partitions() if fresh else partitions_cache.get().rows
+    return [
+        partition for partition in registered
+        if partition['entity'] == entity and partition['first_date'] is not None
+        and (start_date is None or partition['last_date'] >= start_date)
+        and (end_date is None or partition['first_date'] <= end_date)
+    ]
+
+
+def partition_entity(entity, year):
+    """The model mapped onto the archive table of an entity for a year"""
+    name = f'{entity}_archive_{year}'
+    if name not in _entities:
+        table = partition_table(entity, year)
+        _entities[name] = aliased(ARCHIVED_MODELS[entity], table, name=name, adapt_on_names=True)
+    return _entities[name]
+
+
+def sources(entity, start_date=None, end_date=None, fresh=False):
+    """The live model followed by one aliased model per overlapping partition"""
+    return [ARCHIVED_MODELS[entity]] + [
+        partition_entity(entity, partition['year'])
+        for partition in partitions(entity, start_date, end_date, fresh)
+    ]
+
+
+def history(entity, start_date=None, end_date=None):
+    """The model, or the model mapped onto the live rows UNION ALL the overlapping partitions"""
+    model = ARCHIVED_MODELS[entity]
+    overlapping = partitions(entity, start_date, end_date)
+    if not overlapping:
+        return model
+    union = union_all(select(model.__table__), *[
+        select(partition_table(entity, partition['year'])) for partition in overlapping
+    ])
+    return aliased(model, union.subquery(f'{entity}_history'))
+
+
+def fan_out(entity, build, order_by, limit=None, start_date=None, end_date=None):
+    """Ordered select of build(source) over the live table and the overlapping partitions.
+
+    build returns the select for one source; order_by maps a collection of
+    its selected columns to ORDER BY terms. With a limit each source is cut
+    to its own first rows (one index scan each) before they are merged;
+    callers still apply the limit to the merged select.
+    """
+    parts = sources(entity, start_date, end_date)
+    if len(parts) == 1:
+        query = build(parts[0])
+        return query.order_by(*order_by(query.selected_columns))
+
+    branches = []
+    for source in parts:
+        branch = build(source)
+        if limit is not None:
+            branch = branch.order_by(*order_by(branch.selected_columns)).limit(limit)
+        branches.append(select(branch.subquery()))
+    merged = union_all(*branches).subquery(f'{entity}_history')
+    return select(merged).order_by(*order_by(merged.c))
+
+
+def live_page_complete(entity, rows, limit, start_date=None, end_date=None):
+    """Whether a newest-first page read from the live table alone is the full answer.
+
+    rows is the live result of a query with LIMIT limit + 1. It is complete
+    when no partition overlaps the range, or when it filled the page and its
+    last row is newer than anything archived in the range. Otherwise the
+    caller runs the fan_out() query.
+    """
+    overlapping = partitions(entity, start_date, end_date)
+    if not overlapping:
+        return True
+    if limit is None or len(rows) <= limit:
+        return False
+    return rows[limit - 1].date > max(partition['last_date'] for partition in overlapping)
+
+
+def archive_cutoff(horizon_months, today=None):
+    """First day of the month horizon_months before the current one"""
+    today = today or date.today()
+    month = today.year * 12 + today.month - 1 - horizon_months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_totals(entity, table):
+    """{kind: (total, row count)} of the rows in a partition table"""
+    amount = table.c[ARCHIVED_MODELS[entity].amount.name]
+    if entity == 'loans':
+        query = select(table.c.loan_type, func.sum(amount), func.count()).group_by(table.c.loan_type)
+        return {kind: (total, count) for kind, total, count in db.session.execute(query)}
+    total, count = db.session.execute(select(func.sum(amount), func.count()).select_from(table)).one()
+    return {entity: (total, count)} if count else {}
+
+
+def refresh_partition(entity, year):
+    """Record a partition's date span and totals from what its table holds now"""
+    table = partition_table(entity, year)
+    first_date, last_date = db.session.execute(select(func.min(table.c.date), func.max(table.c.date))).one()
+    partition = db.session.get(ArchivePartition, table.name) or ArchivePartition(
+        table_name=table.name, entity=entity, year=year
+    )
+    partition.first_date = first_date
+    partition.last_date = last_date
+    partition.archived_at = datetime.utcnow()
+    db.session.add(partition)
+
+    db.session.execute(delete(ArchiveTotal).where(ArchiveTotal.table_name == table.name))
+    db.session.add_all(
+        ArchiveTotal(table_name=table.name, kind=kind, total=total, row_count=count)
+        for kind, (total, count) in partition_totals(entity, table).items()
+    )
+
+
+def archive(before):
+    """Move expenses and loans dated before `before` into their year's partition.
+
+    Each year is moved in its own transaction. The newest row of a table is
+    never moved: SQLite numbers new rows max(id) + 1, so archiving it would
+    let its id be handed out again. Deleting expenses drops them from the
+    search index, so the partition is re-indexed in the same transaction.
+    Returns {partition table name: rows moved}.
+    """
+    # search imports this module
+    from search import index_table
+
+    moved = {}
+    for entity, model in ARCHIVED_MODELS.items():
+        live = model.__table__
+        newest_id = db.session.execute(select(func.max(live.c.id))).scalar()
+        if newest_id is None:
+            continue
+        eligible = and_(live.c.date < before, live.c.id < newest_id)
+        years = db.session.execute(select(extract('year', live.c.date)).where(eligible).distinct()).scalars()
+
+        for year in sorted(int(year) for year in years):
+            table = partition_table(entity, year)
+            table.create(db.session.connection(), checkfirst=True)
+            rows = and_(eligible, live.c.date >= date(year, 1, 1), live.c.date < date(year + 1, 1, 1))
+            db.session.execute(insert(table).from_select(list(table.c), select(live).where(rows)))
+            moved[table.name] = db.session.execute(delete(live).where(rows)).rowcount
+            if entity == 'expenses':
+                index_table(db.session.connection(), table.name)
+            refresh_partition(entity, year)
+            db.session.commit()
+
+    partitions_cache.invalidate()
+    return moved
+
+
+def verify_archive():
+    """Check the partitions against the registry and the live tables.
+
+    Returns a list of problems, empty when everything is consistent: every
+    registered table exists with the recorded date span and totals, its rows
+    belong to its year, no id is stored in more than one place and every tag
+    link points at an expense stored somewhere.
+    """
+    problems = []
+    registered = ArchivePartition.query.order_by(ArchivePartition.entity, ArchivePartition.year).all()
+    stored_totals = {}
+    for total in ArchiveTotal.query:
+        stored_totals.setdefault(total.table_name, {})[total.kind] = (total.total, total.row_count)
+
+    existing_tables = set(db.inspect(db.engine).get_table_names())
+    missing = False
+    for partition in registered:
+        table = partition_table(partition.entity, partition.year)
+        if table.name not in existing_tables:
+            problems.append(f'{table.name}: registered but the table is missing')
+            missing = True
+            continue
+
+        first_date, last_date = db.session.execute(select(func.min(table.c.date), func.max(table.c.date))).one()
+        if (first_date, last_date) != (partition.first_date, partition.last_date):
+            problems.append(f'{table.name}: holds {first_date}..{last_date}, '
+                            f'registered as {partition.first_date}..{partition.last_date}')
+        if first_date is not None and (first_date.year != partition.year or last_date.year != partition.year):
+            problems.append(f'{table.name}: holds rows outside {partition.year}')
+
+        actual = partition_totals(partition.entity, table)
+        expected = stored_totals.get(table.name, {})
+        for kind in actual.keys() | expected.keys():
+            if actual.get(kind) != expected.get(kind):
+                problems.append(f'{table.name}: {kind} total/count is {actual.get(kind)}, '
+                                f'registered as {expected.get(kind)}')
+
+    if missing:
+        return problems
+    for entity in ARCHIVED_MODELS:
+        ids = union_all(*[select(source.id.label('id')) for source in sources(entity, fresh=True)]).subquery()
+        duplicates = db.session.execute(
+            select(ids.c.id).group_by(ids.c.id).having(func.count() > 1).limit(10)
+        ).scalars().all()
+        if duplicates:
+            problems.append(f'{entity}: ids stored more than once: {", ".join(map(str, duplicates))}')
+
+    expense_ids = union_all(*[select(source.id) for source in sources('expenses', fresh=True)])
+    orphaned = db.session.execute(
+        select(ExpenseTag.expense_id).where(ExpenseTag.expense_id.not_in(expense_ids)).distinct().limit(10)
+    ).scalars().all()
+    if orphaned:
+        problems.append(f'expense_tags: links to missing expenses: {", ".join(map(str, orphaned))}')
+
+    return problems
+
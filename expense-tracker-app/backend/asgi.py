@@ -0,0 +1,297 @@
+"""Async entry point for the polled read endpoints.
+
+    uvicorn asgi:create_application --factory --host 127.0.0.1 --port 5000
+
+The dashboard, status, analytics and expense/loan listing GETs are served on
+the event loop through an async SQLAlchemy engine (aiosqlite for SQLite,
+asyncpg for Postgres), so a slow query no longer holds a worker thread while
+other polls queue behind it. They build the same statements and JSON as the
+Flask views in app.py. Every other request, including all writes, is handed
+to the Flask app unchanged (in a thread pool, via asgiref).
+
+Endpoints cached by the response cache in app.py are cached here too, under
+the same keys, and every request on the async path is recorded in the
+/api/metrics request metrics under its Flask endpoint name. Cache lookups
+and loading the archive partition list run in the default thread pool, so
+the event loop never waits on Redis or a synchronous query. Requests with
+?profile=1 are handed to Flask, whose profiler hooks produce the report.
+
+The GET /api/events change feed is also streamed from the event loop, so
+open streams cost no thread. Writes are still served by Flask in this
+process, and with EVENTS_BACKEND=memory their events reach these streams.
+"""
+import asyncio
+import os
+import re
+import time
+from datetime import date
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags
+
+import archive
+from aggregations import financial_totals_statement, totals_from_row
+from app import (fast_json, change_feed, profiler, response_cache, overview_payload, status_payload, net_values_payload,
+                 last_20_days_query, last_20_days_payload, monthly_summary_queries,
+                 monthly_summary_payload, expense_list_query, expense_page_query, expense_page,
+                 expense_live_page_complete, loan_timeline_query, loan_timeline_page)
+from bootstrap import create_app
+from db_config import install_sqlite_pragmas
+from events import STREAM_HEADERS
+from profiling import server_timing
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-expose-headers', b'X-Next-Cursor, ETag'),
+]
+
+
+def async_database_uri(uri, instance_path):
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend}')
+    if backend == 'sqlite' and url.database and not os.path.isabs(url.database):
+        # Flask-SQLAlchemy resolves relative SQLite paths against the instance folder
+        url = url.set(database=os.path.join(instance_path, url.database))
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncReadAPI:
+    """ASGI app serving READ_ROUTES asynchronously and everything else via Flask"""
+
+    def __init__(self, flask_app):
+        uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+        self.engine = create_async_engine(
+            async_database_uri(uri, flask_app.instance_path), **flask_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        )
+        install_sqlite_pragmas(self.engine.sync_engine)
+        profiler.instrument(self.engine.sync_engine)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.flask_app = flask_app
+        self.urls = flask_app.url_map.bind('localhost')
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.routes = [(re.compile(pattern), handler) for pattern, handler in READ_ROUTES]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            if scope['path'] == '/api/events' and change_feed.enabled:
+                await self._stream_events(scope, receive, send)
+                return
+            for pattern, handler in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match is None:
+                    continue
+                args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+                profiling = profiler.profile_param_enabled and args.get('profile') == '1'
+                # ndjson streaming and profiled requests stay on the Flask path
+                if args.get('format') != 'ndjson' and not profiling:
+                    await self._serve_read(scope, send, handler, args, match.groupdict())
+                    return
+                break
+        await self.wsgi(scope, receive, send)
+
+    async def _serve_read(self, scope, send, handler, args, kwargs):
+        endpoint, view_args = self.urls.match(scope['path'], 'GET')
+        tables = getattr(self.flask_app.view_functions[endpoint], 'cache_tables', None)
+        loop = asyncio.get_running_loop()
+        with profiler.track(endpoint, 'GET') as tracked:
+            key = None
+            if tables and response_cache.backend is not None:
+                key = await loop.run_in_executor(None, response_cache.key, endpoint, view_args, args, tables)
+                cached = await loop.run_in_executor(None, response_cache.backend.get, key)
+                if cached is not None:
+                    response_cache.hits += 1
+                    tracked['status'] = await self._send_cached(scope, send, cached, tracked)
+                    return
+                response_cache.misses += 1
+
+            if archive.partitions_cache.expired:
+                await loop.run_in_executor(None, self._load_partitions)
+            # Building a statement reads the partition list, now a cache hit, through Flask-SQLAlchemy
+            with self.flask_app.app_context():
+                async with self.sessions() as session:
+                    payload, status, *headers = await handler(session, args, **kwargs)
+            headers = (headers and headers[0]) or {}
+            body = fast_json.dumps(payload, app=self.flask_app)
+
+            if key is not None and status == 200:
+                cached = response_cache.entry(body, status, 'application/json', headers.items())
+                await loop.run_in_executor(None, response_cache.backend.set, key, cached, response_cache.ttl)
+                tracked['status'] = await self._send_cached(scope, send, cached, tracked)
+                return
+            tracked['status'] = status
+            await self._send_body(send, body, status, dict(headers, **{'Server-Timing': self._timing(tracked)}))
+
+    def _load_partitions(self):
+        with self.flask_app.app_context():
+            archive.partitions_cache.get()
+
+    @staticmethod
+    def _timing(tracked):
+        return server_timing(time.perf_counter() - tracked['started'],
+                             tracked['sql_statements'], tracked['sql_seconds'])
+
+    async def _send_cached(self, scope, send, cached, tracked):
+        """Send a cached response like ResponseCache._respond(); returns the status sent"""
+        headers = dict(cached.headers)
+        headers.update({'ETag': f'"{cached.etag}"', 'Cache-Control': 'no-cache',
+                        'Server-Timing': self._timing(tracked)})
+        if_none_match = dict(scope['headers']).get(b'if-none-match')
+        if if_none_match and parse_etags(if_none_match.decode('latin-1')).contains_weak(cached.etag):
+            await self._send_body(send, b'', 304, headers, content_type=None)
+            return 304
+        await self._send_body(send, cached.body, cached.status, headers)
+        return cached.status
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _stream_events(self, scope, receive, send):
+        args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1')))
+        last_event_id = dict(scope['headers']).get(b'last-event-id', b'').decode('latin-1') \
+            or args.get('last_event_id')
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake():
+            # Called from the thread that published the event
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # the loop has shut down
+
+        subscriber = change_feed.subscribe(last_event_id, wake=wake)
+        if subscriber is None:
+            await self._send_json(send, {'error': 'Too many change feed subscribers'}, 503)
+            return
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        async def stream():
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                *((name.lower().encode(), value.encode()) for name, value in STREAM_HEADERS.items()),
+                *CORS_HEADERS,
+            ]})
+            async for chunk in change_feed.astream(subscriber, ready):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        # The stream never ends by itself: it runs until the client goes away
+        watcher = asyncio.ensure_future(disconnected())
+        streaming = asyncio.ensure_future(stream())
+        watcher.add_done_callback(lambda _: streaming.cancel())
+        try:
+            await streaming
+        except asyncio.CancelledError:
+            if not watcher.done():
+                raise
+        finally:
+            watcher.cancel()
+            change_feed.unsubscribe(subscriber)
+
+    async def _send_json(self, send, payload, status=200, headers=None):
+        # Same encoder as the Flask views, so bodies match theirs
+        await self._send_body(send, fast_json.dumps(payload, app=self.flask_app), status, headers)
+
+    async def _send_body(self, send, body, status, headers=None, content_type=b'application/json'):
+        response_headers = [
+            *([(b'content-type', content_type)] if content_type else []),
+            (b'content-length', str(len(body)).encode()),
+            *CORS_HEADERS,
+        ]
+        response_headers.extend((name.lower().encode(), value.encode()) for name, value in (headers or {}).items())
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+# Read handlers: each returns (payload, status, extra headers)
+
+async def dashboard_overview(session, args):
+    current_month = date.today().strftime('%Y-%m')
+    row = (await session.execute(financial_totals_statement(month=current_month))).one()
+    return overview_payload(totals_from_row(row), current_month), 200
+
+
+async def status(session, args):
+    row = (await session.execute(financial_totals_statement())).one()
+    return status_payload(totals_from_row(row)), 200
+
+
+async def net_values(session, args, month):
+    try:
+        statement = financial_totals_statement(month=month, loan_month=month)
+    except ValueError:
+        return {'error': 'Invalid month format. Use YYYY-MM'}, 400
+    row = (await session.execute(statement)).one()
+    return net_values_payload(month, totals_from_row(row)), 200
+
+
+async def last_20_days(session, args):
+    total_amount, transaction_count = (await session.execute(last_20_days_query())).one()
+    return last_20_days_payload(total_amount, transaction_count), 200
+
+
+async def monthly_summary(session, args):
+    expenses_query, totals_query = monthly_summary_queries()
+    monthly_expenses = (await session.execute(expenses_query)).all()
+    monthly_totals = (await session.execute(totals_query)).scalars().all()
+    return monthly_summary_payload(monthly_expenses, monthly_totals), 200
+
+
+async def expenses(session, args):
+    try:
+        query, limit = expense_list_query(args, live_only=True)
+    except (ValueError, TypeError) as e:
+        return {'error': f'Invalid expense query: {str(e)}'}, 400
+    rows = (await session.execute(expense_page_query(query, limit))).all()
+    if not expense_live_page_complete(args, rows, limit):
+        query, limit = expense_list_query(args)
+        rows = (await session.execute(expense_page_query(query, limit))).all()
+    page, next_cursor = expense_page(rows, limit)
+    return page, 200, {'X-Next-Cursor': next_cursor} if next_cursor else None
+
+
+async def loan_timeline(session, args):
+    try:
+        query, limit = loan_timeline_query(args)
+    except (ValueError, TypeError) as e:
+        return {'error': f'Invalid timeline query: {str(e)}'}, 400
+    timeline, next_cursor = loan_timeline_page((await session.execute(query)).all(), limit)
+    return timeline, 200, {'X-Next-Cursor': next_cursor} if next_cursor else None
+
+
+READ_ROUTES = [
+    (r'/api/dashboard/overview', dashboard_overview),
+    (r'/api/status', status),
+    (r'/api/analytics/net-values/(?P<month>[^/]+)', net_values),
+    (r'/api/analytics/last-20-days', last_20_days),
+    (r'/api/analytics/monthly-summary', monthly_summary),
+    (r'/api/expenses', expenses),
+    (r'/api/analytics/loan-timeline', loan_timeline),
+]
+
+def create_application(config=None):
+    """The ASGI app for uvicorn's --factory mode; config as for bootstrap.create_app()"""
+    return AsyncReadAPI(create_app(config))
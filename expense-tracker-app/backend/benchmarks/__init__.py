@@ -0,0 +1,4 @@
+"""Performance benchmarks for the expense tracker backend.
+
+Run them from the backend directory, e.g. ``python -m benchmarks.concurrency``.
+"""
@@ -0,0 +1,104 @@
+"""Vectorized analytics engine vs. the loop-over-ORM-objects approach.
+
+Both sides compute the same 12-month report: monthly totals, a 3-month
+rolling sum, per-category monthly totals, year-over-year deltas and the
+median amount per month.
+
+    python -m benchmarks.analytics --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def loop_report(start_date, end_date, Expense, Category):
+    """Baseline in the style of the original analytics endpoints"""
+    lookback_start = date(start_date.year - 1, start_date.month, 1)
+    expenses = Expense.query.filter(Expense.date >= lookback_start, Expense.date <= end_date).all()
+    names = {category.id: category.name for category in Category.query.all()}
+
+    totals, by_category, amounts = {}, {}, {}
+    for expense in expenses:
+        month = expense.date.strftime('%Y-%m')
+        totals[month] = totals.get(month, 0) + expense.amount
+        if expense.date >= start_date:
+            category = names[expense.category_id]
+            by_category.setdefault(category, {})
+            by_category[category][month] = by_category[category].get(month, 0) + expense.amount
+            amounts.setdefault(month, []).append(expense.amount)
+
+    months = sorted(month for month in totals if month >= start_date.strftime('%Y-%m'))
+    report = {}
+    for month in months:
+        year, month_num = int(month[:4]), int(month[5:])
+        previous = [f'{(year * 12 + month_num - 1 - k) // 12}-{(year * 12 + month_num - 1 - k) % 12 + 1:02d}'
+                    for k in range(3)]
+        last_year = f'{year - 1}-{month_num:02d}'
+        report[month] = {
+            'total': totals[month],
+            'rolling': sum(totals.get(m, 0) for m in previous),
+            'yoy_delta': totals[month] - totals.get(last_year, 0),
+            'median': statistics.median(amounts[month]) if month in amounts else None,
+            'categories': {name: values.get(month, 0) for name, values in by_category.items()},
+        }
+    return report
+
+
+def _time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+    from bootstrap import create_app
+    from analytics_engine import default_start, trends
+    from importer import import_rows
+    from models import db, Category, Expense
+
+    today = date.today()
+    rng = random.Random(42)
+    categories = ['Food', 'Shopping', 'Home', 'Sports', 'Commute', 'Education', 'Trip', 'Others']
+    app = create_app()
+    with app.app_context():
+        import_rows('expenses', ({
+            'amount': str(rng.randint(50, 20000)),
+            'description': 'Benchmark expense',
+            'category': rng.choice(categories),
+            'date': (today - timedelta(days=rng.randint(0, 365 * args.years))).isoformat(),
+        } for _ in range(args.rows)), chunk_size=10000)
+
+        start_date = default_start(today, 'month')
+        names = {category.id: category.name for category in Category.query.all()}
+
+        def loop():
+            loop_report(start_date, today, Expense, Category)
+            db.session.expunge_all()
+
+        loop_time = _time(loop, args.repeat)
+        vector_time = _time(lambda: trends(start_date, today, 'month', 3, (50,), names), args.repeat)
+
+    print(f"{args.rows} expenses over {args.years} years, 12-month report (median of {args.repeat})")
+    print(f"  loop over ORM objects {loop_time * 1000:9.1f} ms")
+    print(f"  vectorized engine     {vector_time * 1000:9.1f} ms  ({loop_time / vector_time:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Read latency under many concurrent clients: threaded WSGI vs the async ASGI path.
+
+Each server gets the same freshly seeded database and is started as a real
+HTTP server on a local port: "wsgi" is waitress serving wsgi:app with a
+thread pool, "asgi" is uvicorn serving asgi:create_application. The client opens
+--clients concurrent connections (httpx, asyncio) that poll the dashboard and
+analytics endpoints for --seconds and reports throughput and p50/p99 latency.
+
+    python -m benchmarks.async_load --clients 200 --seconds 15
+
+Needs httpx, uvicorn and waitress.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - benchmark-only dependency
+    httpx = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_URLS = [
+    '/api/dashboard/overview',
+    '/api/status',
+    '/api/expenses?limit=50',
+    '/api/analytics/last-20-days',
+    '/api/analytics/monthly-summary',
+    '/api/analytics/net-values/{month}',
+    '/api/analytics/loan-timeline?limit=100',
+]
+
+SERVERS = {
+    'wsgi': lambda port, args: [
+        sys.executable, '-m', 'waitress', f'--port={port}', '--host=127.0.0.1',
+        f'--threads={args.threads}', f'--connection-limit={args.clients}', 'wsgi:app',
+    ],
+    'asgi': lambda port, args: [
+        sys.executable, '-m', 'uvicorn', 'asgi:create_application', '--factory', '--port', str(port),
+        '--host', '127.0.0.1', '--log-level', 'warning', '--no-access-log',
+    ],
+}
+
+
+def _seed(expense_rows, loan_rows):
+    from bootstrap import create_app
+    from importer import import_rows
+
+    app = create_app()
+    with app.app_context():
+        today = date.today()
+        rng = random.Random(42)
+        import_rows('expenses', ({
+            'amount': str(rng.randint(50, 5000)),
+            'description': f'Seed expense {i}',
+            'category': rng.choice(['Food', 'Shopping', 'Home', 'Commute', 'Trip']),
+            'date': (today - timedelta(days=rng.randint(0, 365))).isoformat(),
+        } for i in range(expense_rows)))
+        import_rows('loans', ({
+            'person_name': f'Person {rng.randint(1, 50)}',
+            'loan_type': rng.choice(['given', 'taken', 'received_back']),
+            'amount': str(rng.randint(100, 10000)),
+            'date': (today - timedelta(days=rng.randint(0, 365))).isoformat(),
+        } for i in range(loan_rows)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start in time')
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def _client(http, deadline, latencies, errors):
+    month = date.today().strftime('%Y-%m')
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        url = rng.choice(READ_URLS).format(month=month)
+        started = time.perf_counter()
+        try:
+            response = await http.get(url)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors.append(url)
+
+
+async def _load(port, clients, seconds):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as http:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(_client(http, deadline, latencies, errors) for _ in range(clients)))
+    return latencies, errors
+
+
+def run_server(name, database_url, args):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, RESPONSE_CACHE_BACKEND='none')
+    process = subprocess.Popen(SERVERS[name](port, args), cwd=BACKEND_DIR, env=env)
+    try:
+        _wait_until_up(port, process)
+        latencies, errors = asyncio.run(_load(port, args.clients, args.seconds))
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"{name:>5}: {len(latencies) / args.seconds:8.1f} req/s  "
+          f"p50 {_percentile(latencies, 0.50) * 1000:7.1f}ms  "
+          f"p99 {_percentile(latencies, 0.99) * 1000:7.1f}ms  errors {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--threads', type=int, default=8, help='waitress worker threads')
+    parser.add_argument('--expense-rows', type=int, default=50000)
+    parser.add_argument('--loan-rows', type=int, default=5000)
+    parser.add_argument('--servers', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    if httpx is None:
+        sys.exit('The async load test needs httpx: pip install httpx')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ['DATABASE_URL'] = database_url
+        os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+        _seed(args.expense_rows, args.loan_rows)
+
+        print(f"{args.clients} clients, {args.expense_rows} expenses, {args.loan_rows} loans, "
+              f"{args.seconds:g}s per server")
+        for name in args.servers.split(','):
+            run_server(name, database_url, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Mixed read/write throughput against SQLite with and without engine tuning.
+
+Each configuration gets a fresh database file and is hammered by several
+worker processes, each running a few threads that issue dashboard/list reads
+and expense inserts through Flask's test client. "default" runs with
+SQLITE_TUNING=0 (rollback journal, synchronous=FULL, no busy timeout beyond
+the driver's), "tuned" with the WAL/pragmas from db_config.py.
+
+    python -m benchmarks.concurrency --processes 4 --threads 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+READ_URLS = [
+    '/api/dashboard/overview',
+    '/api/expenses?limit=50',
+    '/api/analytics/monthly-summary',
+    '/api/analytics/net-values/{month}',
+]
+
+
+def _seed(seed_rows):
+    from bootstrap import create_app
+    from importer import import_rows
+
+    app = create_app()
+    with app.app_context():
+        today = date.today()
+        rows = ({
+            'amount': str(random.randint(50, 5000)),
+            'description': f'Seed expense {i}',
+            'category': random.choice(['Food', 'Shopping', 'Home', 'Commute', 'Trip']),
+            'date': (today - timedelta(days=random.randint(0, 365))).isoformat(),
+        } for i in range(seed_rows))
+        import_rows('expenses', rows)
+
+
+def _client_thread(app, deadline, write_ratio, results):
+    client = app.test_client()
+    month = date.today().strftime('%Y-%m')
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        is_write = rng.random() < write_ratio
+        started = time.perf_counter()
+        if is_write:
+            response = client.post('/api/expenses', json={
+                'amount': rng.randint(50, 5000),
+                'description': 'Benchmark expense',
+                'category': rng.choice(['Food', 'Shopping', 'Home']),
+            })
+            ok = response.status_code == 201
+        else:
+            response = client.get(rng.choice(READ_URLS).format(month=month))
+            ok = response.status_code == 200
+        elapsed = time.perf_counter() - started
+        kind = 'write' if is_write else 'read'
+        results[kind].append(elapsed)
+        if not ok:
+            results['errors'] += 1
+
+
+def _worker(threads, seconds, write_ratio, queue):
+    from bootstrap import create_app
+
+    app = create_app()
+    deadline = time.perf_counter() + seconds
+    results = {'read': [], 'write': [], 'errors': 0}
+    pool = [threading.Thread(target=_client_thread, args=(app, deadline, write_ratio, results))
+            for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    queue.put(results)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_configuration(name, tuning, args):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as workdir:
+        # Children are spawned fresh, so they pick up the environment set here
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ['SQLITE_TUNING'] = tuning
+        os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+        seeder = context.Process(target=_seed, args=(args.seed_rows,))
+        seeder.start()
+        seeder.join()
+
+        queue = context.Queue()
+        workers = [context.Process(target=_worker, args=(args.threads, args.seconds, args.write_ratio, queue))
+                   for _ in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        collected = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+    reads = [value for result in collected for value in result['read']]
+    writes = [value for result in collected for value in result['write']]
+    errors = sum(result['errors'] for result in collected)
+    total = len(reads) + len(writes)
+
+    print(f"{name:>8}: {total / args.seconds:8.1f} req/s  "
+          f"reads {len(reads) / args.seconds:7.1f}/s p50 {statistics.median(reads or [0]) * 1000:6.1f}ms "
+          f"p99 {_percentile(reads, 0.99) * 1000:7.1f}ms  "
+          f"writes {len(writes) / args.seconds:6.1f}/s p50 {statistics.median(writes or [0]) * 1000:6.1f}ms "
+          f"p99 {_percentile(writes, 0.99) * 1000:7.1f}ms  errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--seed-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x {args.threads} threads, {args.write_ratio:.0%} writes, "
+          f"{args.seed_rows} seeded expenses, {args.seconds:g}s per run")
+    run_configuration('default', '0', args)
+    run_configuration('tuned', '1', args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Synthetic datasets for benchmarking.
+
+Rows are written straight into the schema from models.py with chunked
+executemany inserts, then the derived tables (monthly rollups, stored loan
+balances, tag index) are rebuilt the same way db_manager does it. Data is
+shaped like real usage: skewed category and person popularity, log-normal
+amounts, a few tags per expense, monthly income and committees paid every
+month of their term (each payment also recorded as a "Committee" expense, as
+the API does).
+
+    python -m benchmarks.datagen --scale 100k --database /tmp/bench.db
+"""
+import argparse
+import math
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+SCALES = {
+    '10k': {'expenses': 10_000, 'persons': 200, 'loans': 2_000, 'committees': 20, 'years': 2},
+    '100k': {'expenses': 100_000, 'persons': 1_000, 'loans': 20_000, 'committees': 100, 'years': 3},
+    '1m': {'expenses': 1_000_000, 'persons': 5_000, 'loans': 200_000, 'committees': 500, 'years': 5},
+}
+
+CHUNK_SIZE = 10_000
+
+# (category, relative frequency, median amount)
+CATEGORIES = [
+    ('Food', 30, 800), ('Commute', 20, 300), ('Shopping', 12, 2500), ('Home', 10, 4000),
+    ('Bills', 8, 6000), ('Health', 5, 3000), ('Education', 4, 8000), ('Sports', 4, 1500),
+    ('Trip', 3, 15000), ('Gifts', 2, 3500), ('Others', 2, 1000),
+]
+TAGS = ['work', 'family', 'weekend', 'recurring', 'cash', 'card', 'online', 'urgent',
+        'home office', 'subscription', 'travel', 'kids', 'health', 'gift', 'reimbursable']
+PLACES = ['Downtown', 'Mall', 'Market', 'Online', 'Airport', 'Campus', 'Office', 'Home']
+LOAN_TYPES = [('given', 45), ('taken', 25), ('received_back', 30)]
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(db, model, rows):
+    from sqlalchemy import insert
+
+    count = 0
+    for chunk in _chunks(rows):
+        db.session.execute(insert(model), chunk)
+        db.session.commit()
+        count += len(chunk)
+    return count
+
+
+def _lognormal(rng, median, sigma=0.8):
+    return round(rng.lognormvariate(math.log(median), sigma), 2)
+
+
+def _months(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield date(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def generate(scale='10k', seed=42, today=None, **overrides):
+    """Fill the configured database; must run inside an app context.
+
+    scale picks a preset from SCALES, keyword overrides replace its counts.
+    Returns a dict with the number of rows written per table.
+    """
+    from bootstrap import init_default_data
+    from models import db
+    from loan_balances import repair_loan_balances
+    from models import Category, Committee, CommitteePayment, Expense, Loan, MonthlyIncome, Person
+    from rollups import rebuild_rollups
+    from tag_index import rebuild_tag_index
+
+    config = dict(SCALES[scale], **overrides)
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = today - timedelta(days=365 * config['years'])
+    span_days = (today - first_day).days
+    created_at = datetime.utcnow()
+    counts = {}
+
+    db.create_all()
+    init_default_data()
+
+    existing = {category.name for category in Category.query.all()}
+    new_categories = [name for name, _, _ in CATEGORIES + [('Committee', 0, 0)] if name not in existing]
+    for offset, name in enumerate(new_categories):
+        color, icon = Category.default_style(len(existing) + offset)
+        db.session.add(Category(name=name, color=color, icon=icon))
+    db.session.commit()
+    category_ids = {category.name: category.id for category in Category.query.all()}
+
+    names = [name for name, _, _ in CATEGORIES]
+    weights = [weight for _, weight, _ in CATEGORIES]
+    medians = dict((name, median) for name, _, median in CATEGORIES)
+
+    def expenses():
+        for i in range(config['expenses']):
+            category = rng.choices(names, weights)[0]
+            yield {
+                'category_id': category_ids[category],
+                'amount': _lognormal(rng, medians[category]),
+                'description': f'{category} purchase {i}',
+                'date': first_day + timedelta(days=rng.randrange(span_days + 1)),
+                'location': rng.choice(PLACES),
+                'notes': '' if rng.random() < 0.7 else f'Paid for {rng.choice(TAGS)} needs',
+                'tags': ', '.join(rng.sample(TAGS, rng.choice((0, 0, 1, 1, 2, 3)))),
+                'created_at': created_at,
+                'updated_at': created_at,
+            }
+
+    counts['expenses'] = _insert(db, Expense, expenses())
+
+    counts['persons'] = _insert(db, Person, ({
+        'name': f'Person {i:05d}',
+        'contact': f'+1-555-{i:07d}',
+        'email': f'person{i}@example.com',
+        'created_at': created_at,
+    } for i in range(config['persons'])))
+    person_ids = [person_id for (person_id,) in db.session.query(Person.id)]
+    # A few people account for most loans
+    person_weights = [1 / (rank + 1) for rank in range(len(person_ids))]
+    loan_types = [loan_type for loan_type, _ in LOAN_TYPES]
+    loan_weights = [weight for _, weight in LOAN_TYPES]
+
+    counts['loans'] = _insert(db, Loan, ({
+        'person_id': rng.choices(person_ids, person_weights)[0],
+        'loan_type': rng.choices(loan_types, loan_weights)[0],
+        'amount': _lognormal(rng, 10000, 1.0),
+        'description': f'Loan {i}',
+        'date': first_day + timedelta(days=rng.randrange(span_days + 1)),
+        'interest_rate': 0,
+        'status': 'active',
+        'notes': '',
+        'created_at': created_at,
+    } for i in range(config['loans'])))
+
+    committees = []
+    for i in range(config['committees']):
+        start = first_day + timedelta(days=rng.randrange(max(1, span_days - 180)))
+        start = start.replace(day=1)
+        months = rng.choice((10, 12, 20, 24))
+        end = (start + timedelta(days=31 * months)).replace(day=1)
+        monthly_amount = float(rng.choice((5000, 10000, 20000, 25000)))
+        committees.append({
+            'name': f'Committee {i}',
+            'start_date': start,
+            'end_date': end,
+            'monthly_amount': monthly_amount,
+            'expected_receiving_amount': monthly_amount * months,
+            'expected_receiving_date': start + timedelta(days=31 * rng.randrange(months)),
+            'status': 'active' if end > today else 'completed',
+            'created_at': created_at,
+        })
+    counts['committees'] = _insert(db, Committee, committees)
+
+    payments, payment_expenses = [], []
+    committee_rows = db.session.query(Committee.id, Committee.name, Committee.start_date,
+                                      Committee.end_date, Committee.monthly_amount)
+    for committee_id, name, start, end, monthly_amount in committee_rows:
+        for month_start in _months(start, min(end, today)):
+            if rng.random() < 0.05:
+                continue  # missed month
+            paid_on = month_start + timedelta(days=rng.randrange(10))
+            payments.append({'committee_id': committee_id, 'amount': monthly_amount,
+                             'payment_date': paid_on, 'month_year': month_start.strftime('%Y-%m'),
+                             'created_at': created_at})
+            payment_expenses.append({'category_id': category_ids['Committee'], 'amount': monthly_amount,
+                                     'description': f'Committee Payment - {name}', 'date': paid_on,
+                                     'created_at': created_at, 'updated_at': created_at})
+    counts['committee_payments'] = _insert(db, CommitteePayment, payments)
+    counts['expenses'] += _insert(db, Expense, payment_expenses)
+
+    counts['monthly_income'] = _insert(db, MonthlyIncome, ({
+        'amount': float(rng.randint(150, 250) * 1000),
+        'month_year': month_start.strftime('%Y-%m'),
+        'source': 'Salary',
+        'created_at': created_at,
+    } for month_start in _months(first_day, today)))
+
+    rebuild_rollups()
+    repair_loan_balances()
+    db.session.commit()
+    rebuild_tag_index()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--database', required=True, help='SQLite file to create or extend')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(args.database)}'
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+    # Bulk inserts are expected to be slow; keep them out of the slow-query log
+    os.environ.setdefault('SLOW_QUERY_MS', '60000')
+    from bootstrap import create_app
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        counts = generate(args.scale, args.seed)
+    summary = ', '.join(f'{count} {table}' for table, count in counts.items())
+    print(f'Generated {summary} in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""GET /api/loans response size and latency: SQL-aggregated summary vs. the
+old Python fold that embedded every transaction.
+
+    python -m benchmarks.loan_ledger --loans 100000 --persons 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def legacy_get_loans(db, Loan, Person):
+    """The pre-aggregation implementation, kept here as the baseline"""
+    loans = db.session.query(Loan, Person.name).join(Person).all()
+    loan_summary = {}
+    for loan, person_name in loans:
+        if person_name not in loan_summary:
+            loan_summary[person_name] = {
+                'person_id': loan.person_id, 'given': 0, 'taken': 0,
+                'received_back': 0, 'net_amount': 0, 'transactions': []
+            }
+        if loan.loan_type in ('given', 'taken', 'received_back'):
+            loan_summary[person_name][loan.loan_type] += loan.amount
+        loan_summary[person_name]['transactions'].append({
+            'id': loan.id, 'type': loan.loan_type, 'amount': loan.amount,
+            'date': loan.date.isoformat() if loan.date else None,
+            'description': loan.description, 'status': loan.status,
+            'due_date': loan.due_date.isoformat() if loan.due_date else None,
+            'interest_rate': loan.interest_rate
+        })
+    for person_data in loan_summary.values():
+        person_data['net_amount'] = person_data['given'] - person_data['taken'] - person_data['received_back']
+    return loan_summary
+
+
+def _time(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--loans', type=int, default=100000)
+    parser.add_argument('--persons', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+    from flask import json
+    from bootstrap import create_app
+    from importer import import_rows
+    from models import db, Loan, Person
+
+    today = date.today()
+    rng = random.Random(42)
+    app = create_app()
+    with app.app_context():
+        import_rows('loans', ({
+            'person_name': f'Person {rng.randrange(args.persons)}',
+            'loan_type': rng.choice(['given', 'taken', 'received_back']),
+            'amount': str(rng.randint(100, 50000)),
+            'date': (today - timedelta(days=rng.randint(0, 3650))).isoformat(),
+            'description': 'Benchmark loan',
+        } for _ in range(args.loans)), chunk_size=5000)
+
+        client = app.test_client()
+
+        def legacy():
+            return json.dumps(legacy_get_loans(db, Loan, Person))
+
+        legacy_time, legacy_body = _time(legacy, args.repeat)
+        summary_time, summary = _time(lambda: client.get('/api/loans'), args.repeat)
+        person_id = db.session.query(Person.id).first()[0]
+        page_time, page = _time(lambda: client.get(f'/api/persons/{person_id}/loans?limit=50'), args.repeat)
+
+    print(f"{args.loans} loans across {args.persons} persons (median of {args.repeat})")
+    print(f"  legacy /api/loans     {legacy_time * 1000:8.1f} ms  {len(legacy_body) / 1024:10.1f} KiB")
+    print(f"  summary /api/loans    {summary_time * 1000:8.1f} ms  {len(summary.data) / 1024:10.1f} KiB")
+    print(f"  person page (50 rows) {page_time * 1000:8.1f} ms  {len(page.data) / 1024:10.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
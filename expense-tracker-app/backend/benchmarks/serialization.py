@@ -0,0 +1,129 @@
+"""Serialization cost of the list endpoints, in milliseconds per 10k rows.
+
+Compares, for expenses and loans, the previous path (hydrate ORM objects,
+build dicts with .isoformat() dates, jsonify) with the current one (select
+the labelled columns as row tuples, encode with FastJSON) using both the
+stdlib and the orjson encoder. Fetching and encoding are timed separately;
+every variant is checked to produce the same bytes.
+
+    python -m benchmarks.serialization --rows 50000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+ROWS_PER_REPORT = 10_000
+
+
+def _best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings), result
+
+
+def _orm_expenses(db):
+    from sqlalchemy import select
+    from app import serialize_expense
+    from models import Category, Expense
+
+    rows = db.session.execute(select(Expense, Category.name, Category.color, Category.icon).join(Category)
+                              .order_by(Expense.id)).all()
+    return [serialize_expense(*row) for row in rows]
+
+
+def _tuple_expenses(db):
+    from sqlalchemy import select
+    from app import EXPENSE_COLUMNS
+    from models import Category, Expense
+
+    rows = db.session.execute(select(*EXPENSE_COLUMNS).join(Category).order_by(Expense.id)).all()
+    return [row._asdict() for row in rows]
+
+
+def _orm_loans(db):
+    from models import Loan
+
+    return [{
+        'id': loan.id,
+        'type': loan.loan_type,
+        'amount': loan.amount,
+        'date': loan.date.isoformat() if loan.date else None,
+        'description': loan.description,
+        'status': loan.status,
+        'due_date': loan.due_date.isoformat() if loan.due_date else None,
+        'interest_rate': loan.interest_rate
+    } for loan in Loan.query.order_by(Loan.id)]
+
+
+def _tuple_loans(db):
+    from sqlalchemy import select
+    from app import LOAN_COLUMNS
+    from models import Loan
+
+    return [row._asdict() for row in db.session.execute(select(*LOAN_COLUMNS).order_by(Loan.id))]
+
+
+DATASETS = {
+    'expenses': (_orm_expenses, _tuple_expenses),
+    'loans': (_orm_loans, _tuple_loans),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=50_000, help='expenses to generate (loans: a fifth of that)')
+    parser.add_argument('--database', help='reuse (or create) this SQLite file instead of a temporary one')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    database = os.path.abspath(args.database) if args.database \
+        else os.path.join(tempfile.mkdtemp(), 'serialization.db')
+    reuse = os.path.exists(database)
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+    os.environ.setdefault('SLOW_QUERY_MS', '60000')
+
+    from benchmarks.datagen import generate
+    from bootstrap import create_app
+    from fast_json import FastJSON, orjson
+    from models import db
+
+    app = create_app()
+
+    encoders = {'stdlib': FastJSON()}
+    if orjson is not None:
+        encoders['orjson'] = FastJSON()
+        encoders['orjson'].use_orjson = True
+    else:
+        print('orjson is not installed; only the stdlib encoder is measured')
+
+    with app.test_request_context():
+        if not reuse:
+            generate('10k', expenses=args.rows, loans=args.rows // 5)
+
+        print(f"{'dataset':<10}{'rows':>9}{'variant':>20}{'fetch ms':>11}{'encode ms':>11}{'total ms':>11}  per 10k rows")
+        for name, (orm_rows, tuple_rows) in DATASETS.items():
+            variants = [('orm + jsonify', orm_rows, lambda payload: app.json.response(payload).get_data())]
+            variants += [(f'tuples + {label}', tuple_rows, encoder.dumps) for label, encoder in encoders.items()]
+
+            expected = None
+            for label, fetch, encode in variants:
+                fetch_time, _, payload = _best_of(args.repeat, lambda: fetch(db))
+                encode_time, _, body = _best_of(args.repeat, lambda: encode(payload))
+                db.session.expunge_all()
+                if expected is None:
+                    expected = body
+                elif body != expected:
+                    print(f'  warning: {label} output differs from jsonify')
+                scale = ROWS_PER_REPORT / max(len(payload), 1) * 1000
+                print(f'{name:<10}{len(payload):>9}{label:>20}{fetch_time * scale:>11.1f}'
+                      f'{encode_time * scale:>11.1f}{(fetch_time + encode_time) * scale:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
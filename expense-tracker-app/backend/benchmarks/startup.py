@@ -0,0 +1,130 @@
+"""Cold-start time of a single process and of a multi-worker gunicorn server.
+
+The single-process part starts fresh interpreters that run create_app()
+against an empty database (first boot: create_all, seeding and stamping)
+and against an initialized one (stamp check only), and reports import,
+initialization and total process time.
+
+The gunicorn part starts gunicorn with gunicorn.conf.py and --workers N,
+with and without preloading, and measures the time from launch until every
+worker has finished initializing. The run exits with status 1 if any
+gunicorn start takes longer than --budget-ms.
+
+    python -m benchmarks.startup --workers 4 --budget-ms 3000
+
+The gunicorn part needs gunicorn, so it is skipped on Windows.
+"""
+import argparse
+import importlib.util
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONF = os.path.join(BACKEND_DIR, 'gunicorn.conf.py')
+
+# Run in a fresh interpreter; prints import (building the app included) and init time in ms
+CHILD = """
+import time
+started = time.perf_counter()
+from bootstrap import create_app, init_database
+app = create_app(initialize=False)
+imported = time.perf_counter()
+with app.app_context():
+    ran = init_database()
+print(f'{(imported - started) * 1000:.1f} {(time.perf_counter() - imported) * 1000:.1f} {int(ran)}')
+"""
+
+# Wraps gunicorn.conf.py with a hook that marks each worker as ready
+READY_HOOK = """
+exec(open({conf!r}).read())
+
+
+def post_worker_init(worker):
+    open(os.path.join({ready_dir!r}, str(worker.pid)), 'w').close()
+"""
+
+
+def _env(database):
+    return dict(os.environ, DATABASE_URL=f'sqlite:///{database}', RESPONSE_CACHE_BACKEND='none')
+
+
+def single_process(database):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=BACKEND_DIR, env=_env(database),
+                            capture_output=True, text=True, check=True).stdout
+    total = (time.perf_counter() - started) * 1000
+    import_ms, init_ms, ran = output.split()
+    return float(import_ms), float(init_ms), total, ran == '1'
+
+
+def gunicorn_start(database, workers, preload, timeout=60):
+    with tempfile.TemporaryDirectory() as workdir:
+        ready_dir = os.path.join(workdir, 'ready')
+        os.mkdir(ready_dir)
+        config = os.path.join(workdir, 'gunicorn_bench.conf.py')
+        with open(config, 'w') as f:
+            f.write(READY_HOOK.format(conf=GUNICORN_CONF, ready_dir=ready_dir))
+
+        env = dict(_env(database), GUNICORN_WORKERS=str(workers), GUNICORN_PRELOAD='1' if preload else '0',
+                   HOST='127.0.0.1', PORT='0')
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', config, 'wsgi:app'],
+                                   cwd=BACKEND_DIR, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = started + timeout
+            while len(os.listdir(ready_dir)) < workers:
+                if process.poll() is not None:
+                    raise RuntimeError(f'gunicorn exited with code {process.returncode}')
+                if time.perf_counter() > deadline:
+                    raise RuntimeError('workers did not start in time')
+                time.sleep(0.005)
+            return (time.perf_counter() - started) * 1000
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget-ms', type=float, default=3000,
+                        help='maximum time for all gunicorn workers to be ready')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, 'startup.db')
+
+        print(f"{'single process':<28}{'import ms':>11}{'init ms':>11}{'total ms':>11}")
+        for label in ('first boot (empty db)', 'initialized db'):
+            runs = [single_process(database) for _ in range(1 if label.startswith('first') else args.repeat)]
+            import_ms, init_ms, total = (statistics.median(run[i] for run in runs) for i in range(3))
+            print(f'{label:<28}{import_ms:>11.1f}{init_ms:>11.1f}{total:>11.1f}')
+
+        if sys.platform == 'win32' or importlib.util.find_spec('gunicorn') is None:
+            print('gunicorn is not available; skipping the multi-worker start')
+            return
+
+        over_budget = []
+        print(f"\n{f'gunicorn, {args.workers} workers':<28}{'median ms':>11}{'max ms':>11}")
+        for preload in (True, False):
+            label = 'preload' if preload else 'no preload'
+            timings = [gunicorn_start(database, args.workers, preload) for _ in range(args.repeat)]
+            print(f'{label:<28}{statistics.median(timings):>11.1f}{max(timings):>11.1f}')
+            if preload and max(timings) > args.budget_ms:
+                over_budget.append(f'{label}: {max(timings):.0f} ms')
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:g} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print(f'All workers ready within the {args.budget_ms:g} ms budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""Benchmark every API route against a synthetic dataset and compare to a baseline.
+
+The database is generated with benchmarks.datagen (or reused with --database)
+and each route in ROUTES is driven through Flask's test client with the
+response cache disabled. Per route the suite records throughput, p50/p95/p99
+latency, SQL statements per request and the process's peak RSS so far.
+
+Results are written as JSON. When a baseline file exists the run is compared
+against it and routes whose p50 latency grew by more than --tolerance (and by
+at least --noise-ms), or that now run more queries or fail, are flagged as
+regressions; the exit status is 1 if any were found. Without a baseline the
+results become the new baseline.
+
+    python -m benchmarks.suite --scale 100k
+    python -m benchmarks.suite --scale 1m --database /tmp/bench-1m.db --iterations 10
+
+--archive-horizon-months N first moves rows older than N months into the
+archive partitions (see archive.py); comparing such a run against a baseline
+without archiving shows what the fan-out costs each route.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _month(offset=0):
+    today = date.today().replace(day=1)
+    for _ in range(offset):
+        today = (today - timedelta(days=1)).replace(day=1)
+    return today.strftime('%Y-%m')
+
+
+def _expense_body(i):
+    return {'amount': 100 + i, 'description': f'Benchmark expense {i}', 'category': 'Food',
+            'tags': 'work, benchmark'}
+
+
+def _import_body(i):
+    rows = [json.dumps({'amount': 10 + n, 'description': f'Imported {i}-{n}', 'category': 'Shopping'})
+            for n in range(100)]
+    return '\n'.join(rows)
+
+
+# name -> (method, path, JSON body factory or None). Paths may use {month},
+# {last_month}, {person_id} and {committee_id}.
+ROUTES = {
+    'dashboard_overview': ('GET', '/api/dashboard/overview', None),
+    'status': ('GET', '/api/status', None),
+    'categories': ('GET', '/api/categories', None),
+    'payment_methods': ('GET', '/api/payment-methods', None),
+    'cache_stats': ('GET', '/api/cache/stats', None),
+    'group_commit_stats': ('GET', '/api/group-commit/stats', None),
+    'change_feed_stats': ('GET', '/api/events/stats', None),
+    'metrics': ('GET', '/api/metrics', None),
+    'loans': ('GET', '/api/loans', None),
+    'loans_with_transactions': ('GET', '/api/loans?include_transactions=1', None),
+    'person_loans': ('GET', '/api/persons/{person_id}/loans?limit=50', None),
+    'committees': ('GET', '/api/committees', None),
+    'committee_schedule': ('GET', '/api/committees/schedule', None),
+    'committee_schedule_months': ('GET', '/api/committees/schedule?committee_id={committee_id}&include_months=1', None),
+    'expenses_page': ('GET', '/api/expenses?limit=100', None),
+    'expenses_filtered': ('GET', '/api/expenses?category=Food&min_amount=500&limit=100', None),
+    'expenses_tag_filter': ('GET', '/api/expenses?tags=work&limit=100', None),
+    'expenses_ndjson': ('GET', '/api/expenses?format=ndjson&limit=1000', None),
+    'tag_expenses': ('GET', '/api/tags/work/expenses?limit=100', None),
+    'tag_totals': ('GET', '/api/tags', None),
+    'expense_search': ('GET', '/api/expenses/search?q=food', None),
+    'export_month': ('GET', '/api/export?type=ledger&start_date={last_month}-01&end_date={last_month}-28', None),
+    'last_20_days': ('GET', '/api/analytics/last-20-days', None),
+    'trends': ('GET', '/api/analytics/trends?granularity=month', None),
+    'monthly_summary': ('GET', '/api/analytics/monthly-summary', None),
+    'loan_timeline': ('GET', '/api/analytics/loan-timeline?limit=500', None),
+    'net_values': ('GET', '/api/analytics/net-values/{last_month}', None),
+    'add_expense': ('POST', '/api/expenses', _expense_body),
+    'add_loan': ('POST', '/api/loans', lambda i: {'person_name': f'Person {i % 50:05d}', 'loan_type': 'given',
+                                                  'amount': 1000 + i}),
+    'add_income': ('POST', '/api/income', lambda i: {'amount': 1000, 'month_year': _month(), 'source': 'Bonus'}),
+    'add_committee': ('POST', '/api/committees', lambda i: {
+        'name': f'Benchmark committee {i}', 'start_date': f'{_month()}-01', 'end_date': f'{_month()}-28',
+        'monthly_amount': 1000, 'expected_receiving_amount': 12000,
+        'expected_receiving_date': f'{_month()}-15'}),
+    'add_committee_payment': ('POST', '/api/committees/{committee_id}/payment', lambda i: {'amount': 1000}),
+    'import_expenses': ('POST', '/api/import?type=expenses&format=ndjson', _import_body),
+}
+
+# Endpoints the suite deliberately does not drive; change_events streams
+# until the client disconnects
+SKIPPED_ENDPOINTS = {'static', 'api.change_events'}
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _request(client, method, path, body):
+    if method == 'GET':
+        return client.get(path)
+    if isinstance(body, str):
+        return client.post(path, data=body, content_type='application/x-ndjson')
+    return client.post(path, json=body)
+
+
+def run_route(client, engine, method, path, body_factory, iterations, warmup):
+    from query_counter import QueryCounter
+
+    latencies, queries, errors = [], [], 0
+    for i in range(warmup + iterations):
+        body = body_factory(i) if body_factory else None
+        with QueryCounter(engine) as counter:
+            started = time.perf_counter()
+            response = _request(client, method, path, body)
+            response.get_data()  # drain streamed bodies
+            elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(counter.count)
+        if not 200 <= response.status_code < 300:
+            errors += 1
+
+    return {
+        'requests': iterations,
+        'errors': errors,
+        'throughput_rps': round(iterations / sum(latencies), 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'queries_per_request': round(statistics.mean(queries), 1),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _uncovered_endpoints(app, placeholders):
+    adapter = app.url_map.bind('localhost')
+    covered = {
+        adapter.match(path.split('?')[0].format(**placeholders), method=method)[0]
+        for method, path, _ in ROUTES.values()
+    }
+    return sorted({rule.endpoint for rule in app.url_map.iter_rules()} - covered - SKIPPED_ENDPOINTS)
+
+
+def compare(results, baseline, tolerance, noise_ms):
+    """Return a list of human-readable regressions of results against baseline"""
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        p50, base_p50 = current['p50_ms'], previous['p50_ms']
+        if p50 > base_p50 * (1 + tolerance) and p50 - base_p50 >= noise_ms:
+            regressions.append(f'{name}: p50 {base_p50:.2f} -> {p50:.2f} ms ({p50 / base_p50 - 1:+.0%})')
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']} -> "
+                               f"{current['queries_per_request']}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', default='10k', help='dataset preset from benchmarks.datagen.SCALES')
+    parser.add_argument('--database', help='reuse (or create) this SQLite file instead of a temporary one')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--routes', help='comma-separated subset of route names')
+    parser.add_argument('--output', help='where to write this run (default: benchmarks/results-<scale>.json)')
+    parser.add_argument('--baseline', help='baseline to compare against (default: benchmarks/baseline-<scale>.json)')
+    parser.add_argument('--update-baseline', action='store_true', help='overwrite the baseline with this run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p50 increase')
+    parser.add_argument('--noise-ms', type=float, default=1.0, help='ignore p50 increases smaller than this')
+    parser.add_argument('--archive-horizon-months', type=int,
+                        help='archive expenses and loans older than this many months before running')
+    args = parser.parse_args()
+
+    from benchmarks.datagen import SCALES, generate
+    if args.scale not in SCALES:
+        parser.error(f"--scale must be one of: {', '.join(SCALES)}")
+
+    database = os.path.abspath(args.database) if args.database \
+        else os.path.join(tempfile.mkdtemp(), f'bench-{args.scale}.db')
+    reuse = os.path.exists(database)
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+    os.environ['GROUP_COMMIT'] = '0'
+    os.environ.setdefault('SLOW_QUERY_MS', '60000')
+
+    from bootstrap import create_app
+    from models import db, Committee, Person
+
+    selected = args.routes.split(',') if args.routes else list(ROUTES)
+    unknown = set(selected) - ROUTES.keys()
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        counts = None if reuse else generate(args.scale)
+        print(f"{'Reusing' if reuse else 'Generated'} {database} ({time.perf_counter() - started:.1f}s)")
+        if args.archive_horizon_months is not None:
+            from archive import archive, archive_cutoff
+            moved = archive(archive_cutoff(args.archive_horizon_months))
+            print(f"Archived {sum(moved.values())} rows into {len(moved)} partitions")
+
+        placeholders = {
+            'month': _month(),
+            'last_month': _month(1),
+            'person_id': db.session.query(Person.id).order_by(Person.id).limit(1).scalar(),
+            'committee_id': db.session.query(Committee.id).order_by(Committee.id).limit(1).scalar(),
+        }
+        uncovered = _uncovered_endpoints(app, placeholders)
+        if uncovered:
+            print(f"Warning: no benchmark for {', '.join(uncovered)}")
+
+        client = app.test_client()
+        results = {
+            'meta': {
+                'scale': args.scale,
+                'rows': counts,
+                'iterations': args.iterations,
+                'archive_horizon_months': args.archive_horizon_months,
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'created': datetime.now().isoformat(timespec='seconds'),
+            },
+            'routes': {},
+        }
+
+        print(f"{'route':<26}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'rss MB':>9}")
+        for name in selected:
+            method, path, body_factory = ROUTES[name]
+            stats = run_route(client, db.engine, method, path.format(**placeholders), body_factory,
+                              args.iterations, args.warmup)
+            results['routes'][name] = stats
+            print(f"{name:<26}{stats['throughput_rps']:>9.1f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['queries_per_request']:>9}{stats['peak_rss_mb'] or 0:>9.1f}"
+                  f"{'  errors: %d' % stats['errors'] if stats['errors'] else ''}")
+        results['peak_rss_mb'] = _peak_rss_mb()
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f'results-{args.scale}.json')
+    baseline_path = args.baseline or os.path.join(BENCHMARK_DIR, f'baseline-{args.scale}.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+    if args.update_baseline or not os.path.exists(baseline_path):
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Baseline saved to {baseline_path}')
+        return
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.noise_ms)
+    if regressions:
+        print(f'{len(regressions)} regression(s) against {baseline_path}:')
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+    print(f'No regressions against {baseline_path}')
+
+
+if __name__ == '__main__':
+    main()
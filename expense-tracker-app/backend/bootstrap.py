@@ -0,0 +1,180 @@
+"""Application startup: the app factory, schema stamp and default data.
+
+Every server process used to run db.create_all() and then look up each
+default category and payment method one query at a time. init_database()
+instead compares a stamp stored in the database with the version of the
+current models and default data, and only when they differ runs create_all,
+seeds the defaults with one INSERT ... SELECT per table that skips rows
+already present, and writes the new stamp. A process starting against an
+initialized database costs a single SELECT.
+
+The version is a hash of the DDL of every table and index plus the default
+rows, so changing a model or the defaults re-runs initialization without
+anyone bumping a number. Like create_all it never alters existing tables;
+run `python db_manager.py migrate` for that.
+
+create_app() is what the entry points (wsgi.py, asgi.py, scripts) call to
+get an app: it builds a Flask app from the environment plus an optional
+config dict, binds the extensions and registers the routes of app.py, then
+initializes the database.
+"""
+import hashlib
+import os
+from datetime import datetime
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+from sqlalchemy import exists, insert, literal, select, union_all
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models import db, Category, PaymentMethod, SchemaStamp
+from db_config import configure_database, install_sqlite_pragmas
+import archive
+import reference_cache
+
+DEFAULT_CATEGORIES = [
+    ('Food', '#e74c3c', 'fas fa-utensils'),
+    ('Shopping', '#f39c12', 'fas fa-shopping-bag'),
+    ('Home', '#27ae60', 'fas fa-home'),
+    ('Sports', '#9b59b6', 'fas fa-dumbbell'),
+    ('Commute', '#34495e', 'fas fa-bus'),
+    ('Education', '#e67e22', 'fas fa-graduation-cap'),
+    ('Trip', '#1abc9c', 'fas fa-plane'),
+    ('Committee', '#8e44ad', 'fas fa-users'),
+    ('Others', '#95a5a6', 'fas fa-circle')
+]
+
+DEFAULT_PAYMENT_METHODS = [
+    ('Cash', 'cash', 'Physical cash payments'),
+    ('Credit Card', 'card', 'Credit card payments'),
+    ('Debit Card', 'card', 'Debit card payments'),
+    ('Bank Transfer', 'transfer', 'Online bank transfers'),
+    ('Mobile Wallet', 'digital', 'Mobile wallet payments'),
+    ('UPI', 'digital', 'UPI payments'),
+    ('Cheque', 'cheque', 'Cheque payments'),
+    ('Other', 'other', 'Other payment methods')
+]
+
+
+@lru_cache(maxsize=None)
+def schema_version(dialect_name):
+    """Hash of the model DDL and default rows for the given dialect"""
+    dialect = db.engine.dialect
+    digest = hashlib.sha256()
+    for table in db.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    digest.update(repr((DEFAULT_CATEGORIES, DEFAULT_PAYMENT_METHODS)).encode())
+    return digest.hexdigest()
+
+
+def stamped_version():
+    """The version the database was last initialized for, or None"""
+    try:
+        return db.session.execute(select(SchemaStamp.version).where(SchemaStamp.id == 1)).scalar()
+    except (OperationalError, ProgrammingError):
+        # No stamp table yet
+        db.session.rollback()
+        return None
+
+
+def _insert_missing(model, names, rows):
+    """Insert the rows whose name isn't in the table yet, as one statement"""
+    columns = [getattr(model, name) for name in names]
+    candidates = union_all(*[
+        select(*[literal(value, column.type).label(column.key) for value, column in zip(row, columns)])
+        for row in rows
+    ]).subquery('defaults')
+    missing = select(candidates).where(~exists().where(model.name == candidates.c.name))
+    db.session.execute(insert(model).from_select(names, missing))
+
+
+def init_default_data():
+    """Create the default categories and payment methods that don't exist yet"""
+    _insert_missing(Category, ['name', 'color', 'icon'], DEFAULT_CATEGORIES)
+    _insert_missing(PaymentMethod, ['name', 'type', 'details'], DEFAULT_PAYMENT_METHODS)
+    db.session.commit()
+    reference_cache.invalidate_all()
+
+
+def init_database(force=False):
+    """Create tables and default data unless the stamp says it's done.
+
+    Must run inside an app context. Returns True if initialization ran.
+    """
+    version = schema_version(db.engine.dialect.name)
+    if not force and stamped_version() == version:
+        return False
+
+    db.create_all()
+    init_default_data()
+    stamp = db.session.get(SchemaStamp, 1) or SchemaStamp(id=1)
+    stamp.version = version
+    stamp.stamped_at = datetime.utcnow()
+    db.session.add(stamp)
+    db.session.commit()
+    return True
+
+
+def settings_from_env():
+    """App settings from the environment; create_app()'s config overrides them"""
+    return {
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Worker processes serving the app; gunicorn.conf.py sets it
+        'SERVER_WORKERS': int(os.environ.get('SERVER_WORKERS', 1)),
+        'RESPONSE_CACHE_BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND', 'memory'),
+        'RESPONSE_CACHE_URL': os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0'),
+        'RESPONSE_CACHE_TTL': int(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+        'GROUP_COMMIT': os.environ.get('GROUP_COMMIT', '0') == '1',
+        'GROUP_COMMIT_INTERVAL_MS': int(os.environ.get('GROUP_COMMIT_INTERVAL_MS', 10)),
+        'GROUP_COMMIT_MAX_BATCH': int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 200)),
+        'SLOW_QUERY_MS': float(os.environ.get('SLOW_QUERY_MS', 100)),
+        'PROFILE_PARAM_ENABLED': os.environ.get('PROFILE_PARAM_ENABLED', '0') == '1',
+        'JSON_ENCODER': os.environ.get('JSON_ENCODER', 'auto'),
+        'ARCHIVE_HORIZON_MONTHS': int(os.environ.get('ARCHIVE_HORIZON_MONTHS', archive.DEFAULT_HORIZON_MONTHS)),
+        'EVENTS_BACKEND': os.environ.get('EVENTS_BACKEND', 'memory'),
+        'EVENTS_URL': os.environ.get('EVENTS_URL', 'redis://localhost:6379/0'),
+        'EVENTS_QUEUE_SIZE': int(os.environ.get('EVENTS_QUEUE_SIZE', 256)),
+        'EVENTS_REPLAY': int(os.environ.get('EVENTS_REPLAY', 1000)),
+        'EVENTS_HEARTBEAT_SECONDS': float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15)),
+        'EVENTS_MAX_SUBSCRIBERS': int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 0)),
+    }
+
+
+def create_app(config=None, initialize=True):
+    """Build the Flask app.
+
+    Settings come from the environment (and .env), with config on top, e.g.
+    {'SQLALCHEMY_DATABASE_URI': ..., 'EVENTS_BACKEND': 'none'}. With
+    initialize=False the database is left alone (db_manager.py migrates first).
+    """
+    # Imported here so scripts that only need the schema helpers don't load every route
+    from flask import Flask
+    from flask_cors import CORS
+    import app as routes
+
+    load_dotenv()
+    config = dict(config or {})
+    app = Flask(routes.__name__)
+    configure_database(app, config.pop('SQLALCHEMY_DATABASE_URI', None))
+    app.config.update(settings_from_env())
+    app.config.update(config)
+
+    db.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(db.engine)
+        routes.profiler.init_app(app, db.engine)
+    routes.response_cache.init_app(app)
+    routes.group_commit.init_app(app)
+    routes.fast_json.init_app(app)
+    routes.change_feed.init_app(app)
+    CORS(app, expose_headers=['X-Next-Cursor', 'ETag'])
+    app.register_blueprint(routes.api)
+
+    if initialize:
+        with app.app_context():
+            init_database()
+    return app
@@ -0,0 +1,199 @@
+"""Committee payment schedules.
+
+A committee is owed monthly_amount for every month from start_date to
+end_date. Months are handled as ordinals (year * 12 + month - 1) so the
+expected grid is plain integer arithmetic in SQL. Payments are summed per
+(committee, month_year) once, and every committee's figures come out of a
+single grouped query over those sums. The cost grows with the number of
+payments, not committees times months, so long terms stay cheap.
+
+For the per-month view the grid itself is generated by a recursive CTE and
+left-joined against the same payment sums, so missed months come back as
+rows with nothing paid.
+
+Month statuses:
+  paid     - at least monthly_amount recorded for the month (also ahead of time)
+  partial  - something, but less than monthly_amount
+  missed   - nothing paid for a month before the current one
+  due      - the current month, nothing paid yet
+  upcoming - a later month, nothing paid yet
+"""
+from datetime import date
+
+from sqlalchemy import Integer, String, and_, case, cast, extract, func, literal, select
+
+from models import db, Committee, CommitteePayment
+
+
+def month_ordinal(column):
+    """SQL month ordinal of a date column"""
+    return cast(extract('year', column) * 12 + extract('month', column) - 1, Integer)
+
+
+def month_year_ordinal(column):
+    """SQL month ordinal of a YYYY-MM string column"""
+    return cast(func.substr(column, 1, 4), Integer) * 12 + cast(func.substr(column, 6, 2), Integer) - 1
+
+
+def month_year_of(column):
+    """SQL YYYY-MM string of a date column; compares directly with month_year"""
+    return func.substr(cast(column, String), 1, 7)
+
+
+def ordinal(day):
+    return day.year * 12 + day.month - 1
+
+
+def ordinal_month(month):
+    return f'{month // 12:04d}-{month % 12 + 1:02d}'
+
+
+def _payments_by_month(committee_ids=None):
+    query = select(
+        CommitteePayment.committee_id, CommitteePayment.month_year,
+        func.sum(CommitteePayment.amount).label('paid')
+    ).group_by(CommitteePayment.committee_id, CommitteePayment.month_year)
+    if committee_ids is not None:
+        query = query.where(CommitteePayment.committee_id.in_(committee_ids))
+    return query.subquery('payments_by_month')
+
+
+def _selected(query, committee_ids):
+    return query if committee_ids is None else query.where(Committee.id.in_(committee_ids))
+
+
+def schedule_summaries(current_month, committee_ids=None):
+    """Committee rows with their payment figures as of current_month (YYYY-MM)"""
+    payments = _payments_by_month(committee_ids)
+    terms = _selected(select(
+        Committee.id, Committee.monthly_amount,
+        month_year_of(Committee.start_date).label('first_month'),
+        month_year_of(Committee.end_date).label('last_month')
+    ), committee_ids).subquery('committee_terms')
+
+    in_term = payments.c.month_year.between(terms.c.first_month, terms.c.last_month)
+    past = payments.c.month_year < current_month
+    full = payments.c.paid >= terms.c.monthly_amount
+    # What a month's payments cover of what it owes; overpayment doesn't carry over
+    covered = case((full, terms.c.monthly_amount), else_=payments.c.paid)
+    by_committee = select(
+        payments.c.committee_id,
+        func.sum(payments.c.paid).label('paid_to_date'),
+        func.sum(case((in_term, covered), else_=0)).label('covered'),
+        func.sum(case((and_(in_term, past), covered), else_=0)).label('covered_past'),
+        func.count(case((and_(in_term, full), 1))).label('months_paid'),
+        func.count(case((and_(in_term, full, past), 1))).label('months_paid_past')
+    ).join(terms, terms.c.id == payments.c.committee_id).group_by(payments.c.committee_id).subquery()
+
+    query = _selected(select(
+        Committee.id, Committee.name, Committee.status, Committee.start_date, Committee.end_date,
+        Committee.monthly_amount, Committee.expected_receiving_amount, Committee.expected_receiving_date,
+        by_committee.c.paid_to_date,
+        func.coalesce(by_committee.c.covered, 0).label('covered'),
+        func.coalesce(by_committee.c.covered_past, 0).label('covered_past'),
+        func.coalesce(by_committee.c.months_paid, 0).label('months_paid'),
+        func.coalesce(by_committee.c.months_paid_past, 0).label('months_paid_past')
+    ).outerjoin(by_committee, by_committee.c.committee_id == Committee.id), committee_ids)
+    return db.session.execute(query.order_by(Committee.id)).all()
+
+
+def schedule_months(longest_term, committee_ids=None):
+    """(committee_id, month ordinal, paid) for every month of every term, in order.
+
+    paid is None for months without payments.
+
+    longest_term, in months, bounds the recursive month counter.
+    """
+    payments = select(
+        CommitteePayment.committee_id,
+        month_year_ordinal(CommitteePayment.month_year).label('month'),
+        func.sum(CommitteePayment.amount).label('paid')
+    ).group_by(CommitteePayment.committee_id, CommitteePayment.month_year)
+    if committee_ids is not None:
+        payments = payments.where(CommitteePayment.committee_id.in_(committee_ids))
+    payments = payments.subquery('payments_by_month')
+    terms = _selected(select(
+        Committee.id,
+        month_ordinal(Committee.start_date).label('first_month'),
+        month_ordinal(Committee.end_date).label('last_month')
+    ), committee_ids).subquery('committee_terms')
+
+    offsets = select(literal(0).label('n')).cte('month_offsets', recursive=True)
+    offsets = offsets.union_all(select(offsets.c.n + 1).where(offsets.c.n + 1 < longest_term))
+    grid = select(
+        terms.c.id.label('committee_id'), (terms.c.first_month + offsets.c.n).label('month')
+    ).join(offsets, offsets.c.n <= terms.c.last_month - terms.c.first_month).subquery('grid')
+
+    query = select(
+        grid.c.committee_id, grid.c.month, payments.c.paid
+    ).outerjoin(payments, and_(
+        payments.c.committee_id == grid.c.committee_id, payments.c.month == grid.c.month
+    )).order_by(grid.c.committee_id, grid.c.month)
+    return db.session.execute(query).all()
+
+
+def month_status(month, paid, monthly_amount, current_month):
+    if paid >= monthly_amount:
+        return 'paid'
+    if paid > 0:
+        return 'partial'
+    if month < current_month:
+        return 'missed'
+    return 'due' if month == current_month else 'upcoming'
+
+
+def committee_schedule(today=None, committee_ids=None, include_months=False):
+    """Schedule figures for every committee (or those in committee_ids).
+
+    Per committee: the term in months, how many have elapsed (the current one
+    included) or been fully paid, how many earlier months are not fully paid
+    and what they still owe (arrears), paid_to_date, what remains to be paid
+    over the term and the projected payout; projected_net is the payout less
+    everything paid in over the term. include_months adds the month grid.
+    """
+    today = today or date.today()
+    current_month = ordinal(today)
+    rows = schedule_summaries(ordinal_month(current_month), committee_ids)
+
+    schedule = []
+    for row in rows:
+        first_month = ordinal(row.start_date)
+        months_total = max(0, ordinal(row.end_date) - first_month + 1)
+        months_elapsed = min(months_total, max(0, current_month - first_month + 1))
+        months_past = min(months_total, max(0, current_month - first_month))
+        remaining_to_pay = months_total * row.monthly_amount - row.covered
+        paid_to_date = row.paid_to_date or 0
+        schedule.append({
+            'id': row.id,
+            'name': row.name,
+            'status': row.status,
+            'monthly_amount': row.monthly_amount,
+            'first_month': row.start_date.strftime('%Y-%m'),
+            'last_month': row.end_date.strftime('%Y-%m'),
+            'months_total': months_total,
+            'months_elapsed': months_elapsed,
+            'months_paid': row.months_paid,
+            'months_in_arrears': months_past - row.months_paid_past,
+            'expected_to_date': months_elapsed * row.monthly_amount,
+            'paid_to_date': paid_to_date,
+            'arrears': months_past * row.monthly_amount - row.covered_past,
+            'remaining_to_pay': remaining_to_pay,
+            'projected_payout': row.expected_receiving_amount,
+            'projected_payout_date': row.expected_receiving_date,
+            'projected_net': row.expected_receiving_amount - paid_to_date - remaining_to_pay
+        })
+
+    if include_months and schedule:
+        by_id = {entry['id']: entry for entry in schedule}
+        for entry in schedule:
+            entry['months'] = []
+        longest = max(entry['months_total'] for entry in schedule)
+        for committee_id, month, paid in schedule_months(longest, committee_ids):
+            entry = by_id[committee_id]
+            paid = paid or 0
+            entry['months'].append({
+                'month': ordinal_month(month),
+                'paid': paid,
+                'status': month_status(month, paid, entry['monthly_amount'], current_month)
+            })
+    return schedule
@@ -0,0 +1,82 @@
+"""Engine configuration for SQLite and server databases.
+
+The database URI and tuning knobs come from the environment so the same code
+runs against the local SQLite file in development and Postgres in production.
+For SQLite every new connection is switched to WAL with relaxed fsyncs, a busy
+timeout and larger page/mmap caches, which lets readers run alongside a
+writer instead of failing with "database is locked".
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_URI = 'sqlite:///expense_tracker_enhanced.db'
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_pragmas():
+    """PRAGMA statements run on every new SQLite connection"""
+    if os.environ.get('SQLITE_TUNING', '1') == '0':
+        return []
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+        f"PRAGMA mmap_size={_env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        # Negative values are KiB rather than pages
+        f"PRAGMA cache_size={_env_int('SQLITE_CACHE_SIZE', -64 * 1024)}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def engine_options(uri):
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # In-memory databases live in a single connection; keep the default pool
+            return {}
+        return {
+            'pool_size': _env_int('DB_POOL_SIZE', 10),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            'connect_args': {
+                'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+                'check_same_thread': False,
+            },
+        }
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_database(app, uri=None):
+    """Fill in the SQLAlchemy settings for uri, by default DATABASE_URL"""
+    uri = uri or os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URI)
+    if uri.startswith('postgres://'):
+        # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+
+
+def install_sqlite_pragmas(engine):
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas()
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -0,0 +1,320 @@
+"""Database maintenance operations for the expense tracker.
+
+Run from the backend directory, e.g.:
+
+    python db_manager.py migrate
+    python db_manager.py rebuild-rollups
+    python db_manager.py rebuild-loan-balances
+    python db_manager.py rebuild-search
+    python db_manager.py rebuild-tags
+    python db_manager.py archive [--horizon-months N]
+    python db_manager.py verify-archive
+"""
+import argparse
+import sys
+
+from flask import current_app
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.schema import CreateTable
+
+from models import db, Money, ArchivePartition, MonthlyRollup, MonthlyTotal, Tag, ExpenseTag
+from rollups import rebuild_rollups, verify_rollups
+from loan_balances import repair_loan_balances
+from search import create_search_index, search_supported
+import archive
+from bootstrap import init_database
+from tag_index import normalize_stored_tags, rebuild_tag_index
+
+
+def create_missing_indexes():
+    """Create any model-declared index that is missing from the database.
+
+    db.create_all() only creates indexes together with new tables, so
+    databases created before an index was added need this to pick it up.
+    Returns the names of the indexes that were created.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=db.engine)
+                created.append(index.name)
+
+    return created
+
+
+def add_missing_columns():
+    """Add model columns that existing tables lack (SQLite can only append).
+
+    Returns the added columns as "table.column" strings.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f'{table.name}.{column.name}')
+
+    return added
+
+
+def convert_money_columns():
+    """Move amounts from the old float columns to the integer cents columns.
+
+    Money columns are stored as <name>_cents; a table that still has the float
+    column under the plain name gets the cents column filled with the rounded
+    cents and the float column dropped, with the NOT NULL constraints of the
+    model. SQLite can't add a NOT NULL column to a filled table, so there the
+    table is rebuilt: created as the model declares it, filled from the old
+    one, which is dropped, and renamed into place; columns the model no
+    longer declares are not carried over. Elsewhere the cents column is added
+    and constrained afterwards. Indexes on the old columns (and, on SQLite,
+    the table's indexes and triggers) are recreated by migrate. Returns the
+    converted columns as "table.column" strings.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    converted = []
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            float_columns = [
+                column for column in table.columns
+                if isinstance(column.type, Money) and column.key in existing_columns
+                and column.name not in existing_columns
+            ]
+            if not float_columns:
+                continue
+
+            if connection.dialect.name == 'sqlite':
+                _rebuild_table(connection, table, existing_columns)
+                converted.extend(f'{table.name}.{column.key}' for column in float_columns)
+                continue
+
+            float_names = {column.key for column in float_columns}
+            for index in inspector.get_indexes(table.name):
+                if float_names & set(index['column_names']):
+                    connection.execute(text(f"DROP INDEX {index['name']}"))
+            for column in float_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                connection.execute(text(
+                    f'UPDATE {table.name} SET {column.name} = CAST(ROUND({column.key} * 100) AS BIGINT)'
+                ))
+                connection.execute(text(f'ALTER TABLE {table.name} DROP COLUMN {column.key}'))
+                if not column.nullable:
+                    connection.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} SET NOT NULL'))
+                converted.append(f'{table.name}.{column.key}')
+
+    return converted
+
+
+def drop_stale_foreign_keys():
+    """Drop foreign keys the models no longer declare, such as expense_tags.expense_id.
+
+    SQLite can't drop a constraint, so the table is rebuilt as the model
+    declares it (see convert_money_columns()). Returns the dropped keys as
+    "table.column -> table" strings.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    dropped = []
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            declared = {
+                (tuple(element.parent.name for element in key.elements), key.referred_table.name)
+                for key in table.foreign_key_constraints
+            }
+            stale = [
+                key for key in inspector.get_foreign_keys(table.name)
+                if (tuple(key['constrained_columns']), key['referred_table']) not in declared
+            ]
+            if not stale:
+                continue
+
+            if connection.dialect.name == 'sqlite':
+                existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+                _rebuild_table(connection, table, existing_columns)
+            else:
+                for key in stale:
+                    connection.execute(text(f"ALTER TABLE {table.name} DROP CONSTRAINT {key['name']}"))
+            dropped.extend(f"{table.name}.{', '.join(key['constrained_columns'])} -> {key['referred_table']}"
+                           for key in stale)
+
+    return dropped
+
+
+def _rebuild_table(connection, table, existing_columns):
+    """Recreate a SQLite table as the model declares it, converting float amounts to cents"""
+    rebuilt = f'{table.name}_rebuilt'
+    columns, values = [], []
+    for column in table.columns:
+        if isinstance(column.type, Money) and column.name not in existing_columns:
+            if column.key not in existing_columns:
+                continue
+            values.append(f'CAST(ROUND({column.key} * 100) AS BIGINT)')
+        elif column.name in existing_columns:
+            values.append(column.name)
+        else:
+            continue
+        columns.append(column.name)
+
+    # Only the table: its indexes keep their names and are created by migrate
+    create = str(CreateTable(table).compile(dialect=connection.dialect))
+    connection.execute(text(create.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {rebuilt} ', 1)))
+    connection.execute(text(
+        f"INSERT INTO {rebuilt} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {table.name}"
+    ))
+    connection.execute(text(f'DROP TABLE {table.name}'))
+    connection.execute(text(f'ALTER TABLE {rebuilt} RENAME TO {table.name}'))
+
+
+def migrate():
+    """Bring an existing database up to the current schema."""
+    existing_tables = set(inspect(db.engine).get_table_names())
+    converted = convert_money_columns()
+    if converted:
+        print(f"Converted to integer cents: {', '.join(converted)}")
+    added = add_missing_columns()
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+    dropped = drop_stale_foreign_keys()
+    if dropped:
+        print(f"Dropped foreign keys: {', '.join(dropped)}")
+    db.create_all()
+    created = create_missing_indexes()
+    if created:
+        print(f"Created indexes: {', '.join(created)}")
+    else:
+        print("All indexes already exist")
+
+    rollup_tables = {MonthlyRollup.__tablename__, MonthlyTotal.__tablename__}
+    # Converted totals are reconciled against the exact sums of the converted amounts
+    if converted or not rollup_tables <= existing_tables:
+        rebuild_rollups_command()
+    if converted or 'loans.cumulative_net_cents' in added:
+        rebuild_loan_balances_command()
+    if not {Tag.__tablename__, ExpenseTag.__tablename__} <= existing_tables:
+        rebuild_tags_command()
+    normalized = normalize_stored_tags()
+    if normalized:
+        print(f"Normalized the stored tags of {normalized} expenses")
+        if search_supported(db.engine):
+            # Archived rows have no triggers to re-index them
+            rebuild_search_command()
+    init_database(force=True)
+    print("Default data and schema stamp are up to date")
+
+
+def rebuild_rollups_command():
+    """Reconcile the monthly rollup tables against the raw tables."""
+    result = rebuild_rollups()
+    print(f"Rebuilt {result['rows']} rollup rows ({result['drifted']} were out of date)")
+
+
+def rebuild_loan_balances_command():
+    """Recompute the running balance stored on every loan."""
+    count = repair_loan_balances()
+    db.session.commit()
+    print(f"Recomputed running balances for {count} loans")
+
+
+def rebuild_search_command():
+    """Re-index every expense for full-text search."""
+    with db.engine.begin() as connection:
+        if create_search_index(connection, rebuild=True):
+            print("Rebuilt the expense search index")
+        else:
+            print("Full-text search is only available on SQLite")
+
+
+def rebuild_tags_command():
+    """Re-parse every expense's tag string into the normalized tag tables."""
+    links = rebuild_tag_index()
+    print(f"Indexed {links} expense tags")
+
+
+def archive_command(horizon_months=None):
+    """Move expenses and loans older than the horizon into per-year archive partitions."""
+    if horizon_months is None:
+        horizon_months = current_app.config['ARCHIVE_HORIZON_MONTHS']
+    cutoff = archive.archive_cutoff(horizon_months)
+    moved = archive.archive(cutoff)
+    if not moved:
+        print(f"Nothing dated before {cutoff} to archive")
+    for table_name, count in moved.items():
+        print(f"Archived {count} rows into {table_name}")
+
+
+def verify_archive_command():
+    """Check the archive partitions, their totals and the rollups built over them."""
+    problems = archive.verify_archive()
+    drifted = verify_rollups()
+    if drifted:
+        problems.append(f"{drifted} rollup rows don't match the live and archived rows")
+    if search_supported(db.engine):
+        indexed = db.session.execute(text('SELECT count(*) FROM expenses_fts')).scalar()
+        expected = sum(
+            db.session.execute(select(func.count()).select_from(expenses)).scalar()
+            for expenses in archive.sources('expenses', fresh=True)
+        )
+        if indexed != expected:
+            problems.append(f"search index holds {indexed} rows for {expected} expenses")
+
+    for problem in problems:
+        print(problem)
+    partitions = ArchivePartition.query.count()
+    if problems:
+        print(f"{len(problems)} problems found in {partitions} archive partitions")
+        sys.exit(1)
+    print(f"{partitions} archive partitions are consistent")
+
+
+COMMANDS = {
+    'migrate': migrate,
+    'rebuild-rollups': rebuild_rollups_command,
+    'rebuild-loan-balances': rebuild_loan_balances_command,
+    'rebuild-search': rebuild_search_command,
+    'rebuild-tags': rebuild_tags_command,
+    'archive': archive_command,
+    'verify-archive': verify_archive_command,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Expense tracker database maintenance')
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--horizon-months', type=int,
+                        help='archive: keep this many months live (default ARCHIVE_HORIZON_MONTHS)')
+    args = parser.parse_args()
+
+    from bootstrap import create_app
+
+    # Not initialized: create_all would have to wait for migrate
+    app = create_app(initialize=False)
+    with app.app_context():
+        if args.command == 'archive':
+            archive_command(args.horizon_months)
+        else:
+            COMMANDS[args.command]()
@@ -0,0 +1,282 @@
+"""Server-Sent Events change feed for the write routes.
+
+Write routes call publish() after committing, with a compact description of
+the row they added, and GET /api/events streams it to every subscriber:
+
+    id: 3f9a1c2e-42
+    event: expense
+    data: {"id":1234,"amount":12.5,"date":"2024-05-01","category":"Food"}
+
+Clients apply these deltas to what they show instead of polling.
+
+Each subscriber has a bounded queue (EVENTS_QUEUE_SIZE). A client too slow to
+drain it never holds up the writers or grows the server's memory: its queue
+is dropped and it gets a single `resync` event, after which it reloads. A
+heartbeat comment is sent every EVENTS_HEARTBEAT_SECONDS so proxies keep the
+connection open and disconnected clients are noticed. The last EVENTS_REPLAY
+events are kept so a reconnecting EventSource (Last-Event-ID) receives what it
+missed, or `resync` once those events are gone. Event ids start with a token
+of the process (or Redis) that numbered them, so an id from before a restart
+is never mistaken for a recent one.
+
+Backends:
+  memory - events reach the subscribers of this process only (default; fine
+           for the development server, uvicorn or a single gunicorn worker),
+           so it refuses to start when SERVER_WORKERS > 1
+  redis  - events go through Redis pub/sub so subscribers of every worker get
+           them; needs the optional redis package
+  none   - the feed is disabled and GET /api/events answers 503
+
+Under gunicorn's threaded workers every open stream holds a thread;
+EVENTS_MAX_SUBSCRIBERS caps them per process (gunicorn.conf.py defaults it to
+half the threads) and further clients get 503. asgi.py serves the stream on
+the event loop instead.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_REPLAY = 1000
+DEFAULT_HEARTBEAT_SECONDS = 15
+# Reconnect delay suggested to EventSource clients
+RETRY_MS = 3000
+
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Stop nginx from buffering the stream
+    'X-Accel-Buffering': 'no',
+}
+HEARTBEAT = b': heartbeat\n\n'
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event_id, event_type, data):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'.encode()
+
+
+class Subscriber:
+    """Bounded queue of one client; wake() is called whenever something is queued"""
+
+    def __init__(self, max_size, wake=None):
+        self.max_size = max_size
+        if wake is None:
+            self.ready = threading.Event()
+            wake = self.ready.set
+        self.wake = wake
+        self.events = deque()
+        self.overflowed = False
+        self.lock = threading.Lock()
+
+    def push(self, event):
+        with self.lock:
+            if self.overflowed:
+                # A resync is already owed and covers this event too
+                return
+            if len(self.events) >= self.max_size:
+                self.events.clear()
+                self.overflowed = True
+            else:
+                self.events.append(event)
+        self.wake()
+
+
+class ChangeFeed:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self.heartbeat = DEFAULT_HEARTBEAT_SECONDS
+        self.max_subscribers = 0
+        self.redis = None
+        self.prefix = 'expense-tracker:events:'
+        self.published = 0
+        self.resyncs = 0
+        self._epoch = secrets.token_hex(4)
+        self._last_id = 0
+        self._recent = deque(maxlen=DEFAULT_REPLAY)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('EVENTS_BACKEND', 'memory')
+        self.queue_size = int(app.config.get('EVENTS_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+        self.heartbeat = float(app.config.get('EVENTS_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS))
+        self.max_subscribers = int(app.config.get('EVENTS_MAX_SUBSCRIBERS', 0))
+        self._recent = deque(maxlen=int(app.config.get('EVENTS_REPLAY', DEFAULT_REPLAY)))
+        if backend == 'memory':
+            if int(app.config.get('SERVER_WORKERS', 1)) > 1:
+                raise RuntimeError('EVENTS_BACKEND=memory only reaches the streams of the worker that served the '
+                                   'write; with several workers use redis or none')
+            self.enabled = True
+        elif backend == 'redis':
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError('EVENTS_BACKEND=redis requires the redis package') from e
+            self.redis = redis.Redis.from_url(app.config.get('EVENTS_URL', 'redis://localhost:6379/0'))
+            self.enabled = True
+        elif backend == 'none':
+            self.enabled = False
+        else:
+            raise ValueError(f'Unknown EVENTS_BACKEND: {backend}')
+
+    # Publishing
+
+    def publish(self, event_type, data):
+        """Send a committed change to every subscriber.
+
+        Called after the commit, so a failure here is logged rather than
+        turned into an error for a write that has already succeeded.
+        """
+        if not self.enabled:
+            return
+        payload = json.dumps(data, separators=(',', ':'))
+        try:
+            if self.redis is None:
+                self._deliver(None, event_type, payload)
+            else:
+                number = self.redis.incr(self.prefix + 'id')
+                self.redis.publish(self.prefix + 'channel', json.dumps([number, event_type, payload]))
+        except Exception:
+            logger.exception('Failed to publish %s event', event_type)
+
+    def _deliver(self, number, event_type, payload):
+        with self._lock:
+            # Redis numbers events across workers, so they may arrive slightly out of order
+            number = self._last_id + 1 if number is None else number
+            self._last_id = max(self._last_id, number)
+            event = (number, event_type, payload)
+            self._recent.append(event)
+            self.published += 1
+            # Pushed under the lock so every subscriber sees events in id order
+            for subscriber in self._subscribers:
+                subscriber.push(event)
+
+    # Subscribing
+
+    def subscribe(self, last_event_id=None, wake=None):
+        """Register a client; returns None when EVENTS_MAX_SUBSCRIBERS are already connected.
+
+        With last_event_id (a reconnecting EventSource) the events it missed
+        are queued straight away, or a resync when they are no longer kept.
+        """
+        self._ensure_listener()
+        subscriber = Subscriber(self.queue_size, wake)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id:
+                missed = self._missed_since(last_event_id)
+                if missed is None or len(missed) > self.queue_size:
+                    subscriber.overflowed = True
+                else:
+                    subscriber.events.extend(missed)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _missed_since(self, last_event_id):
+        """Kept events after last_event_id, or None if some of them are gone"""
+        epoch, _, number = last_event_id.rpartition('-')
+        if epoch != self._epoch or not number.isdigit():
+            return None
+        number = int(number)
+        if number >= self._last_id:
+            return []
+        if not self._recent or self._recent[0][0] > number + 1:
+            return None
+        return [event for event in self._recent if event[0] > number]
+
+    def pending(self, subscriber):
+        """The SSE bytes of everything queued for a subscriber, emptying its queue"""
+        with subscriber.lock:
+            if subscriber.overflowed:
+                subscriber.overflowed = False
+                subscriber.events.clear()
+                self.resyncs += 1
+                # Carries the newest id so the client resumes after what its reload will show
+                return format_event(f'{self._epoch}-{self._last_id}', 'resync', '{}')
+            events = list(subscriber.events)
+            subscriber.events.clear()
+        return b''.join(format_event(f'{self._epoch}-{number}', event_type, payload)
+                        for number, event_type, payload in events)
+
+    def stream(self, subscriber):
+        """SSE body for a thread-per-request server; blocks its thread between events"""
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        while True:
+            subscriber.ready.clear()
+            chunk = self.pending(subscriber)
+            if chunk:
+                yield chunk
+            if not subscriber.ready.wait(self.heartbeat):
+                yield HEARTBEAT
+
+    async def astream(self, subscriber, ready):
+        """SSE body for an event loop; ready is the asyncio.Event the subscriber's wake() sets"""
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        while True:
+            ready.clear()
+            chunk = self.pending(subscriber)
+            if chunk:
+                yield chunk
+            try:
+                await asyncio.wait_for(ready.wait(), self.heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            'backend': 'redis' if self.redis is not None else ('memory' if self.enabled else None),
+            'subscribers': subscribers,
+            'published': self.published,
+            'resyncs': self.resyncs,
+        }
+
+    # Redis listener
+
+    def _ensure_listener(self):
+        # Started lazily so forked server workers each get their own thread
+        if self.redis is None:
+            return
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._epoch = self._redis_epoch()
+                self._listener = threading.Thread(target=self._listen, name='change-feed', daemon=True)
+                self._listener.start()
+
+    def _redis_epoch(self):
+        # Shared by every worker, so a client may reconnect to any of them
+        self.redis.set(self.prefix + 'epoch', secrets.token_hex(4), nx=True)
+        return self.redis.get(self.prefix + 'epoch').decode()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.prefix + 'channel')
+                for message in pubsub.listen():
+                    self._deliver(*json.loads(message['data']))
+            except Exception:
+                logger.exception('Lost the Redis change feed subscription')
+                # Anything published meanwhile is lost, so every client reloads
+                with self._lock:
+                    for subscriber in self._subscribers:
+                        with subscriber.lock:
+                            subscriber.overflowed = True
+                        subscriber.wake()
+                time.sleep(1)
@@ -0,0 +1,257 @@
+"""Streaming export of the ledger as CSV or Parquet.
+
+Rows are read from the database in yield_per batches and written out batch by
+batch, so memory stays bounded by the batch size rather than the table size.
+Parquet output needs the optional pyarrow package.
+"""
+import csv
+import io
+import logging
+import time
+
+from sqlalchemy import literal, null, select, union_all
+
+from models import db, Category, Person, Committee, CommitteePayment, MonthlyIncome
+import archive
+
+EXPORT_BATCH_SIZE = 2000
+
+logger = logging.getLogger(__name__)
+
+
+def _date_range(column, start_date, end_date):
+    conditions = []
+    if start_date:
+        conditions.append(column >= start_date)
+    if end_date:
+        conditions.append(column <= end_date)
+    return conditions
+
+
+def _month_range(column, start_date, end_date):
+    # month_year columns hold "YYYY-MM", which sorts the same way as dates
+    conditions = []
+    if start_date:
+        conditions.append(column >= start_date.strftime('%Y-%m'))
+    if end_date:
+        conditions.append(column <= end_date.strftime('%Y-%m'))
+    return conditions
+
+
+def expenses_query(start_date=None, end_date=None):
+    expenses = archive.history('expenses', start_date, end_date)
+    return select(
+        expenses.id, expenses.date, expenses.amount, Category.name.label('category'),
+        expenses.description, expenses.location, expenses.notes, expenses.tags, expenses.created_at
+    ).join(Category, expenses.category_id == Category.id).where(
+        *_date_range(expenses.date, start_date, end_date)
+    ).order_by(expenses.date, expenses.id)
+
+
+def loans_query(start_date=None, end_date=None):
+    loans = archive.history('loans', start_date, end_date)
+    return select(
+        loans.id, loans.date, Person.name.label('person'), loans.loan_type, loans.amount,
+        loans.description, loans.due_date, loans.interest_rate, loans.status, loans.notes
+    ).join(Person, loans.person_id == Person.id).where(
+        *_date_range(loans.date, start_date, end_date)
+    ).order_by(loans.date, loans.id)
+
+
+def committee_payments_query(start_date=None, end_date=None):
+    return select(
+        CommitteePayment.id, CommitteePayment.payment_date, Committee.name.label('committee'),
+        CommitteePayment.month_year, CommitteePayment.amount, CommitteePayment.status
+    ).join(Committee, CommitteePayment.committee_id == Committee.id).where(
+        *_date_range(CommitteePayment.payment_date, start_date, end_date)
+    ).order_by(CommitteePayment.payment_date, CommitteePayment.id)
+
+
+def income_query(start_date=None, end_date=None):
+    return select(
+        MonthlyIncome.id, MonthlyIncome.month_year, MonthlyIncome.amount, MonthlyIncome.source
+    ).where(
+        *_month_range(MonthlyIncome.month_year, start_date, end_date)
+    ).order_by(MonthlyIncome.month_year, MonthlyIncome.id)
+
+
+def ledger_query(start_date=None, end_date=None):
+    """Every money movement in one date-ordered stream with a shared set of columns"""
+    def row(entity, id_column, date_column, amount, category=None, person=None,
+            committee=None, loan_type=None, description=None):
+        return (
+            literal(entity).label('entity'), id_column.label('id'), date_column.label('date'),
+            amount.label('amount'),
+            (category if category is not None else null()).label('category'),
+            (person if person is not None else null()).label('person'),
+            (committee if committee is not None else null()).label('committee'),
+            (loan_type if loan_type is not None else null()).label('loan_type'),
+            (description if description is not None else null()).label('description'),
+        )
+
+    # Archived expenses and loans are included through their partitions
+    expense = archive.history('expenses', start_date, end_date)
+    loan = archive.history('loans', start_date, end_date)
+    expenses = select(*row(
+        'expense', expense.id, expense.date, expense.amount,
+        category=Category.name, description=expense.description
+    )).join(Category, expense.category_id == Category.id).where(
+        *_date_range(expense.date, start_date, end_date)
+    )
+    loans = select(*row(
+        'loan', loan.id, loan.date, loan.amount,
+        person=Person.name, loan_type=loan.loan_type, description=loan.description
+    )).join(Person, loan.person_id == Person.id).where(
+        *_date_range(loan.date, start_date, end_date)
+    )
+    committee_payments = select(*row(
+        'committee_payment', CommitteePayment.id, CommitteePayment.payment_date,
+        CommitteePayment.amount, committee=Committee.name
+    )).join(Committee, CommitteePayment.committee_id == Committee.id).where(
+        *_date_range(CommitteePayment.payment_date, start_date, end_date)
+    )
+    # Income is recorded per month; date it to the first of the month
+    income = select(*row(
+        'income', MonthlyIncome.id, MonthlyIncome.month_year.concat('-01'), MonthlyIncome.amount,
+        description=MonthlyIncome.source
+    )).where(*_month_range(MonthlyIncome.month_year, start_date, end_date))
+
+    ledger = union_all(expenses, loans, committee_payments, income).subquery()
+    return select(ledger).order_by(ledger.c.date, ledger.c.entity, ledger.c.id)
+
+
+EXPORTS = {
+    'ledger': ledger_query,
+    'expenses': expenses_query,
+    'loans': loans_query,
+    'committee_payments': committee_payments_query,
+    'income': income_query,
+}
+
+
+def _batches(stmt, batch_size):
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    return result.keys(), result.partitions()
+
+
+def _arrow_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class _ThroughputLog:
+    """Logs rows, bytes and MB/s once an export stream is exhausted"""
+
+    def __init__(self, entity, file_format):
+        self.entity = entity
+        self.file_format = file_format
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    def count(self, chunk, rows=0):
+        self.rows += rows
+        self.bytes += len(chunk)
+        return chunk
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        megabytes = self.bytes / (1024 * 1024)
+        logger.info('Exported %d %s rows as %s: %.2f MB in %.2fs (%.2f MB/s)',
+                    self.rows, self.entity, self.file_format, megabytes, elapsed,
+                    megabytes / elapsed if elapsed > 0 else 0)
+
+
+def iter_csv(entity, start_date=None, end_date=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the export as CSV text, one chunk per database batch"""
+    log = _ThroughputLog(entity, 'csv')
+    columns, batches = _batches(EXPORTS[entity](start_date, end_date), batch_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield log.count(buffer.getvalue())
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_format_value(value) for value in row] for row in batch)
+        yield log.count(buffer.getvalue(), len(batch))
+
+    log.finish()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(entity, start_date=None, end_date=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the export as a Parquet file with one row group per database batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    log = _ThroughputLog(entity, 'parquet')
+    columns, batches = _batches(EXPORTS[entity](start_date, end_date), batch_size)
+    columns = list(columns)
+
+    sink = _ChunkSink()
+    writer = None
+    for batch in batches:
+        table = pa.table({
+            name: [_arrow_value(row[index]) for row in batch]
+            for index, name in enumerate(columns)
+        })
+        if writer is None:
+            # Columns that are all NULL in the first batch can't be typed from it
+            schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            writer = pq.ParquetWriter(sink, schema, compression='snappy')
+        writer.write_table(table.cast(writer.schema))
+        yield log.count(sink.drain(), len(batch))
+
+    if writer is None:
+        # No rows: still produce a valid file with string columns
+        schema = pa.schema([(name, pa.string()) for name in columns])
+        writer = pq.ParquetWriter(sink, schema)
+    writer.close()
+    yield log.count(sink.drain())
+
+    log.finish()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,122 @@
+"""Fast JSON responses for the large list endpoints.
+
+jsonify() spends most of a big list response in the stdlib encoder and in the
+per-row .isoformat() calls made while building its dicts. FastJSON takes
+payloads whose date/datetime values are left as they come from the database
+and encodes them in one pass: with orjson when it is installed, otherwise with
+the stdlib encoder. Dates are written as ISO 8601 strings either way.
+
+For finite values the body is byte-for-byte what jsonify() returns for the
+same payload with dates already converted: Flask's sort_keys/ensure_ascii
+settings, compact separators (indented in debug mode) and a trailing
+newline. orjson leaves non-ASCII text unescaped and formats very large or
+very small floats differently from Python, so any orjson output that might
+contain either is re-encoded with the stdlib encoder.
+
+NaN and Infinity are the exception: jsonify writes them as the non-standard
+NaN/Infinity tokens, orjson as null. They are not re-encoded, since finding
+them means walking the whole payload in Python, which costs about as much
+as the stdlib encoder itself. Amounts are stored as integer cents and can't
+be non-finite, so only a non-finite float column (interest_rate on Postgres)
+ever differs.
+
+JSON_ENCODER selects the encoder:
+  auto   - orjson if importable, else stdlib (default)
+  orjson - require orjson
+  stdlib - always use the json module
+"""
+import dataclasses
+import decimal
+import json
+import re
+import uuid
+from datetime import date
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+ENCODERS = ('auto', 'orjson', 'stdlib')
+
+# orjson writes exponents without a sign or zero padding ("1e16" for
+# "1e+16", "2.5e-7" for "2.5e-07") and floats below 1e-4 positionally
+# ("0.00001" for "1e-05"). Both patterns start with a literal so the scan
+# stays cheap; candidates inside strings are ruled out by their neighbours.
+_EXPONENT = re.compile(rb'e(?:-\d|[123])\d*')
+_TINY_FLOAT = b'0.0000'
+_DIGITS = frozenset(b'0123456789')
+
+
+def _orjson_float_mismatch(body):
+    """Whether orjson output may hold a float that repr() writes differently"""
+    for match in _EXPONENT.finditer(body):
+        start, end = match.span()
+        if start and body[start - 1] in _DIGITS and (end == len(body) or body[end] in b',}]'):
+            return True
+    start = body.find(_TINY_FLOAT)
+    while start != -1:
+        if start == 0 or body[start - 1] in b'-:,[':
+            return True
+        start = body.find(_TINY_FLOAT, start + len(_TINY_FLOAT))
+    return False
+
+
+def json_default(o):
+    """Fallback for types the json module can't encode; mirrors Flask's, but dates are ISO 8601"""
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class FastJSON:
+    def __init__(self, app=None):
+        self.use_orjson = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        encoder = app.config.get('JSON_ENCODER', 'auto')
+        if encoder not in ENCODERS:
+            raise ValueError(f"JSON_ENCODER must be one of: {', '.join(ENCODERS)}")
+        if encoder == 'orjson' and orjson is None:
+            raise RuntimeError('JSON_ENCODER=orjson needs the orjson package: pip install orjson')
+        self.use_orjson = encoder != 'stdlib' and orjson is not None
+        app.extensions['fast_json'] = self
+
+    @property
+    def encoder(self):
+        return 'orjson' if self.use_orjson else 'stdlib'
+
+    def dumps(self, payload, app=None):
+        """Encode payload to the bytes jsonify() would send, trailing newline included"""
+        app = app or current_app
+        provider = app.json
+        compact = (provider.compact is None and not app.debug) or provider.compact is True
+
+        if self.use_orjson and compact:
+            try:
+                body = orjson.dumps(payload, default=json_default,
+                                    option=orjson.OPT_SORT_KEYS if provider.sort_keys else 0)
+            except TypeError:
+                body = None  # e.g. non-string keys; let the stdlib encoder decide
+            if body is not None and (body.isascii() or not provider.ensure_ascii) \
+                    and not _orjson_float_mismatch(body):
+                return body + b'\n'
+
+        dump_args = {'separators': (',', ':')} if compact else {'indent': 2}
+        return (json.dumps(payload, default=json_default, ensure_ascii=provider.ensure_ascii,
+                           sort_keys=provider.sort_keys, **dump_args) + '\n').encode()
+
+    def response(self, payload, status=200):
+        """A jsonify()-equivalent response for payload"""
+        return current_app.response_class(self.dumps(payload), status=status,
+                                          mimetype=current_app.json.mimetype)
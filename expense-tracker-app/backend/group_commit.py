@@ -0,0 +1,190 @@
+"""Group commit for the single-row POST routes.
+
+Write routes hand their work to GroupCommit.submit() as a function that adds
+rows to db.session and returns the response data. By default the function
+runs in the request and is committed straight away, exactly as before.
+
+With GROUP_COMMIT enabled, submissions are queued to a writer thread that runs
+up to GROUP_COMMIT_MAX_BATCH of them in one transaction, waiting at most
+GROUP_COMMIT_INTERVAL_MS after the first one arrives. Each request blocks
+until its batch has committed, so a 201 still means the row is stored. If any
+write in a batch fails, the batch is rolled back and its writes are retried
+one at a time so only the failing request sees the error.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from models import db
+
+DEFAULT_INTERVAL_MS = 10
+DEFAULT_MAX_BATCH = 200
+METRICS_WINDOW = 1000
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class CommitMetrics:
+    """Batch sizes and latencies of the most recent commits"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.failed_batches = 0
+        self.batch_sizes = deque(maxlen=METRICS_WINDOW)
+        self.commit_ms = deque(maxlen=METRICS_WINDOW)
+        self.wait_ms = deque(maxlen=METRICS_WINDOW)
+
+    def record_batch(self, size, commit_ms):
+        with self._lock:
+            self.batches += 1
+            self.writes += size
+            self.batch_sizes.append(size)
+            self.commit_ms.append(commit_ms)
+
+    def record_wait(self, wait_ms):
+        with self._lock:
+            self.wait_ms.append(wait_ms)
+
+    def record_failure(self):
+        with self._lock:
+            self.failed_batches += 1
+
+    @staticmethod
+    def _summary(values):
+        values = list(values)
+        return {
+            'mean': round(sum(values) / len(values), 3) if values else None,
+            'p50': _percentile(values, 0.50),
+            'p99': _percentile(values, 0.99),
+            'max': max(values) if values else None,
+        }
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'writes': self.writes,
+                'failed_batches': self.failed_batches,
+                'batch_size': self._summary(self.batch_sizes),
+                'commit_ms': self._summary(self.commit_ms),
+                # Time from submit() to acknowledgement, as seen by the request
+                'wait_ms': self._summary(self.wait_ms),
+            }
+
+
+class _PendingWrite:
+    def __init__(self, work):
+        self.work = work
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class GroupCommit:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.interval = DEFAULT_INTERVAL_MS / 1000
+        self.max_batch = DEFAULT_MAX_BATCH
+        self.metrics = CommitMetrics()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = bool(app.config.get('GROUP_COMMIT', False))
+        self.interval = int(app.config.get('GROUP_COMMIT_INTERVAL_MS', DEFAULT_INTERVAL_MS)) / 1000
+        self.max_batch = int(app.config.get('GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH))
+
+    def submit(self, work):
+        """Run work() and commit it; returns work()'s result once it is committed"""
+        started = time.perf_counter()
+        if not self.enabled:
+            result = work()
+            db.session.commit()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.metrics.record_batch(1, elapsed_ms)
+            self.metrics.record_wait(elapsed_ms)
+            return result
+
+        self._ensure_writer()
+        pending = _PendingWrite(work)
+        self._queue.put(pending)
+        try:
+            return pending.future.result()
+        finally:
+            self.metrics.record_wait((time.perf_counter() - started) * 1000)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'interval_ms': self.interval * 1000,
+            'max_batch': self.max_batch,
+            'queued': self._queue.qsize(),
+            **self.metrics.to_dict(),
+        }
+
+    def _ensure_writer(self):
+        # Started lazily so forked server workers each get their own thread
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._writer.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            with self.app.app_context():
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            results = [pending.work() for pending in batch]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.metrics.record_failure()
+            for pending in batch:
+                self._commit_one(pending)
+            return
+
+        self.metrics.record_batch(len(batch), (time.perf_counter() - started) * 1000)
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
+
+    def _commit_one(self, pending):
+        started = time.perf_counter()
+        try:
+            result = pending.work()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            pending.future.set_exception(e)
+            return
+        self.metrics.record_batch(1, (time.perf_counter() - started) * 1000)
+        pending.future.set_result(result)
@@ -0,0 +1,62 @@
+"""Gunicorn settings, overridable through the environment.
+
+Run with:  gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+# create_app() loads .env as well, but the defaults below have to see its settings
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+bind = f"{os.environ.get('HOST', '127.0.0.1')}:{os.environ.get('PORT', 5000)}"
+
+# With SQLite in WAL mode, readers scale with workers while writes serialize
+# on the database lock, so a handful of processes with a few threads each is
+# the sweet spot; Postgres deployments can raise both.
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# The memory response cache keeps its table versions per process, and the
+# memory change feed only reaches the streams of the worker that served the
+# write. The app refuses both setups, so several workers default to no
+# caching and no change feed (use redis to share them). Set the count with
+# GUNICORN_WORKERS, not --workers.
+os.environ['SERVER_WORKERS'] = str(workers)
+if workers > 1:
+    os.environ.setdefault('RESPONSE_CACHE_BACKEND', 'none')
+    os.environ.setdefault('EVENTS_BACKEND', 'none')
+
+# Each open GET /api/events stream holds one of the threads; keep half of
+# them for ordinary requests. Further streams get 503 and the frontend
+# retries them later, so with many open tabs serve asgi.py with uvicorn,
+# which streams on the event loop without this limit
+os.environ.setdefault('EVENTS_MAX_SUBSCRIBERS', str(max(1, threads // 2)))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+# Import the app and initialize the database once in the master; workers are
+# forked from it ready to serve instead of each importing and checking again
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from models import db
+    from wsgi import app
+
+    # Connections opened by the master must not be shared with the workers
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,342 @@
+"""Bulk import of expenses, loans and income from CSV or NDJSON.
+
+Input is parsed lazily and handled in chunks: each chunk resolves category and
+person names through in-memory maps, inserts its rows with one executemany
+and commits once. Invalid rows are reported and skipped without aborting the
+rest of the import. Input that can't be read any further (bad encoding,
+malformed CSV) stops the import with ImportAborted; the chunks committed
+before it stay, with their loan balances repaired.
+"""
+import csv
+import json
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from itertools import islice
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+import reference_cache
+import rollups
+from loan_balances import repair_loan_balances
+from tag_index import format_tags, index_expense_tags
+from models import db, Money, Category, Person, Expense, Loan, MonthlyIncome
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def _parse_date(value, default=None):
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _required(row, field):
+    value = row.get(field)
+    if value in (None, ''):
+        raise ValueError(f"'{field}' is required")
+    return value
+
+
+def _parse_amount(value):
+    # Rounded to the cent as Money stores it, so rollups add up what the rows hold
+    return Money.to_cents(float(value)) / 100
+
+
+def _cents_by(rows, key):
+    """{key(row): (summed amount cents, row count)}"""
+    grouped = defaultdict(lambda: [0, 0])
+    for row in rows:
+        totals = grouped[key(row)]
+        totals[0] += Money.to_cents(row['amount'])
+        totals[1] += 1
+    return grouped
+
+
+class ImportAborted(Exception):
+    """The input could not be read any further; report covers what was committed"""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def _parse_month(value):
+    # Validates the YYYY-MM format used by month_year columns
+    datetime.strptime(value, '%Y-%m')
+    return value
+
+
+class _Importer:
+    """Per-entity parsing and insert logic; subclasses define the row shape"""
+    model = None
+    tables = ()  # Logical tables written, for response cache invalidation
+
+    def __init__(self):
+        self.reload()
+
+    def reload(self):
+        """(Re)load the name -> id maps, e.g. after a rollback discarded new rows"""
+
+    def parse(self, row):
+        raise NotImplementedError
+
+    def resolve(self, parsed_rows):
+        """Replace names with foreign keys, creating missing reference rows"""
+        return parsed_rows
+
+    def insert(self, rows):
+        db.session.execute(insert(self.model), rows)
+
+    def record_rollups(self, rows):
+        pass
+
+    def finish(self):
+        """Called once after the last chunk, or after the import stopped"""
+
+
+class ExpenseImporter(_Importer):
+    model = Expense
+    tables = ('expenses', 'categories')
+
+    def reload(self):
+        self.categories = dict(db.session.query(Category.name, Category.id))
+
+    def parse(self, row):
+        return {
+            'amount': _parse_amount(_required(row, 'amount')),
+            'description': _required(row, 'description'),
+            'category': row.get('category') or 'Others',
+            'date': _parse_date(row.get('date'), date.today()),
+            'location': row.get('location') or '',
+            'notes': row.get('notes') or '',
+            'tags': format_tags(row.get('tags')),
+        }
+
+    def resolve(self, parsed_rows):
+        missing = {row['category'] for row in parsed_rows} - self.categories.keys()
+        if missing:
+            category_count = len(self.categories)
+            new_categories = []
+            for offset, name in enumerate(sorted(missing)):
+                color, icon = Category.default_style(category_count + offset)
+                new_categories.append(Category(name=name, color=color, icon=icon))
+            db.session.add_all(new_categories)
+            db.session.flush()
+            self.categories.update((category.name, category.id) for category in new_categories)
+            reference_cache.categories.invalidate()
+
+        for row in parsed_rows:
+            row['category_id'] = self.categories[row.pop('category')]
+        return parsed_rows
+
+    def insert(self, rows):
+        result = db.session.execute(
+            insert(Expense).returning(Expense.id, sort_by_parameter_order=True), rows
+        )
+        index_expense_tags(zip(result.scalars(), (row['tags'] for row in rows)), replace=False)
+
+    def record_rollups(self, rows):
+        grouped = _cents_by(rows, lambda row: (row['date'].strftime('%Y-%m'), row['category_id']))
+        for (month, category_id), (cents, count) in grouped.items():
+            rollups.record_expense(month, category_id, cents / 100, count)
+
+
+class LoanImporter(_Importer):
+    model = Loan
+    tables = ('loans', 'persons')
+
+    def __init__(self):
+        super().__init__()
+        self.earliest_date = None
+
+    def reload(self):
+        self.persons = dict(db.session.query(Person.name, Person.id))
+
+    def parse(self, row):
+        return {
+            'person_name': _required(row, 'person_name'),
+            'contact': row.get('contact') or '',
+            'email': row.get('email') or '',
+            'loan_type': _required(row, 'loan_type'),
+            'amount': _parse_amount(_required(row, 'amount')),
+            'description': row.get('description') or '',
+            'date': _parse_date(row.get('date'), date.today()),
+            'due_date': _parse_date(row.get('due_date')),
+            'interest_rate': float(row.get('interest_rate') or 0),
+            'notes': row.get('notes') or '',
+        }
+
+    def resolve(self, parsed_rows):
+        new_persons = {}
+        for row in parsed_rows:
+            name = row['person_name']
+            if name not in self.persons and name not in new_persons:
+                new_persons[name] = Person(name=name, contact=row['contact'], email=row['email'])
+        if new_persons:
+            db.session.add_all(new_persons.values())
+            db.session.flush()
+            self.persons.update((person.name, person.id) for person in new_persons.values())
+            reference_cache.persons.invalidate()
+
+        for row in parsed_rows:
+            row['person_id'] = self.persons[row.pop('person_name')]
+            del row['contact'], row['email']
+        return parsed_rows
+
+    def record_rollups(self, rows):
+        grouped = _cents_by(rows, lambda row: (row['date'].strftime('%Y-%m'), row['loan_type']))
+        for (month, loan_type), (cents, _) in grouped.items():
+            rollups.record_loan(month, loan_type, cents / 100)
+
+        chunk_earliest = min(row['date'] for row in rows)
+        if self.earliest_date is None or chunk_earliest < self.earliest_date:
+            self.earliest_date = chunk_earliest
+
+    def finish(self):
+        # Running balances are repaired in one pass from the earliest imported
+        # date instead of shifting later rows once per chunk
+        if self.earliest_date is not None:
+            repair_loan_balances(self.earliest_date)
+            db.session.commit()
+
+
+class IncomeImporter(_Importer):
+    model = MonthlyIncome
+    tables = ('monthly_income',)
+
+    def parse(self, row):
+        return {
+            'amount': _parse_amount(_required(row, 'amount')),
+            'month_year': _parse_month(_required(row, 'month_year')),
+            'source': row.get('source') or '',
+        }
+
+    def record_rollups(self, rows):
+        grouped = _cents_by(rows, lambda row: row['month_year'])
+        for month, (cents, _) in grouped.items():
+            rollups.record_income(month, cents / 100)
+
+
+IMPORTERS = {
+    'expenses': ExpenseImporter,
+    'loans': LoanImporter,
+    'income': IncomeImporter,
+}
+
+
+def read_rows(lines, file_format):
+    """Lazily yield dict rows from an iterable of text lines"""
+    if file_format == 'csv':
+        yield from csv.DictReader(lines)
+    elif file_format == 'ndjson':
+        for line in lines:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    # Surfaces as a per-row error instead of aborting the import
+                    yield e
+    else:
+        raise ValueError(f"Unsupported format '{file_format}'. Use csv or ndjson")
+
+
+class ImportReport:
+    def __init__(self, entity):
+        self.entity = entity
+        self.rows_total = 0
+        self.imported = 0
+        self.errors = []
+        self.error_count = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'entity': self.entity,
+            'rows_total': self.rows_total,
+            'imported': self.imported,
+            'failed': self.error_count,
+            'errors': self.errors,
+            'chunks': self.chunks,
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_second': round(self.rows_total / elapsed, 1) if elapsed > 0 else None,
+        }
+
+
+def _insert_chunk(importer, numbered_rows, report):
+    """Insert one chunk in a single transaction, isolating bad rows on failure"""
+    # resolve() rewrites rows in place, so work on copies in case of a retry
+    rows = [dict(row) for _, row in numbered_rows]
+    try:
+        importer.resolve(rows)
+        importer.insert(rows)
+        importer.record_rollups(rows)
+        db.session.commit()
+        report.imported += len(rows)
+        return
+    except SQLAlchemyError:
+        db.session.rollback()
+        importer.reload()
+
+    # Something in the chunk violated a constraint; retry row by row so only
+    # the offending rows are rejected
+    for row_number, row in numbered_rows:
+        row = dict(row)
+        try:
+            importer.resolve([row])
+            importer.insert([row])
+            importer.record_rollups([row])
+            db.session.commit()
+            report.imported += 1
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            importer.reload()
+            report.add_error(row_number, str(getattr(e, 'orig', e)))
+
+
+def import_rows(entity, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import an iterable of dict rows for the given entity and return a report dict.
+
+    Raises ImportAborted if rows stops being readable (a UnicodeDecodeError or
+    csv.Error while reading); the chunks before it are committed.
+    """
+    importer = IMPORTERS[entity]()
+    report = ImportReport(entity)
+    numbered = enumerate(rows, start=1)
+
+    try:
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+            report.chunks += 1
+            report.rows_total += len(chunk)
+
+            parsed = []
+            for row_number, row in chunk:
+                try:
+                    if isinstance(row, Exception):
+                        raise ValueError(f'Malformed row: {row}')
+                    parsed.append((row_number, importer.parse(row)))
+                except (ValueError, TypeError, AttributeError) as e:
+                    report.add_error(row_number, str(e))
+
+            if parsed:
+                _insert_chunk(importer, parsed, report)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportAborted(f'rows from {report.rows_total + 1} on were not imported: {e}', report.to_dict()) from e
+    finally:
+        # Committed chunks need their balances even when a later one failed
+        db.session.rollback()
+        importer.finish()
+    return report.to_dict()
@@ -0,0 +1,134 @@
+"""Stored running balances for the loan timeline.
+
+Every loan keeps cumulative_net, the net amount lent out after it when all
+loans are ordered by (date, id). Appending a loan costs one lookup of its
+predecessor. Back-dated loans also shift the balance of every later row,
+which is a single set-based UPDATE rather than a replay of the history.
+Archived loans keep their balances, so a loan back-dated into an archived
+year also shifts the rows of the partitions after it.
+
+Balance updates are serialized: two concurrent inserts must not both read
+the same predecessor. SQLite already holds its database write lock once the
+loan is inserted; on Postgres, whose READ COMMITTED transactions don't see
+each other's new rows, a transaction-scoped advisory lock is taken first.
+"""
+from sqlalchemy import and_, bindparam, func, or_, select, union_all, update
+
+from models import db, Loan
+import archive
+
+REPAIR_BATCH_SIZE = 5000
+# Key of the Postgres advisory lock guarding the stored balances
+BALANCE_LOCK_KEY = 0x6C6F616E  # 'loan'
+
+
+def signed_amount(loan_type, amount):
+    """Effect of a loan on the net balance: money given out counts positive"""
+    if loan_type == 'given':
+        return amount
+    if loan_type in ('taken', 'received_back'):
+        return -amount
+    return 0
+
+
+def _after(loans, loan_date, loan_id):
+    return or_(loans.date > loan_date, and_(loans.date == loan_date, loans.id > loan_id))
+
+
+def _before(loans, loan_date, loan_id):
+    return or_(loans.date < loan_date, and_(loans.date == loan_date, loans.id < loan_id))
+
+
+def _latest_balance(loans, condition):
+    return select(loans.date, loans.id, loans.cumulative_net).where(condition).order_by(
+        loans.date.desc(), loans.id.desc()
+    ).limit(1)
+
+
+def _previous_balance(parts, loan_date, loan_id):
+    """Scalar subquery for the balance of the row before (loan_date, loan_id) in any of parts"""
+    if len(parts) == 1:
+        return select(parts[0].cumulative_net).where(_before(parts[0], loan_date, loan_id)).order_by(
+            parts[0].date.desc(), parts[0].id.desc()
+        ).limit(1).scalar_subquery()
+    # Each source contributes its own latest row before the loan
+    candidates = union_all(*[
+        select(_latest_balance(loans, _before(loans, loan_date, loan_id)).subquery()) for loans in parts
+    ]).subquery()
+    return select(candidates.c.cumulative_net).order_by(
+        candidates.c.date.desc(), candidates.c.id.desc()
+    ).limit(1).scalar_subquery()
+
+
+def lock_balances():
+    """Hold the balance lock until the current transaction ends"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(select(func.pg_advisory_xact_lock(BALANCE_LOCK_KEY)))
+
+
+def record_loan_balance(loan):
+    """Set the balance of a newly flushed loan and shift the rows after it"""
+    # Taken before anything is read, so the predecessor and the later rows
+    # include every loan committed by a writer that held the lock before us
+    lock_balances()
+    signed = signed_amount(loan.loan_type, loan.amount)
+    # The registry is read fresh: a stale list would miss rows archived moments ago.
+    # Partitions older than the loan are left unchanged by the date condition
+    parts = archive.sources('loans', fresh=True)
+
+    if signed:
+        for loans in parts:
+            db.session.execute(
+                update(loans).where(_after(loans, loan.date, loan.id))
+                .values({loans.cumulative_net: loans.cumulative_net + signed})
+                .execution_options(synchronize_session=False)
+            )
+
+    previous = _previous_balance(parts, loan.date, loan.id)
+    db.session.execute(
+        update(Loan).where(Loan.id == loan.id)
+        .values(cumulative_net=func.coalesce(previous, 0) + signed)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def repair_loan_balances(from_date=None):
+    """Recompute balances for every loan dated on or after from_date.
+
+    Used after bulk inserts and by the rebuild command (from_date=None
+    recomputes everything). Returns the number of rows rewritten.
+    """
+    lock_balances()
+    running = 0
+    if from_date is not None:
+        history = archive.history('loans', end_date=from_date)
+        running = db.session.execute(
+            select(history.cumulative_net).where(history.date < from_date)
+            .order_by(history.date.desc(), history.id.desc()).limit(1)
+        ).scalar() or 0
+
+    # Rows are read from every partition holding dates from from_date on, then
+    # replayed in (date, id) order and written back to the table they came from
+    parts = archive.sources('loans', start_date=from_date, fresh=True)
+    rows = []
+    for index, loans in enumerate(parts):
+        query = select(loans.date, loans.id, loans.loan_type, loans.amount)
+        if from_date is not None:
+            query = query.where(loans.date >= from_date)
+        rows.extend((*row, index) for row in db.session.execute(query))
+
+    updates = [[] for _ in parts]
+    for loan_date, loan_id, loan_type, amount, index in sorted(rows, key=lambda row: (row[0], row[1])):
+        running += signed_amount(loan_type, amount)
+        updates[index].append({'loan_id': loan_id, 'balance': running})
+
+    # Executed on the connection: a session-level executemany of an ORM
+    # UPDATE would be a bulk update by primary key of the live table
+    connection = db.session.connection()
+    for loans, batch in zip(parts, updates):
+        stmt = update(loans).where(loans.id == bindparam('loan_id')).values(
+            {loans.cumulative_net: bindparam('balance')}
+        )
+        for start in range(0, len(batch), REPAIR_BATCH_SIZE):
+            connection.execute(stmt, batch[start:start + REPAIR_BATCH_SIZE])
+    return len(rows)
@@ -0,0 +1,237 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, date
+
+from sqlalchemy import BigInteger
+from sqlalchemy.sql import operators
+from sqlalchemy.types import TypeDecorator
+
+db = SQLAlchemy()
+
+# Operators that scale an amount by a plain number rather than add money to it
+SCALING_OPERATORS = {operators.mul, operators.truediv, operators.floordiv}
+
+class Money(TypeDecorator):
+    """An amount stored as integer cents and handled as a float everywhere else.
+
+    Values are rounded to the cent on the way in and divided by 100 on the way
+    out, so SUM() in SQL is exact integer arithmetic and the API still sees
+    the same floats. Money columns are named <name>_cents in the database and
+    keep their plain name as the attribute and column key.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    class comparator_factory(TypeDecorator.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            # Sums and differences of amounts, or an amount times a number, are still money
+            if op in (operators.add, operators.sub) or (
+                    op in SCALING_OPERATORS and not isinstance(other_comparator.type, Money)):
+                return op, self.type
+            return super()._adapt_expression(op, other_comparator)
+
+    def coerce_compared_value(self, op, value):
+        # amount >= 10.5 and amount + 10.5 compare against cents; amount * 2 doesn't
+        if op in SCALING_OPERATORS:
+            return self.impl_instance.coerce_compared_value(op, value)
+        return self
+
+    @staticmethod
+    def to_cents(value):
+        return round(value * 100)
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else float(value) / 100
+
+def money_column(name, **kwargs):
+    """A Money column stored as <name>_cents"""
+    return db.Column(f'{name}_cents', Money, key=name, **kwargs)
+
+# Enhanced Database Models
+class Person(db.Model):
+    __tablename__ = 'persons'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    contact = db.Column(db.String(50))
+    email = db.Column(db.String(120))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    loans = db.relationship('Loan', backref='person', lazy=True)
+
+# Colors and icons handed out in turn to categories created on the fly
+CATEGORY_COLORS = ['#e74c3c', '#3498db', '#9b59b6', '#f39c12', '#e67e22', '#27ae60', '#95a5a6', '#34495e', '#1abc9c', '#8e44ad']
+CATEGORY_ICONS = ['fas fa-utensils', 'fas fa-car', 'fas fa-gamepad', 'fas fa-shopping-bag',
+                  'fas fa-home', 'fas fa-dumbbell', 'fas fa-bus', 'fas fa-graduation-cap',
+                  'fas fa-plane', 'fas fa-users', 'fas fa-circle']
+
+class Category(db.Model):
+    __tablename__ = 'categories'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    description = db.Column(db.String(200))
+    color = db.Column(db.String(7), default='#95a5a6')
+    icon = db.Column(db.String(50), default='fas fa-circle')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    expenses = db.relationship('Expense', backref='category', lazy=True)
+    
+    @staticmethod
+    def default_style(category_count):
+        """Return the (color, icon) for the next category given how many exist"""
+        return (CATEGORY_COLORS[category_count % len(CATEGORY_COLORS)],
+                CATEGORY_ICONS[category_count % len(CATEGORY_ICONS)])
+
+class PaymentMethod(db.Model):
+    __tablename__ = 'payment_methods'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    details = db.Column(db.String(200))
+    is_active = db.Column(db.Boolean, default=True)
+
+class Expense(db.Model):
+    __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_date', 'date'),
+        db.Index('ix_expenses_category_id_date', 'category_id', 'date'),
+        # Covers the date-range SUM(amount) of the dashboard and analytics routes
+        db.Index('ix_expenses_date_amount_cents', 'date', 'amount'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    payment_method_id = db.Column(db.Integer, db.ForeignKey('payment_methods.id'))
+    amount = money_column('amount', nullable=False)
+    description = db.Column(db.String(200), nullable=False)
+    date = db.Column(db.Date, default=date.today)
+    location = db.Column(db.String(200))
+    notes = db.Column(db.Text)
+    tags = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Tag(db.Model):
+    """A normalized tag; Expense.tags keeps the comma-separated form for the API"""
+    __tablename__ = 'tags'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+class ExpenseTag(db.Model):
+    __tablename__ = 'expense_tags'
+    __table_args__ = (
+        db.Index('ix_expense_tags_tag_id_expense_id', 'tag_id', 'expense_id'),
+    )
+    # No foreign key: archive.py moves expenses to partition tables and leaves
+    # their links here; verify_archive() checks every link still has an expense
+    expense_id = db.Column(db.Integer, primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+
+class Loan(db.Model):
+    __tablename__ = 'loans'
+    __table_args__ = (
+        db.Index('ix_loans_loan_type_date', 'loan_type', 'date'),
+        db.Index('ix_loans_person_id_date', 'person_id', 'date'),
+        db.Index('ix_loans_date', 'date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    person_id = db.Column(db.Integer, db.ForeignKey('persons.id'), nullable=False)
+    loan_type = db.Column(db.String(20), nullable=False)  # 'given', 'taken', 'received_back'
+    amount = money_column('amount', nullable=False)
+    description = db.Column(db.String(200))
+    date = db.Column(db.Date, default=date.today)
+    due_date = db.Column(db.Date)
+    interest_rate = db.Column(db.Float, default=0.0)
+    status = db.Column(db.String(20), default='active')  # 'active', 'paid', 'partial'
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Running net balance over all loans ordered by (date, id); see loan_balances.py
+    cumulative_net = money_column('cumulative_net')
+
+class Committee(db.Model):
+    __tablename__ = 'committees'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    monthly_amount = money_column('monthly_amount', nullable=False)
+    expected_receiving_amount = money_column('expected_receiving_amount', nullable=False)
+    expected_receiving_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), default='active')  # 'active', 'completed', 'paused'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    payments = db.relationship('CommitteePayment', backref='committee', lazy=True,
+                               order_by='CommitteePayment.id')
+
+class CommitteePayment(db.Model):
+    __tablename__ = 'committee_payments'
+    __table_args__ = (
+        db.Index('ix_committee_payments_committee_id', 'committee_id'),
+        # Covers the per-(committee, month) sums of committee_schedule.py
+        db.Index('ix_committee_payments_committee_id_month_year_amount', 'committee_id', 'month_year', 'amount'),
+        db.Index('ix_committee_payments_month_year', 'month_year'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    committee_id = db.Column(db.Integer, db.ForeignKey('committees.id'), nullable=False)
+    amount = money_column('amount', nullable=False)
+    payment_date = db.Column(db.Date, default=date.today)
+    month_year = db.Column(db.String(7), nullable=False)  # Format: "2024-01"
+    status = db.Column(db.String(20), default='paid')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MonthlyIncome(db.Model):
+    __tablename__ = 'monthly_income'
+    __table_args__ = (
+        db.Index('ix_monthly_income_month_year', 'month_year'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    amount = money_column('amount', nullable=False)
+    month_year = db.Column(db.String(7), nullable=False)  # Format: "2024-01"
+    source = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Materialized aggregates, maintained by rollups.py on every write
+class MonthlyRollup(db.Model):
+    __tablename__ = 'monthly_rollups'
+    month = db.Column(db.String(7), primary_key=True)  # Format: "2024-01"
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    total = money_column('total', nullable=False, default=0.0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+class MonthlyTotal(db.Model):
+    __tablename__ = 'monthly_totals'
+    month = db.Column(db.String(7), primary_key=True)  # Format: "2024-01"
+    # NULL means nothing of that kind was recorded for the month
+    income = money_column('income')
+    committee_payments = money_column('committee_payments')
+    loan_given = money_column('loan_given')
+    loan_taken = money_column('loan_taken')
+    loan_received_back = money_column('loan_received_back')
+
+# Registry of the per-year archive tables, maintained by archive.py
+class ArchivePartition(db.Model):
+    __tablename__ = 'archive_partitions'
+    table_name = db.Column(db.String(64), primary_key=True)  # e.g. "expenses_archive_2022"
+    entity = db.Column(db.String(20), nullable=False)  # 'expenses', 'loans'
+    year = db.Column(db.Integer, nullable=False)
+    first_date = db.Column(db.Date)
+    last_date = db.Column(db.Date)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ArchiveTotal(db.Model):
+    """Precomputed total of an archive partition per kind ('expenses' or a loan type)"""
+    __tablename__ = 'archive_totals'
+    table_name = db.Column(db.String(64), db.ForeignKey('archive_partitions.table_name'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    total = money_column('total', nullable=False, default=0.0)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+
+class SchemaStamp(db.Model):
+    """Schema/default data version the database was initialized for; see bootstrap.py"""
+    __tablename__ = 'schema_stamp'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(64), nullable=False)
+    stamped_at = db.Column(db.DateTime, default=datetime.utcnow)
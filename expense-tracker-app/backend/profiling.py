@@ -0,0 +1,235 @@
+"""Per-request timing, SQL instrumentation and Prometheus metrics.
+
+RequestProfiler hooks into Flask's request cycle and the engine's cursor
+events. For every request it records wall time, the number of SQL statements
+and the time spent in them, aggregated per endpoint; write_metrics() turns
+that into Prometheus text format for /api/metrics. Each response also gets a
+Server-Timing header with the same figures.
+
+Statements slower than SLOW_QUERY_MS are logged with their query plan
+(EXPLAIN QUERY PLAN on SQLite, EXPLAIN elsewhere). With PROFILE_PARAM_ENABLED
+set, adding ?profile=1 to a request replaces its response with a cProfile
+summary of that request.
+
+Timings of streamed responses (NDJSON, exports) cover producing the response
+object, not sending its body. Requests served outside Flask's request cycle
+(asgi.py) are recorded through track() under the same endpoint names.
+"""
+import contextvars
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_QUERY_MS = 100
+PROFILE_STATS_LIMIT = 40
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+# Request duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Figures of the request track() is timing in this context (Flask requests use g)
+_tracked = contextvars.ContextVar('tracked_request', default=None)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = defaultdict(int)  # (method, status) -> count
+        self.duration_sum = 0.0
+        self.bucket_counts = [0] * len(DURATION_BUCKETS)
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+
+    @property
+    def count(self):
+        return sum(self.requests.values())
+
+    def record(self, method, status, duration, sql_statements, sql_seconds):
+        self.requests[(method, status)] += 1
+        self.duration_sum += duration
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                self.bucket_counts[index] += 1
+        self.sql_statements += sql_statements
+        self.sql_seconds += sql_seconds
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+class MetricsWriter:
+    """Accumulates metric families in Prometheus text exposition format"""
+
+    def __init__(self, prefix='expense_tracker_'):
+        self.prefix = prefix
+        self.lines = []
+
+    def family(self, name, metric_type, help_text, samples):
+        """samples: iterable of (suffix, labels dict, value)"""
+        name = self.prefix + name
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {metric_type}')
+        for suffix, labels, value in samples:
+            self.lines.append(f'{name}{suffix}{_labels(**labels) if labels else ""} {value}')
+
+    def render(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def server_timing(duration, sql_statements, sql_seconds):
+    return f'app;dur={duration * 1000:.1f}, db;dur={sql_seconds * 1000:.1f};desc="{sql_statements} queries"'
+
+
+class RequestProfiler:
+    def __init__(self, app=None, engine=None):
+        self.slow_query_ms = DEFAULT_SLOW_QUERY_MS
+        self.profile_param_enabled = False
+        self.slow_queries = 0
+        self._endpoints = defaultdict(EndpointStats)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine):
+        self.slow_query_ms = float(app.config.get('SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS))
+        self.profile_param_enabled = bool(app.config.get('PROFILE_PARAM_ENABLED', False))
+        self._dialect = engine.dialect.name
+        self.instrument(engine)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # SQL instrumentation
+
+    def instrument(self, engine):
+        """Time the statements of an engine, e.g. the sync side of asgi.py's async engine"""
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        tracked = _tracked.get()
+        if tracked is not None:
+            tracked['sql_statements'] += 1
+            tracked['sql_seconds'] += elapsed
+        elif has_request_context() and 'sql_statements' in g:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+        if elapsed * 1000 >= self.slow_query_ms:
+            with self._lock:
+                self.slow_queries += 1
+            logger.warning('Slow query (%.1f ms): %s\nParameters: %s\nPlan:\n%s',
+                           elapsed * 1000, statement,
+                           f'{len(parameters)} rows' if executemany else repr(parameters),
+                           self._query_plan(cursor, statement, parameters, executemany))
+
+    def _query_plan(self, cursor, statement, parameters, executemany):
+        if executemany:
+            return '(not available for executemany)'
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return '(not applicable)'
+        prefix = 'EXPLAIN QUERY PLAN ' if self._dialect == 'sqlite' else 'EXPLAIN '
+        try:
+            # A separate DBAPI cursor keeps the plan query out of the engine events
+            plan_cursor = cursor.connection.cursor()
+            try:
+                plan_cursor.execute(prefix + statement, parameters)
+                return '\n'.join(' '.join(str(value) for value in row) for row in plan_cursor.fetchall())
+            finally:
+                plan_cursor.close()
+        except Exception as e:
+            return f'(unavailable: {e})'
+
+    # Request cycle
+
+    def _start_request(self):
+        g.request_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+        if self.profile_param_enabled and request.args.get('profile') == '1':
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _finish_request(self, response):
+        if 'request_started' not in g:
+            return response
+        duration = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unmatched'
+        self.record(endpoint, request.method, response.status_code, duration, g.sql_statements, g.sql_seconds)
+        response.headers['Server-Timing'] = server_timing(duration, g.sql_statements, g.sql_seconds)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            return self._profile_response(profiler, endpoint, response, duration)
+        return response
+
+    def record(self, endpoint, method, status, duration, sql_statements, sql_seconds):
+        with self._lock:
+            self._endpoints[endpoint].record(method, status, duration, sql_statements, sql_seconds)
+
+    @contextmanager
+    def track(self, endpoint, method):
+        """Time a request served outside Flask's request cycle.
+
+        Yields a dict whose 'status' the caller sets; statements run in the
+        same context on an instrument()ed engine are counted in it.
+        """
+        tracked = {'status': 500, 'started': time.perf_counter(), 'sql_statements': 0, 'sql_seconds': 0.0}
+        token = _tracked.set(tracked)
+        try:
+            yield tracked
+        finally:
+            _tracked.reset(token)
+            duration = time.perf_counter() - tracked['started']
+            self.record(endpoint, method, tracked['status'], duration,
+                        tracked['sql_statements'], tracked['sql_seconds'])
+
+    def _profile_response(self, profiler, endpoint, response, duration):
+        output = io.StringIO()
+        output.write(f'{request.method} {request.full_path} -> {endpoint} ({response.status_code})\n')
+        output.write(f'wall time {duration * 1000:.1f} ms, {g.sql_statements} SQL statements '
+                     f'in {g.sql_seconds * 1000:.1f} ms\n\n')
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_STATS_LIMIT)
+        profile_response = Response(output.getvalue(), mimetype='text/plain')
+        profile_response.headers['Server-Timing'] = response.headers['Server-Timing']
+        return profile_response
+
+    # Reporting
+
+    def write_metrics(self, writer):
+        with self._lock:
+            requests, durations, sql_counts, sql_times = [], [], [], []
+            for name, stats in sorted(self._endpoints.items()):
+                for (method, status), count in sorted(stats.requests.items()):
+                    requests.append(('', {'endpoint': name, 'method': method, 'status': status}, count))
+                for bound, count in zip(DURATION_BUCKETS, stats.bucket_counts):
+                    durations.append(('_bucket', {'endpoint': name, 'le': bound}, count))
+                durations.append(('_bucket', {'endpoint': name, 'le': '+Inf'}, stats.count))
+                durations.append(('_sum', {'endpoint': name}, round(stats.duration_sum, 6)))
+                durations.append(('_count', {'endpoint': name}, stats.count))
+                sql_counts.append(('', {'endpoint': name}, stats.sql_statements))
+                sql_times.append(('', {'endpoint': name}, round(stats.sql_seconds, 6)))
+            slow_queries = self.slow_queries
+
+        writer.family('http_requests_total', 'counter', 'Requests handled, by endpoint, method and status', requests)
+        writer.family('http_request_duration_seconds', 'histogram', 'Request wall time', durations)
+        writer.family('sql_statements_total', 'counter', 'SQL statements executed while handling requests', sql_counts)
+        writer.family('sql_duration_seconds_total', 'counter', 'Time spent in SQL while handling requests', sql_times)
+        writer.family('slow_queries_total', 'counter',
+                      f'Statements slower than {self.slow_query_ms:g} ms', [('', None, slow_queries)])
@@ -0,0 +1,45 @@
+"""Count the SQL statements an engine executes.
+
+Used to guard endpoints against N+1 query regressions, e.g.:
+
+    with app.app_context(), assert_max_queries(db.engine, 2):
+        client.get('/api/committees')
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Context manager that records every statement sent to the engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """Fail with the executed statements if the block runs more than limit queries"""
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n\n'.join(counter.statements)
+        raise AssertionError(
+            f'Expected at most {limit} queries, {counter.count} were executed:\n\n{statements}'
+        )
@@ -0,0 +1,173 @@
+"""In-process caches for the small reference tables.
+
+Categories and payment methods are cached as whole snapshots with a TTL, so
+other worker processes' writes still show up within REFERENCE_TTL seconds.
+Persons can grow without bound, so only a bounded LRU of name -> id is kept.
+Writes call invalidate() explicitly, and any session rollback clears every
+cache in case it had picked up ids from the discarded transaction.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Category, PaymentMethod, Person
+
+REFERENCE_TTL = 60
+PERSON_CACHE_SIZE = 1024
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def to_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+
+class Snapshot:
+    """Immutable copy of a reference table plus its validators"""
+
+    def __init__(self, rows, last_modified):
+        self.rows = rows
+        self.by_name = {row['name']: row for row in rows}
+        payload = json.dumps(rows, sort_keys=True, default=str).encode()
+        self.etag = hashlib.sha1(payload).hexdigest()
+        self.last_modified = last_modified
+
+
+class TableCache:
+    """TTL-bounded snapshot of a whole reference table"""
+
+    def __init__(self, loader, ttl=REFERENCE_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._snapshot = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+                self.stats.hits += 1
+                return self._snapshot
+            self.stats.misses += 1
+            previous = self._snapshot
+
+        rows = self.loader()
+        snapshot = Snapshot(rows, datetime.now(timezone.utc).replace(microsecond=0))
+        if previous is not None and previous.etag == snapshot.etag:
+            # Reloaded but unchanged: keep the old Last-Modified so clients revalidate
+            snapshot.last_modified = previous.last_modified
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+        return snapshot
+
+    @property
+    def expired(self):
+        """Whether the next get() reloads the table"""
+        with self._lock:
+            return self._snapshot is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0
+            self.stats.invalidations += 1
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used key"""
+
+    def __init__(self, maxsize=PERSON_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.stats.hits += 1
+                return self._data[key]
+            self.stats.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._data.clear()
+            self.stats.invalidations += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _load_categories():
+    return [{
+        'id': cat.id,
+        'name': cat.name,
+        'color': cat.color,
+        'icon': cat.icon,
+        'description': cat.description
+    } for cat in Category.query.order_by(Category.id).all()]
+
+
+def _load_payment_methods():
+    return [{
+        'id': method.id,
+        'name': method.name,
+        'type': method.type,
+        'details': method.details
+    } for method in PaymentMethod.query.filter_by(is_active=True).order_by(PaymentMethod.id).all()]
+
+
+categories = TableCache(_load_categories)
+payment_methods = TableCache(_load_payment_methods)
+persons = LRUCache()
+
+
+def invalidate_all():
+    categories.invalidate()
+    payment_methods.invalidate()
+    persons.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _invalidate_on_rollback(session):
+    invalidate_all()
+
+
+def get_person_id(name):
+    """Return the id of the person with this name, or None if there is none"""
+    person_id = persons.get(name)
+    if person_id is None:
+        person = Person.query.filter_by(name=name).with_entities(Person.id).first()
+        if person is not None:
+            person_id = person.id
+            persons.put(name, person_id)
+    return person_id
+
+
+def stats():
+    return {
+        'categories': categories.stats.to_dict(),
+        'payment_methods': payment_methods.stats.to_dict(),
+        'persons': dict(persons.stats.to_dict(), size=len(persons), maxsize=persons.maxsize),
+    }
@@ -0,0 +1,209 @@
+"""Response cache for read-heavy analytics endpoints.
+
+Cached responses are keyed by endpoint, URL arguments, today's date (several
+endpoints are relative to it) and the current version of every table the
+endpoint reads. Write routes call bump() after committing, which moves the
+affected tables to a new version so stale entries are never looked up again
+and simply age out.
+
+Backends:
+  memory - per-process LRU with TTL (default); table versions are per process
+           too, so it refuses to start when SERVER_WORKERS > 1
+  redis  - any Redis-compatible server, shared between workers; needs the
+           optional redis package
+  none   - caching disabled
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import request, Response
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 512
+
+
+class CachedResponse:
+    def __init__(self, body, status, mimetype, headers=()):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        # Only application headers (e.g. X-Next-Cursor) are replayed
+        self.headers = list(headers)
+        self.etag = hashlib.sha1(body).hexdigest()
+
+
+class MemoryBackend:
+    """LRU + TTL store; versions are only visible to this process"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tables):
+        with self._lock:
+            return [self._versions.get(table, 0) for table in tables]
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Stores entries and table versions in Redis so all workers share them"""
+
+    def __init__(self, url, prefix='expense-tracker:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('RESPONSE_CACHE_BACKEND=redis requires the redis package') from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return CachedResponse(data['body'].encode(), data['status'], data['mimetype'], data['headers'])
+
+    def set(self, key, value, ttl):
+        raw = json.dumps({
+            'body': value.body.decode(),
+            'status': value.status,
+            'mimetype': value.mimetype,
+            'headers': value.headers,
+        })
+        self.client.set(self.prefix + key, raw, ex=ttl)
+
+    def versions(self, tables):
+        values = self.client.mget([f'{self.prefix}version:{table}' for table in tables])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tables):
+        pipeline = self.client.pipeline()
+        for table in tables:
+            pipeline.incr(f'{self.prefix}version:{table}')
+        pipeline.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.prefix}*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = DEFAULT_TTL
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+        self.ttl = int(app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL))
+        if backend == 'memory':
+            if int(app.config.get('SERVER_WORKERS', 1)) > 1:
+                raise RuntimeError('RESPONSE_CACHE_BACKEND=memory only invalidates the worker that served the '
+                                   'write; with several workers use redis or none')
+            self.backend = MemoryBackend(int(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)))
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0'))
+        elif backend == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f'Unknown RESPONSE_CACHE_BACKEND: {backend}')
+
+    def bump(self, *tables):
+        """Invalidate every cached response that depends on these tables"""
+        if self.backend is not None:
+            self.backend.bump(tables)
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def key(self, endpoint, view_args, args, tables):
+        """Cache key of a request to endpoint; args is a MultiDict of the query string"""
+        args = '&'.join(f'{name}={value}' for name, value in sorted(args.items(multi=True)))
+        view_args = '&'.join(f'{name}={value}' for name, value in sorted((view_args or {}).items()))
+        versions = ','.join(f'{table}:{version}' for table, version
+                            in zip(tables, self.backend.versions(tables)))
+        return f'{endpoint}|{view_args}|{args}|{date.today().isoformat()}|{versions}'
+
+    @staticmethod
+    def entry(body, status, mimetype, headers):
+        """What to store for a response; only X- headers are kept"""
+        return CachedResponse(body, status, mimetype,
+                              [(name, value) for name, value in headers if name.lower().startswith('x-')])
+
+    @staticmethod
+    def _respond(cached):
+        response = Response(cached.body, status=cached.status, mimetype=cached.mimetype,
+                            headers=cached.headers)
+        response.set_etag(cached.etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def cached(self, *tables):
+        """Cache successful responses of a view until one of tables is bumped"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                key = self.key(request.endpoint, request.view_args, request.args, tables)
+                cached = self.backend.get(key)
+                if cached is not None:
+                    self.hits += 1
+                    return self._respond(cached)
+
+                self.misses += 1
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+
+                cached = self.entry(response.get_data(), response.status_code, response.mimetype,
+                                    response.headers)
+                self.backend.set(key, cached, self.ttl)
+                return self._respond(cached)
+            # asgi.py looks these up to cache the same endpoints
+            wrapper.cache_tables = tables
+            return wrapper
+        return decorator
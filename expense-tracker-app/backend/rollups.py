@@ -0,0 +1,166 @@
+"""Incrementally maintained monthly rollups.
+
+Write routes call the record_* helpers before committing, so the rollup rows
+change in the same transaction as the raw rows they summarize. Analytics
+endpoints can then read one row per month (and category) instead of scanning
+every transaction. rebuild_rollups() recomputes everything from the raw
+tables for existing databases or after manual edits.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, CommitteePayment, MonthlyIncome, MonthlyRollup, MonthlyTotal
+import archive
+from committee_schedule import month_year_of
+
+LOAN_TOTAL_COLUMNS = {
+    'given': 'loan_given',
+    'taken': 'loan_taken',
+    'received_back': 'loan_received_back',
+}
+
+TOTAL_COLUMNS = ('income', 'committee_payments') + tuple(LOAN_TOTAL_COLUMNS.values())
+
+
+def _insert(model):
+    # ON CONFLICT upserts are dialect-specific; both SQLite and Postgres support them
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model)
+
+
+def record_expense(month, category_id, amount, count=1):
+    table = MonthlyRollup.__table__
+    stmt = _insert(MonthlyRollup).values(
+        month=month, category_id=category_id, total=amount, transaction_count=count
+    ).on_conflict_do_update(
+        index_elements=['month', 'category_id'],
+        set_={
+            'total': table.c.total + amount,
+            'transaction_count': table.c.transaction_count + count,
+        }
+    )
+    db.session.execute(stmt)
+
+
+def _record_total(month, column, amount):
+    table = MonthlyTotal.__table__
+    stmt = _insert(MonthlyTotal).values(month=month, **{column: amount}).on_conflict_do_update(
+        index_elements=['month'],
+        set_={column: func.coalesce(table.c[column], 0) + amount}
+    )
+    db.session.execute(stmt)
+
+
+def record_income(month, amount):
+    _record_total(month, 'income', amount)
+
+
+def record_committee_payment(month, amount):
+    _record_total(month, 'committee_payments', amount)
+
+
+def record_loan(month, loan_type, amount):
+    column = LOAN_TOTAL_COLUMNS.get(loan_type)
+    if column:
+        _record_total(month, column, amount)
+
+
+def _compute_rollups():
+    """Aggregate the raw tables, archive partitions included, into {month: ...}
+    dicts matching the rollup tables"""
+    expenses = archive.history('expenses')
+    expense_month = month_year_of(expenses.date)
+    category_rows = db.session.query(
+        expense_month, expenses.category_id, func.sum(expenses.amount), func.count(expenses.id)
+    ).filter(expenses.date.isnot(None)).group_by(expense_month, expenses.category_id).all()
+
+    rollups = {
+        (month, category_id): (total, count)
+        for month, category_id, total, count in category_rows
+    }
+
+    totals = {}
+
+    def add(month, column, total):
+        totals.setdefault(month, dict.fromkeys(TOTAL_COLUMNS))[column] = total
+
+    income_rows = db.session.query(
+        MonthlyIncome.month_year, func.sum(MonthlyIncome.amount)
+    ).group_by(MonthlyIncome.month_year)
+    for month, total in income_rows:
+        add(month, 'income', total)
+
+    committee_rows = db.session.query(
+        CommitteePayment.month_year, func.sum(CommitteePayment.amount)
+    ).group_by(CommitteePayment.month_year)
+    for month, total in committee_rows:
+        add(month, 'committee_payments', total)
+
+    loans = archive.history('loans')
+    loan_month = month_year_of(loans.date)
+    loan_rows = db.session.query(
+        loan_month, loans.loan_type, func.sum(loans.amount)
+    ).filter(
+        loans.date.isnot(None), loans.loan_type.in_(LOAN_TOTAL_COLUMNS)
+    ).group_by(loan_month, loans.loan_type)
+    for month, loan_type, total in loan_rows:
+        add(month, LOAN_TOTAL_COLUMNS[loan_type], total)
+
+    return rollups, totals
+
+
+def _totals_differ(current, expected):
+    if current is None or expected is None:
+        return current != expected
+    return abs(current - expected) > 1e-6
+
+
+def _count_drift(rollups, totals):
+    """How many stored rollup rows are missing, stale or orphaned compared to computed ones"""
+    stored_rollups = {
+        (row.month, row.category_id): (row.total, row.transaction_count)
+        for row in MonthlyRollup.query.all()
+    }
+    stored_totals = {
+        row.month: {column: getattr(row, column) for column in TOTAL_COLUMNS}
+        for row in MonthlyTotal.query.all()
+    }
+
+    drifted = 0
+    for key in rollups.keys() | stored_rollups.keys():
+        current, expected = stored_rollups.get(key), rollups.get(key)
+        if current is None or expected is None or current[1] != expected[1] \
+                or _totals_differ(current[0], expected[0]):
+            drifted += 1
+    for month in totals.keys() | stored_totals.keys():
+        current, expected = stored_totals.get(month), totals.get(month)
+        if current is None or expected is None or any(
+                _totals_differ(current[column], expected[column]) for column in TOTAL_COLUMNS):
+            drifted += 1
+    return drifted
+
+
+def verify_rollups():
+    """Count the stored rollup rows that don't match the raw tables, without changing them"""
+    return _count_drift(*_compute_rollups())
+
+
+def rebuild_rollups():
+    """Recompute all rollups from the raw tables and replace the stored ones.
+
+    Returns a dict with the number of rows written and how many stored rows
+    were missing, stale or orphaned before the rebuild.
+    """
+    rollups, totals = _compute_rollups()
+    drifted = _count_drift(rollups, totals)
+
+    MonthlyRollup.query.delete()
+    MonthlyTotal.query.delete()
+    db.session.add_all(
+        MonthlyRollup(month=month, category_id=category_id, total=total, transaction_count=count)
+        for (month, category_id), (total, count) in rollups.items()
+    )
+    db.session.add_all(MonthlyTotal(month=month, **values) for month, values in totals.items())
+    db.session.commit()
+
+    return {'rows': len(rollups) + len(totals), 'drifted': drifted}
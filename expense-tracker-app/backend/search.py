@@ -0,0 +1,206 @@
+"""Full-text search over expenses with SQLite FTS5.
+
+expenses_fts mirrors description, notes, location and tags of every expense
+and is kept in sync by triggers, so inserts from any code path (including
+bulk imports) are searchable immediately. Tags are indexed one token per tag
+("home office, pharmacy" -> "home_office pharmacy") so a tag can be matched
+as a whole in its own column. Expense.tags is stored normalized by
+tag_index.format_tags(), so the triggers only have to swap separators.
+
+Archived expenses stay searchable: archive.archive() re-indexes the rows it
+moves with index_table(), since deleting them from expenses fired the
+delete trigger. Their rows are then loaded from the archive partitions.
+"""
+from sqlalchemy import column, event, func, literal_column, or_, select, table, text
+
+from models import db, ArchivePartition, Category, Expense
+import archive
+
+FTS_TABLE = 'expenses_fts'
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+# bm25 weights for description, notes, location, tags
+RANK_WEIGHTS = (10.0, 2.0, 3.0, 5.0)
+
+
+def _indexed_tags_sql(value):
+    """SQL expression turning a stored tag string into one token per tag"""
+    return f"replace(replace(coalesce({value}, ''), ' ', '_'), ',_', ' ')"
+
+
+def normalize_tag(tag):
+    """The indexed token of one tag, normalized like tag_index.parse_tags()"""
+    return '_'.join(tag.lower().split())
+
+
+def _denormalize_tags(value):
+    return ', '.join(tag.replace('_', ' ') for tag in value.split(' ') if tag)
+
+
+SCHEMA = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        description, notes, location, tags,
+        tokenize = "unicode61 remove_diacritics 2 tokenchars '_'"
+    )""",
+    f"""CREATE TRIGGER expenses_fts_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, description, notes, location, tags)
+        VALUES (new.id, new.description, new.notes, new.location, {_indexed_tags_sql('new.tags')});
+    END""",
+    f"""CREATE TRIGGER expenses_fts_delete AFTER DELETE ON expenses BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER expenses_fts_update AFTER UPDATE OF id, description, notes, location, tags ON expenses BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE} (rowid, description, notes, location, tags)
+        VALUES (new.id, new.description, new.notes, new.location, {_indexed_tags_sql('new.tags')});
+    END""",
+]
+
+TRIGGERS = ['expenses_fts_insert', 'expenses_fts_delete', 'expenses_fts_update']
+
+BACKFILL = f"""INSERT INTO {FTS_TABLE} (rowid, description, notes, location, tags)
+    SELECT id, description, notes, location, {_indexed_tags_sql('tags')} FROM {{table}}"""
+
+
+def search_supported(bind):
+    return bind.dialect.name == 'sqlite'
+
+
+def _triggers_outdated(connection):
+    stored = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = :name"), {'name': TRIGGERS[0]}
+    ).scalar()
+    return stored != SCHEMA[1]
+
+
+def create_search_index(connection, rebuild=False):
+    """Create the FTS table and triggers if missing and index existing expenses.
+
+    With rebuild=True, or when the triggers were created by an older version
+    of this module, the triggers are recreated and the index is emptied and
+    refilled from the expenses table and its archive partitions. Returns
+    True if the index was (re)filled.
+    """
+    if not search_supported(connection):
+        return False
+
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+    ).first() is not None
+
+    if exists and not rebuild and not _triggers_outdated(connection):
+        return False
+    if exists:
+        for trigger in TRIGGERS:
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+        connection.execute(text(f'DELETE FROM {FTS_TABLE}'))
+        for statement in SCHEMA[1:]:
+            connection.execute(text(statement))
+    else:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    connection.execute(text(BACKFILL.format(table='expenses')))
+    for table_name in _expense_partitions(connection):
+        connection.execute(text(BACKFILL.format(table=table_name)))
+    return True
+
+
+def _expense_partitions(connection):
+    """Archive partition tables of expenses, read without the session (see archive.py)"""
+    registry = ArchivePartition.__table__
+    if not connection.dialect.has_table(connection, registry.name):
+        return []
+    return connection.execute(
+        select(registry.c.table_name).where(registry.c.entity == 'expenses', registry.c.first_date.isnot(None))
+    ).scalars().all()
+
+
+def index_table(connection, table_name):
+    """(Re-)index the expenses stored in another table, such as an archive partition"""
+    if not search_supported(connection):
+        return
+    connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM {table_name})'))
+    connection.execute(text(BACKFILL.format(table=table_name)))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index_with_schema(target, connection, **kw):
+    create_search_index(connection)
+
+
+def build_match_query(user_query):
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix"""
+    terms = [term.replace('"', '""') for term in user_query.split()]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+_fts = table(FTS_TABLE, column('rowid'))
+_fts_ref = literal_column(FTS_TABLE)
+
+
+def _highlight(column_index):
+    return func.highlight(_fts_ref, column_index, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE)
+
+
+def search_expenses(user_query, tag=None, limit=20, offset=0):
+    """Return (total, rows) for a ranked search.
+
+    Each row is (Expense, category name, color, icon, highlights dict, rank).
+    """
+    match = build_match_query(user_query) if user_query else ''
+    if tag:
+        tag_clause = f'tags : "{normalize_tag(tag).replace(chr(34), chr(34) * 2)}"'
+        match = f'{match} AND {tag_clause}' if match else tag_clause
+
+    matches = _fts_ref.op('MATCH')(match)
+    rank = func.bm25(_fts_ref, *RANK_WEIGHTS)
+    # Hits are only counted and paged if their expense still exists somewhere
+    sources = archive.sources('expenses')
+    # EXISTS rather than rowid IN (...): FTS5 would take the IN list as one lookup per id
+    matches = matches & or_(*[
+        select(expenses.id).where(expenses.id == _fts.c.rowid).correlate(_fts).exists() for expenses in sources
+    ])
+
+    total = db.session.execute(select(func.count()).select_from(_fts).where(matches)).scalar()
+
+    # Outer joins: hits on archived expenses come back without an expense row
+    stmt = select(
+        _fts.c.rowid, Expense, Category.name, Category.color, Category.icon,
+        _highlight(0).label('description'),
+        func.snippet(_fts_ref, 1, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, '…', 16).label('notes'),
+        _highlight(2).label('location'),
+        _highlight(3).label('tags'),
+        rank.label('rank')
+    ).select_from(_fts).outerjoin(
+        Expense, Expense.id == _fts.c.rowid
+    ).outerjoin(
+        Category, Category.id == Expense.category_id
+    ).where(matches).order_by(rank).limit(limit).offset(offset)
+
+    hits = db.session.execute(stmt).all()
+    archived = {}
+    missing = [hit.rowid for hit in hits if hit.Expense is None]
+    if missing:
+        for expenses in sources[1:]:
+            archived.update(
+                (expense.id, (expense, name, color, icon)) for expense, name, color, icon in db.session.execute(
+                    select(expenses, Category.name, Category.color, Category.icon)
+                    .join(Category, Category.id == expenses.category_id).where(expenses.id.in_(missing))
+                )
+            )
+
+    rows = []
+    for rowid, expense, name, color, icon, description, notes, location, tags, row_rank in hits:
+        if expense is None:
+            if rowid not in archived:
+                # Stale index entry for a row that no longer exists
+                continue
+            expense, name, color, icon = archived[rowid]
+        highlights = {
+            'description': description,
+            'notes': notes,
+            'location': location,
+            'tags': _denormalize_tags(tags) if tags else tags,
+        }
+        rows.append((expense, name, color, icon, highlights, row_rank))
+    return total, rows
@@ -0,0 +1,161 @@
+"""Normalized tag index for expenses.
+
+Expense.tags stays a comma-separated string in the API, but every write also
+records one expense_tags row per tag so tag filters and per-tag totals are
+indexed joins instead of LIKE scans. Tag names are normalized (trimmed,
+lowercased, inner whitespace collapsed), so "Home  Office" and "home office"
+are the same tag. The string is stored normalized as well (format_tags()),
+which is what the search index reads.
+"""
+from sqlalchemy import bindparam, delete, func, inspect, insert, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Expense, ExpenseTag, Tag
+import archive
+
+REBUILD_BATCH = 5000
+
+
+def parse_tags(value):
+    """Split a comma-separated tag string into unique normalized names, in order"""
+    names = []
+    for tag in (value or '').split(','):
+        name = ' '.join(tag.split()).lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def format_tags(value):
+    """The stored form of a tag string: its parse_tags() names joined by ', '"""
+    return ', '.join(parse_tags(value))
+
+
+def _tag_ids(names):
+    """Return {name: id} for the given names, creating missing tags"""
+    if not names:
+        return {}
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    db.session.execute(
+        dialect.insert(Tag).on_conflict_do_nothing(index_elements=['name']),
+        [{'name': name} for name in names]
+    )
+    return dict(db.session.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+
+
+def index_expense_tags(pairs, replace=True):
+    """Record the tags of (expense_id, tags string) pairs in expense_tags.
+
+    Runs in the caller's transaction. With replace=True any tags previously
+    indexed for these expenses are removed first.
+    """
+    parsed = [(expense_id, parse_tags(tags)) for expense_id, tags in pairs]
+    if replace and parsed:
+        db.session.execute(delete(ExpenseTag).where(
+            ExpenseTag.expense_id.in_([expense_id for expense_id, _ in parsed])
+        ))
+
+    ids = _tag_ids(sorted({name for _, names in parsed for name in names}))
+    rows = [
+        {'expense_id': expense_id, 'tag_id': ids[name]}
+        for expense_id, names in parsed for name in names
+    ]
+    if rows:
+        db.session.execute(insert(ExpenseTag), rows)
+    return len(rows)
+
+
+def rebuild_tag_index():
+    """Re-parse every expense's tag string into the tags tables.
+
+    Archived expenses are indexed too. Unused tags are dropped. Returns the
+    number of expense/tag links written.
+    """
+    db.session.execute(delete(ExpenseTag))
+    links = 0
+    for expenses in archive.sources('expenses'):
+        last_id = 0
+        while True:
+            batch = db.session.execute(
+                select(expenses.id, expenses.tags)
+                .where(expenses.id > last_id, expenses.tags.isnot(None), expenses.tags != '')
+                .order_by(expenses.id).limit(REBUILD_BATCH)
+            ).all()
+            if not batch:
+                break
+            links += index_expense_tags(batch, replace=False)
+            last_id = batch[-1][0]
+
+    db.session.execute(delete(Tag).where(~Tag.id.in_(select(ExpenseTag.tag_id))))
+    db.session.commit()
+    return links
+
+
+def normalize_stored_tags():
+    """Rewrite tag strings stored before writes normalized them, archived ones included.
+
+    Returns the number of expenses changed.
+    """
+    changed = 0
+    for expenses in archive.sources('expenses', fresh=True):
+        table = inspect(expenses).selectable
+        rewrite = update(table).where(table.c.id == bindparam('row_id')).values(tags=bindparam('normalized'))
+        last_id = 0
+        while True:
+            batch = db.session.execute(
+                select(expenses.id, expenses.tags)
+                .where(expenses.id > last_id, expenses.tags.isnot(None))
+                .order_by(expenses.id).limit(REBUILD_BATCH)
+            ).all()
+            if not batch:
+                break
+            rewrites = [{'row_id': expense_id, 'normalized': format_tags(tags)}
+                        for expense_id, tags in batch if format_tags(tags) != tags]
+            if rewrites:
+                db.session.execute(rewrite, rewrites)
+                changed += len(rewrites)
+            last_id = batch[-1][0]
+    db.session.commit()
+    return changed
+
+
+def tagged_with(name):
+    """Subquery of expense ids carrying the given tag, resolved via the tag index"""
+    return select(ExpenseTag.expense_id).join(Tag, Tag.id == ExpenseTag.tag_id).where(
+        Tag.name == ' '.join(name.split()).lower()
+    )
+
+
+def tag_totals(start_date=None, end_date=None):
+    """Spend per tag as (name, total, count) rows, largest total first.
+
+    With archive partitions in the range, each partition is aggregated on
+    its own and the per-tag sums are added up.
+    """
+    parts = archive.sources('expenses', start_date, end_date)
+    if len(parts) == 1:
+        query = db.session.query(
+            Tag.name, func.sum(Expense.amount), func.count(Expense.id)
+        ).join(ExpenseTag, ExpenseTag.tag_id == Tag.id).join(Expense, Expense.id == ExpenseTag.expense_id)
+        if start_date:
+            query = query.filter(Expense.date >= start_date)
+        if end_date:
+            query = query.filter(Expense.date <= end_date)
+        return query.group_by(Tag.id, Tag.name).order_by(func.sum(Expense.amount).desc(), Tag.name).all()
+
+    branches = []
+    for expenses in parts:
+        branch = select(
+            ExpenseTag.tag_id, func.sum(expenses.amount).label('total'), func.count(expenses.id).label('count')
+        ).join(expenses, expenses.id == ExpenseTag.expense_id)
+        if start_date:
+            branch = branch.where(expenses.date >= start_date)
+        if end_date:
+            branch = branch.where(expenses.date <= end_date)
+        branches.append(branch.group_by(ExpenseTag.tag_id))
+    sums = union_all(*branches).subquery()
+    return db.session.query(
+        Tag.name, func.sum(sums.c.total), func.sum(sums.c.count)
+    ).join(sums, sums.c.tag_id == Tag.id).group_by(Tag.id, Tag.name).order_by(
+        func.sum(sums.c.total).desc(), Tag.name
+    ).all()
@@ -0,0 +1,48 @@
+"""Shared fixtures: the app against a throwaway SQLite database."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope='session')
+def _app():
+    from bootstrap import create_app
+
+    database_dir = tempfile.mkdtemp(prefix='expense-tracker-tests-')
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(database_dir, 'test.db')}",
+        # Cached responses and the change feed would hide what a request really runs
+        'RESPONSE_CACHE_BACKEND': 'none',
+        'EVENTS_BACKEND': 'none',
+        'GROUP_COMMIT': False,
+    }, initialize=False)
+
+
+@pytest.fixture
+def app(_app):
+    from bootstrap import init_default_data
+    from models import db
+    import archive
+    import reference_cache
+
+    app = _app
+    with app.app_context():
+        db.drop_all()
+        # Archive partitions are kept out of db.metadata
+        archive.archive_metadata.drop_all(db.engine)
+        db.create_all()
+        init_default_data()
+        reference_cache.invalidate_all()
+        archive.partitions_cache.invalidate()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,56 @@
+"""Archiving moves tagged expenses without breaking their tag links."""
+from datetime import date
+
+import pytest
+from sqlalchemy import delete, event, select
+
+import archive
+from models import db, ExpenseTag
+
+
+def _enforce_foreign_keys(dbapi_connection, connection_record, connection_proxy):
+    dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+@pytest.fixture
+def enforced_foreign_keys(app):
+    # SQLite only checks foreign keys when asked to, as Postgres always does
+    db.session.remove()
+    event.listen(db.engine, 'checkout', _enforce_foreign_keys)
+    yield
+    event.remove(db.engine, 'checkout', _enforce_foreign_keys)
+    db.session.remove()
+    # Pooled connections keep the pragma
+    db.engine.dispose()
+
+
+def add_expense(client, date, tags):
+    response = client.post('/api/expenses', json={
+        'amount': 10, 'description': 'Groceries', 'category': 'Food', 'date': date, 'tags': tags
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_archived_expenses_keep_their_tags(client, enforced_foreign_keys):
+    old_id = add_expense(client, '2021-06-01', 'home, weekly')
+    add_expense(client, date.today().isoformat(), 'home')
+
+    moved = archive.archive(date(2022, 1, 1))
+
+    assert moved == {'expenses_archive_2021': 1}
+    assert archive.verify_archive() == []
+    assert db.session.execute(
+        select(ExpenseTag.expense_id).where(ExpenseTag.expense_id == old_id)
+    ).scalars().all() == [old_id, old_id]
+
+
+def test_verify_archive_reports_orphaned_tag_links(client):
+    old_id = add_expense(client, '2021-06-01', 'home')
+    add_expense(client, date.today().isoformat(), 'home')
+    archive.archive(date(2022, 1, 1))
+
+    db.session.execute(delete(archive.partition_table('expenses', 2021)))
+    db.session.commit()
+
+    assert f'expense_tags: links to missing expenses: {old_id}' in archive.verify_archive()
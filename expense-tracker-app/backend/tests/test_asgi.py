@@ -0,0 +1,79 @@
+"""The async read path shows up in the request metrics and uses the response cache."""
+import asyncio
+import re
+
+import pytest
+
+import archive
+from response_cache import MemoryBackend
+
+
+@pytest.fixture
+def asgi(app):
+    from asgi import AsyncReadAPI
+
+    application = AsyncReadAPI(app)
+    loop = asyncio.new_event_loop()
+
+    def get(path, query='', headers=()):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+                 'headers': [(name.lower().encode(), value.encode()) for name, value in headers]}
+        loop.run_until_complete(application(scope, receive, send))
+        start, body = messages[0], b''.join(message.get('body', b'') for message in messages[1:])
+        return start['status'], {name.decode(): value.decode() for name, value in start['headers']}, body
+
+    yield get
+    # Pooled aiosqlite connections belong to this loop
+    loop.run_until_complete(application.engine.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def memory_cache():
+    from app import response_cache
+
+    backend, response_cache.backend = response_cache.backend, MemoryBackend()
+    yield response_cache
+    response_cache.backend = backend
+
+
+def requests_recorded(client, endpoint):
+    metrics = client.get('/api/metrics').get_data(as_text=True)
+    match = re.search(rf'^expense_tracker_http_requests_total\{{endpoint="{endpoint}",method="GET",status="200"\}} (\d+)$',
+                      metrics, re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+
+def test_async_reads_are_recorded_in_metrics(client, asgi):
+    before = requests_recorded(client, 'api.get_dashboard_overview')
+    archive.partitions_cache.invalidate()
+
+    status, headers, _ = asgi('/api/dashboard/overview')
+
+    assert status == 200
+    assert re.match(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries"', headers['server-timing'])
+    assert requests_recorded(client, 'api.get_dashboard_overview') == before + 1
+    assert not archive.partitions_cache.expired
+
+
+def test_async_reads_use_the_response_cache(client, asgi, memory_cache):
+    hits = memory_cache.hits
+    status, headers, body = asgi('/api/analytics/last-20-days')
+    assert status == 200
+    assert asgi('/api/analytics/last-20-days')[2] == body
+    assert memory_cache.hits == hits + 1
+
+    status, _, _ = asgi('/api/analytics/last-20-days', headers=[('If-None-Match', headers['etag'])])
+    assert status == 304
+
+    # A write bumps the tables the cached response was built from
+    client.post('/api/expenses', json={'amount': 12.5, 'description': 'Lunch'})
+    assert asgi('/api/analytics/last-20-days')[2] != body
@@ -0,0 +1,32 @@
+"""The change feed refuses a setup in which writes would miss subscribers."""
+import pytest
+from flask import Flask
+
+from events import ChangeFeed
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return app
+
+
+def test_memory_backend_refuses_several_workers():
+    with pytest.raises(RuntimeError, match='several workers'):
+        ChangeFeed(make_app(EVENTS_BACKEND='memory', SERVER_WORKERS=4))
+
+
+@pytest.mark.parametrize('config', [
+    {'EVENTS_BACKEND': 'memory', 'SERVER_WORKERS': 1},
+    {'EVENTS_BACKEND': 'none', 'SERVER_WORKERS': 4},
+])
+def test_single_worker_or_disabled_feed_starts(config):
+    feed = ChangeFeed(make_app(**config))
+    assert feed.enabled == (config['EVENTS_BACKEND'] == 'memory')
+
+
+def test_subscribers_over_the_limit_are_refused():
+    feed = ChangeFeed(make_app(EVENTS_BACKEND='memory', EVENTS_MAX_SUBSCRIBERS=2))
+    assert feed.subscribe() is not None
+    assert feed.subscribe() is not None
+    assert feed.subscribe() is None
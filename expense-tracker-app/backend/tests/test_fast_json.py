@@ -0,0 +1,50 @@
+"""FastJSON bodies match jsonify() with either encoder, non-finite floats aside."""
+from datetime import date, datetime
+
+import pytest
+from flask import jsonify
+
+import fast_json
+from fast_json import FastJSON
+
+PAYLOADS = [
+    {'amount': 12.5, 'notes': None, 'tags': ['a', 'b'], 'count': 3},
+    [{'id': i, 'amount': i / 7, 'description': f'Row {i}'} for i in range(50)],
+    {'big': 1e16, 'small': 1e-05, 'tiny': 2.5e-07, 'negative': -0.00001},
+    {'text': 'Café ☕', 'key with "quotes"': 'x'},
+]
+NON_FINITE = {'rate': float('nan'), 'rows': [{'balance': float('inf')}, {'balance': float('-inf')}]}
+
+
+@pytest.fixture(params=['stdlib', 'orjson'])
+def encoder(app, request):
+    if request.param == 'orjson' and fast_json.orjson is None:
+        pytest.skip('orjson is not installed')
+    configured, registered = app.config.get('JSON_ENCODER'), app.extensions['fast_json']
+    app.config['JSON_ENCODER'] = request.param
+    yield FastJSON(app)
+    app.config['JSON_ENCODER'] = configured
+    app.extensions['fast_json'] = registered
+
+
+@pytest.mark.parametrize('payload', PAYLOADS)
+def test_body_matches_jsonify(app, encoder, payload):
+    with app.test_request_context():
+        assert encoder.dumps(payload) == jsonify(payload).get_data()
+
+
+def test_dates_are_iso_8601(app, encoder):
+    payload = {'date': date(2024, 5, 1), 'created_at': datetime(2024, 5, 1, 9, 30)}
+    converted = {'date': '2024-05-01', 'created_at': '2024-05-01T09:30:00'}
+    with app.test_request_context():
+        assert encoder.dumps(payload) == jsonify(converted).get_data()
+
+
+def test_non_finite_floats(app, encoder):
+    with app.test_request_context():
+        body = encoder.dumps(NON_FINITE)
+        if encoder.use_orjson:
+            # Documented difference: valid JSON null instead of jsonify's NaN/Infinity
+            assert body == b'{"rate":null,"rows":[{"balance":null},{"balance":null}]}\n'
+        else:
+            assert body == jsonify(NON_FINITE).get_data()
@@ -0,0 +1,39 @@
+"""Bulk imports keep loan balances and rollups consistent with the rows stored."""
+import rollups
+from models import db, Loan
+
+LOANS_CSV = (
+    'person_name,loan_type,amount,date\n'
+    'Ali,given,5,2024-01-01\n'
+    'Ali,given,2,2024-01-02\n'
+    'Ali,given,' + 'x' * 200000 + ',2024-01-03\n'
+)
+
+
+def test_broken_input_keeps_committed_chunks_consistent(client):
+    response = client.post('/api/import?type=loans&format=csv&chunk_size=1', data=LOANS_CSV,
+                           content_type='text/csv')
+
+    assert response.status_code == 400
+    assert 'field larger than field limit' in response.get_json()['error']
+    assert response.get_json()['report']['imported'] == 2
+
+    db.session.expire_all()
+    assert [loan.cumulative_net for loan in Loan.query.order_by(Loan.date)] == [5, 7]
+
+    response = client.post('/api/loans', json={
+        'person_name': 'Ali', 'loan_type': 'given', 'amount': 7, 'date': '2024-01-04'
+    })
+    assert response.status_code == 201
+    db.session.expire_all()
+    assert Loan.query.order_by(Loan.date.desc()).first().cumulative_net == 14
+
+
+def test_rollups_add_up_the_stored_cents(client):
+    rows = ''.join(f'0.004,Crumbs {i},Food,2024-05-0{i}\n' for i in range(1, 4))
+    response = client.post('/api/import?type=expenses&format=csv', data='amount,description,category,date\n' + rows,
+                           content_type='text/csv')
+
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == 3
+    assert rollups.verify_rollups() == 0
@@ -0,0 +1,56 @@
+"""Stored running balances match a replay of the loans in (date, id) order."""
+from models import db, Loan, Person
+from loan_balances import signed_amount
+
+LOANS = [
+    ('given', 500, '2024-03-10'),
+    ('taken', 200, '2024-01-05'),
+    ('received_back', 100, '2024-03-10'),
+    ('given', 75.5, '2023-12-31'),
+    ('taken', 30, '2024-02-01'),
+]
+
+
+def replayed_balances():
+    running = 0
+    balances = {}
+    for loan in Loan.query.order_by(Loan.date, Loan.id):
+        running += signed_amount(loan.loan_type, loan.amount)
+        balances[loan.id] = round(running, 2)
+    return balances
+
+
+def test_back_dated_loans_shift_later_balances(client):
+    for loan_type, amount, loan_date in LOANS:
+        response = client.post('/api/loans', json={
+            'person_name': 'Ali', 'loan_type': loan_type, 'amount': amount, 'date': loan_date
+        })
+        assert response.status_code == 201
+
+    db.session.expire_all()
+    stored = {loan.id: loan.cumulative_net for loan in Loan.query}
+    assert stored == replayed_balances()
+
+
+def test_concurrent_inserts_keep_balances_consistent(app):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def post(i):
+        loan_type = ('given', 'taken', 'received_back')[i % 3]
+        response = app.test_client().post('/api/loans', json={
+            'person_name': f'Person {i % 4}', 'loan_type': loan_type, 'amount': 10 + i,
+            'date': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}'
+        })
+        return response.status_code
+
+    # Persons are created up front; only the balance updates race here
+    db.session.add_all(Person(name=f'Person {i}') for i in range(4))
+    db.session.commit()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(post, range(40)))
+    assert statuses == [201] * 40
+
+    db.session.expire_all()
+    stored = {loan.id: loan.cumulative_net for loan in Loan.query}
+    assert stored == replayed_balances()
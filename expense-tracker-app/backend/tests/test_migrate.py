@@ -0,0 +1,49 @@
+"""migrate brings old tables to the constraints the models declare."""
+from sqlalchemy import inspect, text
+
+from db_manager import convert_money_columns, create_missing_indexes, drop_stale_foreign_keys
+from models import db, ExpenseTag, MonthlyIncome
+
+
+def test_float_amounts_become_not_null_cents(app):
+    MonthlyIncome.__table__.drop(db.engine)
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE monthly_income (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, '
+            'month_year VARCHAR(7) NOT NULL, source VARCHAR(100), created_at DATETIME)'
+        ))
+        connection.execute(text("INSERT INTO monthly_income (amount, month_year, source) VALUES "
+                                "(1234.56, '2024-01', 'Salary'), (0.1, '2024-02', NULL)"))
+
+    assert convert_money_columns() == ['monthly_income.amount']
+    create_missing_indexes()
+
+    inspector = inspect(db.engine)
+    columns = {column['name']: column for column in inspector.get_columns('monthly_income')}
+    assert 'amount' not in columns
+    assert columns['amount_cents']['nullable'] is False
+    assert {index['name'] for index in inspector.get_indexes('monthly_income')} == {'ix_monthly_income_month_year'}
+
+    rows = db.session.execute(
+        db.select(MonthlyIncome.month_year, MonthlyIncome.amount, MonthlyIncome.source).order_by(MonthlyIncome.id)
+    ).all()
+    assert [tuple(row) for row in rows] == [('2024-01', 1234.56, 'Salary'), ('2024-02', 0.1, None)]
+    assert convert_money_columns() == []
+
+
+def test_tag_links_lose_their_expense_foreign_key(app):
+    ExpenseTag.__table__.drop(db.engine)
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE expense_tags (expense_id INTEGER NOT NULL REFERENCES expenses (id), '
+            'tag_id INTEGER NOT NULL REFERENCES tags (id), PRIMARY KEY (expense_id, tag_id))'
+        ))
+        connection.execute(text('INSERT INTO expense_tags (expense_id, tag_id) VALUES (7, 1), (8, 1)'))
+
+    assert drop_stale_foreign_keys() == ['expense_tags.expense_id -> expenses']
+    create_missing_indexes()
+
+    inspector = inspect(db.engine)
+    assert [key['referred_table'] for key in inspector.get_foreign_keys('expense_tags')] == ['tags']
+    assert db.session.execute(db.select(ExpenseTag.expense_id).order_by(ExpenseTag.expense_id)).scalars().all() == [7, 8]
+    assert drop_stale_foreign_keys() == []
@@ -0,0 +1,74 @@
+"""The list endpoints run a fixed number of statements however many rows they return."""
+from datetime import date, timedelta
+
+import pytest
+
+from loan_balances import repair_loan_balances
+from models import db, Committee, CommitteePayment, Loan, Person
+from query_counter import QueryCounter, assert_max_queries
+
+N = 20
+START = date(2024, 1, 1)
+
+
+def seed(offset, count):
+    """Add count committees with payments and count persons with loans"""
+    for i in range(offset, offset + count):
+        committee = Committee(
+            name=f'Committee {i}', start_date=START, end_date=START + timedelta(days=330),
+            monthly_amount=100, expected_receiving_amount=1200,
+            expected_receiving_date=START + timedelta(days=330)
+        )
+        db.session.add(committee)
+        db.session.flush()
+        db.session.add_all(
+            CommitteePayment(committee_id=committee.id, amount=100, month_year=f'2024-{month:02d}',
+                             payment_date=date(2024, month, 5))
+            for month in range(1, 4)
+        )
+
+        person = Person(name=f'Person {i}')
+        db.session.add(person)
+        db.session.flush()
+        db.session.add_all(
+            Loan(person_id=person.id, loan_type=loan_type, amount=50 + i,
+                 date=START + timedelta(days=i % 300))
+            for loan_type in ('given', 'taken', 'received_back')
+        )
+    repair_loan_balances()
+    db.session.commit()
+
+
+def count_queries(client, url):
+    # The first request also fills the reference and partition caches
+    assert client.get(url).status_code == 200
+    with QueryCounter(db.engine) as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    return counter.count, response.get_json()
+
+
+@pytest.mark.parametrize('url, max_queries', [
+    ('/api/committees', 2),
+    ('/api/analytics/loan-timeline', 1),
+    ('/api/analytics/loan-timeline?limit=25', 1),
+])
+def test_statement_count_does_not_grow_with_rows(client, url, max_queries):
+    seed(0, N)
+    small_count, small = count_queries(client, url)
+
+    seed(N, 9 * N)
+    large_count, large = count_queries(client, url)
+
+    assert len(large) >= len(small)
+    assert small_count == large_count
+    with assert_max_queries(db.engine, max_queries):
+        client.get(url)
+
+
+def test_committees_embed_every_payment(client):
+    seed(0, N)
+    committees = client.get('/api/committees').get_json()
+    assert len(committees) == N
+    assert all(len(committee['payments']) == 3 for committee in committees)
+    assert all(committee['total_paid'] == 300 for committee in committees)
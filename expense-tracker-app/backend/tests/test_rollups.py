@@ -0,0 +1,25 @@
+"""Rebuilt rollups match the ones kept up to date on every write."""
+import rollups
+from models import MonthlyRollup, MonthlyTotal
+
+
+def stored():
+    return (sorted((row.month, row.category_id, row.total, row.transaction_count) for row in MonthlyRollup.query),
+            sorted((row.month, row.loan_given, row.loan_taken) for row in MonthlyTotal.query))
+
+
+def test_rebuild_matches_incremental_rollups(client):
+    for amount, date in ((12.5, '2024-01-31'), (7.25, '2024-02-01')):
+        assert client.post('/api/expenses', json={
+            'amount': amount, 'description': 'Lunch', 'category': 'Food', 'date': date
+        }).status_code == 201
+    assert client.post('/api/loans', json={
+        'person_name': 'Ali', 'loan_type': 'given', 'amount': 40, 'date': '2024-02-10'
+    }).status_code == 201
+
+    incremental = stored()
+    assert [row[0] for row in incremental[0]] == ['2024-01', '2024-02']
+
+    assert rollups.verify_rollups() == 0
+    assert rollups.rebuild_rollups()['drifted'] == 0
+    assert stored() == incremental
@@ -0,0 +1,67 @@
+"""Full-text search matches tags the way tag_index.parse_tags() reads them."""
+import pytest
+from sqlalchemy import text
+
+from models import db, Expense
+from search import FTS_TABLE, create_search_index, search_supported
+from tag_index import normalize_stored_tags
+
+
+@pytest.fixture(autouse=True)
+def requires_fts(app):
+    if not search_supported(db.engine):
+        pytest.skip('SQLite FTS5 is not available')
+
+
+def add_expense(client, description, tags):
+    response = client.post('/api/expenses', json={
+        'amount': 10, 'description': description, 'date': '2024-05-01', 'tags': tags
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+@pytest.mark.parametrize('tags, stored', [
+    ('home  office', 'home office'),
+    (' Home\toffice ,pharmacy', 'home office, pharmacy'),
+    ('pharmacy ,  home \n office', 'pharmacy, home office'),
+])
+def test_tag_whitespace_is_collapsed(client, tags, stored):
+    expense_id = add_expense(client, 'Desk', tags)
+    assert db.session.get(Expense, expense_id).tags == stored
+
+    for tag in ('home office', 'home   office', 'HOME OFFICE'):
+        body = client.get('/api/expenses/search', query_string={'tag': tag}).get_json()
+        assert body['total'] == 1
+        assert [result['description'] for result in body['results']] == ['Desk']
+
+
+def test_total_skips_stale_index_entries(client):
+    for i in range(3):
+        add_expense(client, f'Coffee {i}', 'cafe')
+    # An index entry whose expense is gone, as a crash between writes could leave
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, description, notes, location, tags) "
+                            f"VALUES (9999, 'Coffee ghost', '', '', 'cafe')"))
+    db.session.commit()
+
+    body = client.get('/api/expenses/search', query_string={'q': 'coffee', 'limit': 2}).get_json()
+    assert body['total'] == 3
+    assert len(body['results']) == 2
+    body = client.get('/api/expenses/search', query_string={'q': 'coffee', 'limit': 2, 'offset': 2}).get_json()
+    assert len(body['results']) == 1
+
+
+def test_migrate_normalizes_tags_stored_before(client):
+    expense_id = add_expense(client, 'Desk', 'pharmacy')
+    db.session.execute(text("UPDATE expenses SET tags = ' Home \t  Office ,, PHARMACY ' WHERE id = :id"),
+                       {'id': expense_id})
+    db.session.commit()
+
+    assert normalize_stored_tags() == 1
+    assert normalize_stored_tags() == 0
+    assert db.session.get(Expense, expense_id).tags == 'home office, pharmacy'
+    with db.engine.begin() as connection:
+        create_search_index(connection, rebuild=True)
+
+    for tag in ('home office', 'pharmacy'):
+        assert client.get('/api/expenses/search', query_string={'tag': tag}).get_json()['total'] == 1
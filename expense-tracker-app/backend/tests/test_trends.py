@@ -0,0 +1,36 @@
+"""Trend totals are summed in integer cents, and ranges are checked before anything is loaded."""
+
+
+def test_totals_are_exact_cents(client):
+    for amount, date in ((0.1, '2024-03-04'), (0.2, '2024-03-18'), (19.99, '2024-04-02'), (0.01, '2024-04-30')):
+        response = client.post('/api/expenses', json={
+            'amount': amount, 'description': 'Snack', 'category': 'Food', 'date': date
+        })
+        assert response.status_code == 201
+
+    body = client.get('/api/analytics/trends', query_string={
+        'granularity': 'month', 'start': '2024-03-01', 'end': '2024-04-30', 'window': 2, 'percentiles': '50'
+    }).get_json()
+
+    assert body['periods'] == ['2024-03', '2024-04']
+    assert body['totals'] == [0.3, 20.0]
+    assert body['rolling'] == [0.3, 20.3]
+    assert body['categories'] == {'Food': [0.3, 20.0]}
+    assert body['transaction_counts'] == [2, 2]
+    assert body['percentiles'] == {'p50': [0.15, 10.0]}
+
+
+def test_ranges_it_cannot_serve_are_rejected(client):
+    for query in ({'granularity': 'day', 'start': '0001-01-02', 'end': '0001-02-01'},
+                  {'granularity': 'month', 'start': '0001-06-01', 'end': '0001-12-31'},
+                  {'granularity': 'day', 'end': '0001-01-05'},
+                  {'granularity': 'day', 'start': '2000-01-01', 'end': '2024-12-31'}):
+        response = client.get('/api/analytics/trends', query_string=query)
+        assert response.status_code == 400, query
+        assert response.get_json()['error'].startswith('Invalid trends query: ')
+
+    response = client.get('/api/analytics/trends', query_string={
+        'granularity': 'day', 'start': '2015-01-01', 'end': '2024-12-31'
+    })
+    assert response.status_code == 200
+    assert len(response.get_json()['periods']) == 3653
@@ -0,0 +1,21 @@
+"""Production entry point.
+
+Linux/macOS:  gunicorn -c gunicorn.conf.py wsgi:app
+Windows:      python wsgi.py   (serves with waitress)
+"""
+import os
+
+from bootstrap import create_app
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    from waitress import serve
+
+    serve(
+        app,
+        host=os.environ.get('HOST', '127.0.0.1'),
+        port=int(os.environ.get('PORT', 5000)),
+        threads=int(os.environ.get('WAITRESS_THREADS', 8)),
+    )
@@ -11,6 +11,7 @@ import LoanModal from './components/modals/LoanModal';
 import CommitteeModal from './components/modals/CommitteeModal';
 import IncomeModal from './components/modals/IncomeModal';
 import { apiService } from './services/apiService';
+import { applyToOverview } from './services/changeFeed';
 
 function App() {
   const [dashboardData, setDashboardData] = useState({
@@ -32,6 +33,15 @@ function App() {
 
   useEffect(() => {
     loadDashboardData();
+
+    // Writes from other clients arrive on the change feed and are applied
+    // to the loaded totals; the widgets subscribe for their own data
+    return apiService.subscribeToChanges({
+      onChange: (event) => {
+        setDashboardData(prev => (prev.current_month ? applyToOverview(prev, event) : prev));
+      },
+      onResync: loadDashboardData
+    });
   }, []);
 
   const loadDashboardData = async () => {
@@ -55,7 +65,8 @@ function App() {
   };
 
   const handleDataUpdate = () => {
-    // Refresh dashboard data when new data is added
+    // Reload after this client's own writes: their events may never reach
+    // it (e.g. the feed is disabled) and apiService drops them if they do
     loadDashboardData();
     // Trigger refresh for all child components
     setRefreshTrigger(prev => prev + 1);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import toast from 'react-hot-toast';
 import { apiService } from '../services/apiService';
+import { applyToMonthlySummary } from '../services/changeFeed';
 
 const ExpenseSummaryTable = ({ refreshTrigger = 0 }) => {
   const [monthlyData, setMonthlyData] = useState({});
@@ -16,6 +17,14 @@ const ExpenseSummaryTable = ({ refreshTrigger = 0 }) => {
     loadMonthlyData();
   }, [refreshTrigger]); // Add refreshTrigger to dependency array
 
+  useEffect(() => {
+    // Committed writes are applied to the loaded months instead of refetching them
+    return apiService.subscribeToChanges({
+      onChange: (event) => setMonthlyData(prev => applyToMonthlySummary(prev, event)),
+      onResync: loadMonthlyData
+    });
+  }, []);
+
   const loadMonthlyData = async () => {
     try {
       setLoading(true); // Show loading state during refresh
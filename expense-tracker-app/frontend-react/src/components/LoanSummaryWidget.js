@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import toast from 'react-hot-toast';
 import { apiService } from '../services/apiService';
+import { applyToLoanSummary } from '../services/changeFeed';
 
 const LoanSummaryWidget = ({ refreshTrigger = 0 }) => {
   const [loanData, setLoanData] = useState({});
@@ -10,6 +11,14 @@ const LoanSummaryWidget = ({ refreshTrigger = 0 }) => {
     loadLoanData();
   }, [refreshTrigger]); // Add refreshTrigger to dependency array
 
+  useEffect(() => {
+    // New loans are added to the loaded totals instead of refetching them
+    return apiService.subscribeToChanges({
+      onChange: (event) => setLoanData(prev => applyToLoanSummary(prev, event)),
+      onResync: loadLoanData
+    });
+  }, []);
+
   const loadLoanData = async () => {
     try {
       setLoading(true); // Show loading state during refresh
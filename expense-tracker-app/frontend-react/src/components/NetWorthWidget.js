@@ -1,6 +1,20 @@
 import React, { useState, useEffect } from 'react';
 import toast from 'react-hot-toast';
 import { apiService } from '../services/apiService';
+import { applyToNetValues, eventMonths } from '../services/changeFeed';
+
+// Applies a change event to each loaded month it touches
+const applyToMonths = (monthlyMetrics, event) => {
+  const months = eventMonths(event).filter(month => monthlyMetrics[month]);
+  if (months.length === 0) {
+    return monthlyMetrics;
+  }
+  const updated = { ...monthlyMetrics };
+  months.forEach(month => {
+    updated[month] = applyToNetValues(updated[month], event);
+  });
+  return updated;
+};
 
 const NetWorthWidget = ({ refreshTrigger = 0 }) => {
   const [monthlyMetrics, setMonthlyMetrics] = useState({});
@@ -11,6 +25,14 @@ const NetWorthWidget = ({ refreshTrigger = 0 }) => {
     loadMonthlyMetrics();
   }, [refreshTrigger]); // Add refreshTrigger to dependency array
 
+  useEffect(() => {
+    // Committed writes are applied to the loaded months instead of refetching all twelve
+    return apiService.subscribeToChanges({
+      onChange: (event) => setMonthlyMetrics(prev => applyToMonths(prev, event)),
+      onResync: loadMonthlyMetrics
+    });
+  }, []);
+
   const loadMonthlyMetrics = async () => {
     try {
       setLoading(true); // Show loading state during refresh
@@ -36,6 +36,82 @@ api.interceptors.response.use(
   }
 );
 
+// Change feed: one EventSource on GET /events shared by every subscriber
+const CHANGE_EVENTS = ['expense', 'loan', 'committee', 'committee_payment', 'income'];
+// A stream the server refused (feed disabled, or 503 when every stream
+// slot is taken) is retried this often; EventSource itself gives up
+const CHANGE_FEED_RETRY_MS = 30000;
+const OWN_WRITE_TTL_MS = 60000;
+const changeSubscribers = new Set();
+let changeSource = null;
+let reopenTimer = null;
+
+// Rows this client wrote: the dashboard reloads after its own writes (their
+// events may never reach it, e.g. from another server worker), so their
+// events are not applied on top of the reloaded data
+const ownWrites = new Set();
+
+const recordOwnWrite = (type, result) => {
+  const key = `${type}:${result.id}`;
+  ownWrites.add(key);
+  setTimeout(() => ownWrites.delete(key), OWN_WRITE_TTL_MS);
+  return result;
+};
+
+const notifySubscribers = (callback) => {
+  changeSubscribers.forEach(callback);
+};
+
+const openChangeFeed = (reopened = false) => {
+  const source = new EventSource(`${API_BASE_URL}/events`);
+
+  CHANGE_EVENTS.forEach((type) => {
+    source.addEventListener(type, (message) => {
+      const event = { id: message.lastEventId, type, data: JSON.parse(message.data) };
+      if (ownWrites.delete(`${type}:${event.data.id}`)) {
+        return;
+      }
+      console.log(`📡 Change: ${type}`, event.data);
+      notifySubscribers((handlers) => handlers.onChange?.(event));
+    });
+  });
+
+  // Sent when this client fell behind, and after bulk imports: reload instead of patching
+  ['resync', 'import'].forEach((type) => {
+    source.addEventListener(type, () => {
+      console.log(`📡 Change feed ${type}: reloading`);
+      notifySubscribers((handlers) => handlers.onResync?.());
+    });
+  });
+
+  source.onopen = () => {
+    console.log('✅ Change feed connected');
+    if (reopened) {
+      // Whatever was written while the feed was closed has to be reloaded
+      reopened = false;
+      notifySubscribers((handlers) => handlers.onResync?.());
+    }
+  };
+
+  source.onerror = () => {
+    // EventSource reconnects by itself and resumes after the last event it
+    // saw, unless the server refused the stream
+    if (source.readyState !== EventSource.CLOSED) {
+      console.error('❌ Change feed interrupted, reconnecting');
+      return;
+    }
+    console.error(`❌ Change feed unavailable, retrying in ${CHANGE_FEED_RETRY_MS / 1000}s`);
+    reopenTimer = setTimeout(() => {
+      reopenTimer = null;
+      if (changeSubscribers.size > 0) {
+        changeSource = openChangeFeed(true);
+      }
+    }, CHANGE_FEED_RETRY_MS);
+  };
+
+  return source;
+};
+
 export const apiService = {
   // Dashboard
   getDashboardOverview: async () => {
@@ -51,7 +127,7 @@ export const apiService = {
 
   addExpense: async (expenseData) => {
     const response = await api.post('/expenses', expenseData);
-    return response.data;
+    return recordOwnWrite('expense', response.data);
   },
 
   // Loans
@@ -62,7 +138,7 @@ export const apiService = {
 
   addLoan: async (loanData) => {
     const response = await api.post('/loans', loanData);
-    return response.data;
+    return recordOwnWrite('loan', response.data);
   },
 
   // Committees
@@ -73,18 +149,18 @@ export const apiService = {
 
   addCommittee: async (committeeData) => {
     const response = await api.post('/committees', committeeData);
-    return response.data;
+    return recordOwnWrite('committee', response.data);
   },
 
   addCommitteePayment: async (committeeId, paymentData) => {
     const response = await api.post(`/committees/${committeeId}/payment`, paymentData);
-    return response.data;
+    return recordOwnWrite('committee_payment', response.data);
   },
 
   // Income
   addIncome: async (incomeData) => {
     const response = await api.post('/income', incomeData);
-    return response.data;
+    return recordOwnWrite('income', response.data);
   },
 
   // Categories
@@ -115,6 +191,26 @@ export const apiService = {
     return response.data;
   },
 
+  // Change feed: handlers.onChange(event) for every write committed by
+  // another client and handlers.onResync() when the data shown must be
+  // reloaded. Returns the function that unsubscribes.
+  subscribeToChanges: (handlers) => {
+    changeSubscribers.add(handlers);
+    if (changeSource === null) {
+      changeSource = openChangeFeed();
+    }
+
+    return () => {
+      changeSubscribers.delete(handlers);
+      if (changeSubscribers.size === 0 && changeSource !== null) {
+        changeSource.close();
+        changeSource = null;
+        clearTimeout(reopenTimer);
+        reopenTimer = null;
+      }
+    };
+  },
+
   // Test connection
   testConnection: async () => {
     try {
@@ -0,0 +1,161 @@
+// Applies change feed events (apiService.subscribeToChanges) to data the
+// dashboard has already loaded, so a write costs no refetch. Each helper
+// mirrors how the backend computes the figures it updates.
+
+const monthOf = (isoDate) => isoDate.slice(0, 7);
+
+// What an event adds to one month's expenses, committee payments and income
+const monthAmounts = ({ type, data }, month) => {
+  const amounts = { expenses: 0, category: null, committeePayments: 0, income: 0 };
+  switch (type) {
+    case 'expense':
+      if (monthOf(data.date) === month) {
+        amounts.expenses = data.amount;
+        amounts.category = data.category;
+      }
+      break;
+    case 'committee_payment':
+      // A payment is also stored as a "Committee" expense on its payment date
+      if (monthOf(data.payment_date) === month) {
+        amounts.expenses = data.amount;
+        amounts.category = 'Committee';
+      }
+      if (data.month_year === month) {
+        amounts.committeePayments = data.amount;
+      }
+      break;
+    case 'income':
+      if (data.month_year === month) {
+        amounts.income = data.amount;
+      }
+      break;
+    default:
+      break;
+  }
+  return amounts;
+};
+
+// What an event adds to the loan totals; month null means all time
+const loanAmounts = ({ type, data }, month = null) => {
+  const amounts = { given: 0, taken: 0, received_back: 0 };
+  if (type === 'loan' && (month === null || monthOf(data.date) === month)) {
+    amounts[data.loan_type] = data.amount;
+  }
+  return amounts;
+};
+
+// GET /dashboard/overview: this month's figures, all-time loans
+export const applyToOverview = (overview, event) => {
+  const month = monthAmounts(event, overview.current_month);
+  const loans = loanAmounts(event);
+  const spent = month.expenses + month.committeePayments;
+  const netLoan = loans.given - loans.taken - loans.received_back;
+
+  return {
+    ...overview,
+    monthly_expenses: overview.monthly_expenses + spent,
+    committee_payments: overview.committee_payments + month.committeePayments,
+    total_given: overview.total_given + loans.given,
+    total_taken: overview.total_taken + loans.taken,
+    total_received_back: overview.total_received_back + loans.received_back,
+    net_loan: overview.net_loan + netLoan,
+    monthly_income: overview.monthly_income + month.income,
+    total_savings: overview.total_savings + month.income - spent,
+    net_worth: overview.net_worth + month.income - spent + netLoan
+  };
+};
+
+// GET /analytics/net-values/<month>: everything, loans included, for one month
+export const applyToNetValues = (values, event) => {
+  const month = monthAmounts(event, values.month);
+  const loans = loanAmounts(event, values.month);
+  const spent = month.expenses + month.committeePayments;
+  const netLoan = loans.given - loans.taken - loans.received_back;
+
+  return {
+    ...values,
+    loan_given: values.loan_given + loans.given,
+    loan_taken: values.loan_taken + loans.taken,
+    loan_received_back: values.loan_received_back + loans.received_back,
+    net_loan: values.net_loan + netLoan,
+    income: values.income + month.income,
+    total_expenses: values.total_expenses + spent,
+    committee_payments: values.committee_payments + month.committeePayments,
+    total_savings: values.total_savings + month.income - spent,
+    net_worth: values.net_worth + month.income - spent + netLoan
+  };
+};
+
+// Months an event touches
+export const eventMonths = ({ type, data }) => {
+  switch (type) {
+    case 'expense':
+    case 'loan':
+      return [monthOf(data.date)];
+    case 'committee_payment':
+      return [...new Set([monthOf(data.payment_date), data.month_year])];
+    case 'income':
+      return [data.month_year];
+    default:
+      return [];
+  }
+};
+
+// GET /analytics/monthly-summary covers the current month and the 12 before it
+const summaryStartMonth = () => {
+  const today = new Date();
+  return `${today.getFullYear() - 1}-${String(today.getMonth() + 1).padStart(2, '0')}`;
+};
+
+// GET /analytics/monthly-summary: expenses per category, income and savings by month
+export const applyToMonthlySummary = (summary, event) => {
+  const updated = { ...summary };
+  eventMonths(event).forEach((monthYear) => {
+    if (monthYear < summaryStartMonth()) {
+      return;
+    }
+    const amounts = monthAmounts(event, monthYear);
+    // Like the backend, committee payments only show in months that have expenses
+    if (!amounts.expenses && !amounts.income && !(amounts.committeePayments && updated[monthYear])) {
+      return;
+    }
+
+    const month = {
+      expenses: {},
+      total_expenses: 0,
+      ...updated[monthYear]
+    };
+    if (amounts.category) {
+      month.expenses = {
+        ...month.expenses,
+        [amounts.category]: (month.expenses[amounts.category] || 0) + amounts.expenses
+      };
+    }
+    month.total_expenses += amounts.expenses + amounts.committeePayments;
+    if (amounts.committeePayments) {
+      month.committee_payments = (month.committee_payments || 0) + amounts.committeePayments;
+    }
+    if (amounts.income) {
+      month.income = (month.income || 0) + amounts.income;
+    }
+    month.savings = (month.income || 0) - month.total_expenses;
+    updated[monthYear] = month;
+  });
+  return updated;
+};
+
+// GET /loans: per-person totals keyed by name
+export const applyToLoanSummary = (loanSummary, { type, data }) => {
+  if (type !== 'loan') {
+    return loanSummary;
+  }
+  const person = loanSummary[data.person] || {
+    person_id: data.person_id,
+    given: 0,
+    taken: 0,
+    received_back: 0
+  };
+  const updated = { ...person, [data.loan_type]: (person[data.loan_type] || 0) + data.amount };
+  updated.net_amount = updated.given - updated.taken - updated.received_back;
+  return { ...loanSummary, [data.person]: updated };
+};